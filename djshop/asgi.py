@@ -11,6 +11,9 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from utils.startup import paused_gc, profile_startup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djshop.settings')
 
-application = get_asgi_application()
+with profile_startup(), paused_gc():
+    application = get_asgi_application()
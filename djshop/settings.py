@@ -14,15 +14,23 @@ BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
 SECRET_KEY = get_env('DJANGO_SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = get_env('DJANGO_DEBUG', 1)
+DEBUG = get_env('DJANGO_DEBUG', True, bool)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = get_env('DJANGO_ALLOWED_HOSTS', '', list)
 
 # TODO: Add security settings
 
 
 # Application definition
 
+# Apps that API-only workers (`djshop.settings_api`) don't load
+OPTIONAL_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -38,6 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'services.routing.ReplicaPinMiddleware',
+    'services.identity.IdentityMapMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,9 +86,96 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Persistent connections, checked before reuse in a new request
+        'CONN_MAX_AGE': get_env('DJANGO_CONN_MAX_AGE', 60, 'duration'),
+        'CONN_HEALTH_CHECKS': get_env(
+            'DJANGO_CONN_HEALTH_CHECKS', True, bool
+        ),
     }
 }
 
+# Read replica of the primary (`default`) database, e.g. a second SQLite
+# file for local testing. Tests use the primary instead of it
+
+DB_REPLICA_NAME = get_env('DJANGO_DB_REPLICA_NAME', '')
+
+if DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / DB_REPLICA_NAME,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['services.routing.ReplicaRouter']
+
+# Seconds reads of a client stay on the primary after its write
+REPLICA_PIN_SECONDS = get_env('DJANGO_REPLICA_PIN_SECONDS', 5, 'duration')
+
+
+# Caches. Local memory cache is per process, so deployments with many
+# processes need a shared backend (e.g. Redis) for invalidations of
+# cached entries to reach all processes
+
+CACHES = {
+    'default': {
+        'BACKEND': get_env(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': get_env('DJANGO_CACHE_LOCATION', ''),
+    },
+}
+
+
+# Cache of CRUD services
+# Timeouts of cached entries per model label, in seconds
+
+CRUD_CACHE_TIMEOUTS = {
+    'products.product': 60 * 15,
+    'products.review': 60 * 5,
+}
+
+# In-process cache of entries, disabled by default: it's cleared only by
+# writes of the same process, so other processes may serve stale entries
+# for `CRUD_CACHE_LOCAL_TIMEOUT` seconds
+
+CRUD_CACHE_LOCAL_SIZE = 0
+
+CRUD_CACHE_LOCAL_TIMEOUT = 5
+
+# Seconds expired entries are served while one worker refreshes them and
+# seconds the refreshing worker holds the lock of entry
+
+CRUD_CACHE_STALE_TIMEOUT = 60
+
+CRUD_CACHE_LOCK_TIMEOUT = 10
+
+
+# Instrumentation of service methods
+# Sinks are dotted paths to `services.instrumentation.BaseMetricsSink`
+# subclasses
+
+SERVICE_INSTRUMENTATION = get_env(
+    'DJANGO_SERVICE_INSTRUMENTATION', False, bool
+)
+
+SERVICE_METRICS_SINKS = [
+    'services.instrumentation.RegistrySink',
+]
+
+# Bearer token of scrapers of `/metrics/`, without it only staff see them
+SERVICE_METRICS_TOKEN = get_env('DJANGO_SERVICE_METRICS_TOKEN', '')
+
+
+# Write-behind queue of submitted reviews, a local SQLite journal drained
+# by `drain_reviews` command
+
+REVIEW_QUEUE_PATH = get_env(
+    'DJANGO_REVIEW_QUEUE_PATH', str(BASE_DIR / 'review_queue.sqlite3')
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -120,3 +217,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -0,0 +1,25 @@
+"""Slim settings for API-only workers
+
+Admin, sessions, messages and static files aren't loaded, so workers
+start faster. Requests have no `user`, views needing authentication
+answer 403
+
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, OPTIONAL_APPS
+
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in OPTIONAL_APPS]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )
+]
+
+TEMPLATES = []
@@ -13,9 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path
+from django.apps import apps
+from django.urls import include, path
+
+from services.views import metrics
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
+    path('api/', include('products.urls')),
 ]
+
+# Admin isn't installed on API-only workers
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
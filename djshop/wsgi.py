@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from utils.startup import paused_gc, profile_startup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djshop.settings')
 
-application = get_wsgi_application()
+with profile_startup(), paused_gc():
+    application = get_wsgi_application()
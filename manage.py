@@ -15,6 +15,15 @@ def main():
             "available on your PYTHONPATH environment variable? Did you "
             "forget to activate a virtual environment?"
         ) from exc
+
+    from utils.startup import is_enabled, profile_startup
+
+    if is_enabled():
+        import django
+
+        with profile_startup():
+            django.setup()
+
     execute_from_command_line(sys.argv)
 
 
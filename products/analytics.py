@@ -0,0 +1,282 @@
+"""Module with vectorized analytics of catalog
+
+Columns are loaded with `values_list()` in chunks straight into NumPy
+arrays, so no model instances are created and Python objects of rows
+are bounded by `chunk_size`. Results aren't bounded by it: prices are
+kept as one float array (8 bytes per product) for exact percentiles and
+rating distributions as pks and 6 integers per product, loaded from
+rating aggregates instead of scanning reviews. Reviews are reduced chunk by
+chunk to per day sums, so their memory depends only on number of days
+
+"""
+
+from __future__ import annotations
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+import numpy as np
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+
+from services.routing import replica_manager
+from .models import Product, Review
+
+
+CHUNK_SIZE = 100_000
+PERCENTILES = (5, 25, 50, 75, 90, 95, 99)
+DEFAULT_WINDOW = 7
+
+RATING_FIELDS = tuple(f'rating_{rating}' for rating in range(6))
+
+
+class RatingDistributions(NamedTuple):
+    """Rating distributions of products
+
+    Attributes
+    ----------
+    pks : ndarray
+        Pks of products, element per row of counts
+    counts : ndarray
+        Numbers of reviews by rating, row per product and column per
+        rating from 0 to 5
+
+    """
+
+    pks: np.ndarray
+    counts: np.ndarray
+
+    @property
+    def averages(self) -> np.ndarray:
+        """Average ratings of products, NaN for products without reviews"""
+        totals = self.counts.sum(axis=1)
+        sums = self.counts @ np.arange(self.counts.shape[1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / totals
+
+
+class DailyReviews(NamedTuple):
+    """Numbers and rating sums of reviews by day
+
+    Attributes
+    ----------
+    start : date
+        Day of the first elements
+    counts : ndarray
+        Numbers of reviews of consecutive days
+    rating_sums : ndarray
+        Sums of ratings of reviews of consecutive days
+
+    """
+
+    start: date
+    counts: np.ndarray
+    rating_sums: np.ndarray
+
+    @property
+    def days(self) -> List[date]:
+        """Consecutive days of elements"""
+        return [
+            self.start + timedelta(days=offset)
+            for offset in range(len(self.counts))
+        ]
+
+
+def iter_chunks(
+    queryset: QuerySet, fields: Iterable[str], chunk_size: int = CHUNK_SIZE
+) -> Iterator[list]:
+    """Iterate over lists of at most chunk_size tuples of field values"""
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def load_prices(
+    queryset: QuerySet = None, chunk_size: int = CHUNK_SIZE
+) -> np.ndarray:
+    """Load prices of products to a float array"""
+    if queryset is None:
+        queryset = replica_manager(Product).all()
+
+    chunks = [
+        np.array(chunk, dtype=np.float64).ravel()
+        for chunk in iter_chunks(queryset, ['price'], chunk_size)
+    ]
+    return np.concatenate(chunks) if chunks else np.empty(0)
+
+
+def get_percentiles(
+    values: np.ndarray, percentiles: Iterable[int] = PERCENTILES
+) -> Dict[str, float]:
+    """Return percentiles of values by name like `p50`"""
+    percentiles = list(percentiles)
+    if not len(values):
+        return {f'p{percentile}': None for percentile in percentiles}
+
+    values = np.percentile(values, percentiles)
+    return {
+        f'p{percentile}': round(float(value), 2)
+        for percentile, value in zip(percentiles, values)
+    }
+
+
+def load_rating_distributions(
+    queryset: QuerySet = None, chunk_size: int = CHUNK_SIZE
+) -> RatingDistributions:
+    """Load rating distributions of products from their aggregates"""
+    if queryset is None:
+        queryset = replica_manager(Product).all()
+
+    pk_chunks = []
+    chunks = []
+    for chunk in iter_chunks(queryset, ['pk', *RATING_FIELDS], chunk_size):
+        pk_chunks.append(np.array([row[0] for row in chunk], dtype=object))
+        chunks.append(
+            np.array([row[1:] for row in chunk], dtype=np.int64)
+        )
+
+    if not chunks:
+        return RatingDistributions(
+            np.empty(0, dtype=object),
+            np.empty((0, len(RATING_FIELDS)), dtype=np.int64)
+        )
+
+    return RatingDistributions(
+        np.concatenate(pk_chunks), np.concatenate(chunks)
+    )
+
+
+def load_daily_reviews(
+    queryset: QuerySet = None, chunk_size: int = CHUNK_SIZE
+) -> DailyReviews:
+    """Reduce reviews to numbers and rating sums by day
+
+    Memory is bounded by chunk size and number of days, not reviews.
+    Only reviews published within bounds of the first query are scanned,
+    so reviews committed in between don't overflow daily arrays
+
+    """
+    if queryset is None:
+        queryset = replica_manager(Review).all()
+
+    bounds = queryset.aggregate(start=Min('pub_date'), end=Max('pub_date'))
+    if bounds['start'] is None:
+        return DailyReviews(
+            timezone.now().date(), np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64)
+        )
+
+    queryset = queryset.filter(
+        pub_date__range=(bounds['start'], bounds['end'])
+    )
+
+    start = np.datetime64(bounds['start'], 'D')
+    size = (bounds['end'] - bounds['start']).days + 1
+    counts = np.zeros(size, dtype=np.int64)
+    rating_sums = np.zeros(size, dtype=np.int64)
+    for chunk in iter_chunks(queryset, ['pub_date', 'rating'], chunk_size):
+        days, ratings = zip(*chunk)
+        offsets = (
+            np.array(days, dtype='datetime64[D]') - start
+        ).astype(np.int64)
+        counts += np.bincount(offsets, minlength=size)
+        rating_sums += np.bincount(
+            offsets, weights=np.array(ratings), minlength=size
+        ).astype(np.int64)
+
+    return DailyReviews(bounds['start'], counts, rating_sums)
+
+
+def moving_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Return sums of trailing windows, shorter ones for first elements"""
+    sums = np.cumsum(values, dtype=np.float64)
+    sums[window:] -= sums[:-window].copy()
+    return sums
+
+
+def moving_averages(
+    daily: DailyReviews, window: int = DEFAULT_WINDOW
+) -> Dict[str, np.ndarray]:
+    """Return trailing moving averages of daily reviews
+
+    Raises
+    ------
+    ValueError
+        Raises if window is less than one day
+
+    Returns
+    -------
+    averages : dict
+        `reviews` is average number of reviews per day of window,
+        `rating` is average rating of reviews of window (NaN without
+        reviews)
+
+    """
+    if window < 1:
+        raise ValueError(f'Incorrect window: {window}')
+
+    days = np.minimum(np.arange(1, len(daily.counts) + 1), window)
+    counts = moving_sum(daily.counts, window)
+    rating_sums = moving_sum(daily.rating_sums, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rating = rating_sums / counts
+
+    return {'reviews': counts / days, 'rating': rating}
+
+
+def _to_json(values: np.ndarray, digits: int = 3) -> list:
+    return [
+        None if np.isnan(value) else round(float(value), digits)
+        for value in values
+    ]
+
+
+def _product_ratings(
+    distributions: RatingDistributions, averages: np.ndarray
+) -> List[dict]:
+    """Return rating distributions and averages of reviewed products"""
+    reviewed = np.flatnonzero(distributions.counts.sum(axis=1))
+    return [
+        {
+            'pk': str(distributions.pks[row]),
+            'distribution': distributions.counts[row].tolist(),
+            'average': round(float(averages[row]), 3),
+        }
+        for row in reviewed
+    ]
+
+
+def build_report(
+    window: int = DEFAULT_WINDOW, chunk_size: int = CHUNK_SIZE
+) -> dict:
+    """Build JSON serializable report of prices and ratings of catalog"""
+    prices = load_prices(chunk_size=chunk_size)
+    distributions = load_rating_distributions(chunk_size=chunk_size)
+    daily = load_daily_reviews(chunk_size=chunk_size)
+    averages = distributions.averages
+    rated = averages[~np.isnan(averages)]
+    moving = moving_averages(daily, window)
+    return {
+        'prices': {
+            'count': int(len(prices)),
+            'mean': round(float(prices.mean()), 2) if len(prices) else None,
+            'percentiles': get_percentiles(prices),
+        },
+        'ratings': {
+            'distribution': distributions.counts.sum(axis=0).tolist(),
+            'rated_products': int(len(rated)),
+            'average_percentiles': get_percentiles(rated),
+            'products': _product_ratings(distributions, averages),
+        },
+        'daily_reviews': {
+            'window': window,
+            'days': [day.isoformat() for day in daily.days],
+            'counts': daily.counts.tolist(),
+            'moving_reviews': _to_json(moving['reviews']),
+            'moving_rating': _to_json(moving['rating']),
+        },
+    }
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductsConfig(AppConfig):
     name = 'products'
+    # Type of ids of models without explicit primary key
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from .http_cache import connect_signals
+        from .search import install_search_index
+
+        post_migrate.connect(install_search_index, sender=self)
+        connect_signals()
@@ -0,0 +1,294 @@
+"""Module with benchmarks of product and review services
+
+Data is generated deterministically from a seed, so results of runs with
+equal options are comparable with each other
+
+"""
+
+from __future__ import annotations
+from decimal import Decimal
+import gc
+import json
+from random import Random
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Model
+from django.forms.models import model_to_dict
+
+from services.cache import get_local_cache
+from .models import Product, Review
+from .serializers import dumps, product_serializer
+from .services.products import ProductService
+from .services.ratings import rebuild_rating_aggregates
+from .services.sellers import rebuild_seller_stats
+
+
+User = get_user_model()
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_ITERATIONS = 200
+DEFAULT_SEED = 42
+DEFAULT_TOLERANCE = 0.25
+SEED_BATCH_SIZE = 5000
+SERIALIZED_PAGE_SIZE = 100
+
+WORDS = (
+    'red', 'green', 'blue', 'phone', 'case', 'cable', 'charger', 'laptop',
+    'bag', 'leather', 'wireless', 'mouse', 'keyboard', 'screen', 'cheap',
+    'premium', 'small', 'large', 'steel', 'wooden',
+)
+
+
+def _uuid(random: Random) -> UUID:
+    return UUID(int=random.getrandbits(128), version=4)
+
+
+def _text(random: Random, words: int) -> str:
+    return ' '.join(random.choice(WORDS) for _ in range(words))
+
+
+def _bulk_create(model, entries: Iterable) -> None:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == SEED_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+
+    model.objects.bulk_create(batch)
+
+
+def seed(size: int, seed: int = DEFAULT_SEED) -> dict:
+    """Create size products and reviews and size / 100 users
+
+    Entries are written by bulk inserts bypassing services, so rating
+    aggregates and seller summaries are rebuilt afterwards
+
+    Returns
+    -------
+    data : dict
+        Primary keys of created `users`, `products` and `reviews`
+
+    """
+    random = Random(seed)
+    user_count = max(size // 100, 1)
+    users = [
+        User(username=f'bench-{seed}-{i}', password='!', is_seller=True)
+        for i in range(user_count)
+    ]
+    product_pks = [_uuid(random) for _ in range(size)]
+    review_pks = [_uuid(random) for _ in range(size)]
+
+    with transaction.atomic():
+        _bulk_create(User, users)
+        user_pks = list(User.objects.filter(
+            username__startswith=f'bench-{seed}-'
+        ).order_by('pk').values_list('pk', flat=True))
+        _bulk_create(Product, (
+            Product(
+                uuid=pk, title=_text(random, 3), description=_text(random, 20),
+                price=Decimal(random.randrange(100, 100000)) / 100,
+                seller_id=random.choice(user_pks)
+            )
+            for pk in product_pks
+        ))
+        _bulk_create(Review, (
+            Review(
+                uuid=pk, text=_text(random, 10),
+                product_id=random.choice(product_pks),
+                rating=random.randint(0, 5),
+                author_id=random.choice(user_pks)
+            )
+            for pk in review_pks
+        ))
+
+    rebuild_rating_aggregates(SEED_BATCH_SIZE)
+    rebuild_seller_stats(SEED_BATCH_SIZE)
+    return {
+        'users': user_pks, 'products': product_pks, 'reviews': review_pks
+    }
+
+
+def clear_caches() -> None:
+    """Clear all cache tiers of services"""
+    django_cache.clear()
+    get_local_cache(Product).clear()
+    get_local_cache(Review).clear()
+
+
+def serialize_naive(entries: Iterable[Model]) -> str:
+    """Return JSON of entries by `model_to_dict()` and `json.dumps()`
+
+    Baseline of serialization with `products.serializers`
+
+    """
+    return json.dumps(
+        [model_to_dict(entry) for entry in entries], cls=DjangoJSONEncoder
+    )
+
+
+def get_operations(data: dict, random: Random) -> Dict[str, Callable]:
+    """Return benchmarked operations by name
+
+    Writes create their own entries, so every operation can be repeated
+    any number of times
+
+    """
+    service = ProductService()
+    review_service = service.review_service
+    products = data['products']
+    users = data['users']
+    page = service.get_page(limit=SERIALIZED_PAGE_SIZE).entries
+
+    def create_product():
+        return service.create(
+            title=_text(random, 3), description=_text(random, 20),
+            price='10.00', seller=User(pk=random.choice(users))
+        )
+
+    def add_review():
+        return service.add_review(
+            random.choice(products), text=_text(random, 10),
+            rating=random.randint(0, 5), author=User(pk=random.choice(users))
+        )
+
+    created = []
+
+    def update_product():
+        if not created:
+            created.append(create_product().pk)
+
+        return service.update(
+            created[-1], title=_text(random, 3),
+            description=_text(random, 20), price='20.00'
+        )
+
+    def remove_review():
+        service.remove_review(add_review().pk)
+
+    return {
+        'get_concrete': lambda: service.get_concrete(random.choice(products)),
+        'get_page': lambda: service.get_page(limit=20),
+        'list_summaries': lambda: service.list_summaries(limit=20),
+        'get_reviews': lambda: service.get_reviews(random.choice(products)),
+        'search': lambda: service.search(_text(random, 2)),
+        'create': create_product,
+        'update': update_product,
+        'add_review': add_review,
+        'remove_review': remove_review,
+        'review_get_concrete': lambda: review_service.get_concrete(
+            random.choice(data['reviews'])
+        ),
+        'serialize_naive': lambda: serialize_naive(page),
+        'serialize': lambda: dumps(product_serializer.to_list(page)),
+    }
+
+
+def percentile(timings: List[float], percent: float) -> float:
+    """Return percentile of sorted timings by nearest rank"""
+    index = max(int(round(percent / 100 * len(timings))) - 1, 0)
+    return timings[index]
+
+
+def measure(operation: Callable, iterations: int) -> dict:
+    """Return throughput and p50/p99 latency of operation in ms"""
+    timings = []
+    gc.collect()
+    start = perf_counter()
+    for _ in range(iterations):
+        operation_start = perf_counter()
+        operation()
+        timings.append(perf_counter() - operation_start)
+
+    total = perf_counter() - start
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total, 2),
+        'p50_ms': round(percentile(timings, 50) * 1000, 4),
+        'p99_ms': round(percentile(timings, 99) * 1000, 4),
+    }
+
+
+def run_benchmarks(
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    iterations: int = DEFAULT_ITERATIONS, seed_value: int = DEFAULT_SEED,
+    operations: Iterable[str] = None, reset: Callable = None
+) -> dict:
+    """Seed data of every size and measure service operations on it
+
+    Parameters
+    ----------
+    sizes
+        Numbers of products and reviews
+    iterations : int
+        Number of calls of every operation
+    seed_value : int
+        Seed of data and operation arguments
+    operations
+        Names of measured operations, all by default
+    reset : callable, optional
+        Called before seeding of every size to remove previous data
+
+    Returns
+    -------
+    results : dict
+        Results by size and operation name
+
+    """
+    results = {}
+    for size in sizes:
+        if reset is not None:
+            reset()
+
+        clear_caches()
+        data = seed(size, seed_value)
+        random = Random(seed_value)
+        size_results = results[str(size)] = {}
+        for name, operation in get_operations(data, random).items():
+            if operations and name not in operations:
+                continue
+
+            size_results[name] = measure(operation, iterations)
+
+    return {
+        'seed': seed_value, 'iterations': iterations, 'results': results
+    }
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE
+) -> List[str]:
+    """Return descriptions of regressions of results against baseline
+
+    Operation regresses if its p50 or p99 latency grows or throughput falls
+    by more than tolerance share
+
+    """
+    regressions = []
+    for size, operations in results['results'].items():
+        for name, result in operations.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+
+            for metric in ('p50_ms', 'p99_ms'):
+                if result[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(
+                        f'{name} [{size}]: {metric} {result[metric]} > '
+                        f'{base[metric]} (baseline)'
+                    )
+
+            if result['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance):
+                regressions.append(
+                    f"{name} [{size}]: ops_per_sec {result['ops_per_sec']} "
+                    f"< {base['ops_per_sec']} (baseline)"
+                )
+
+    return regressions
@@ -0,0 +1,166 @@
+"""Module with streaming export of products and reviews
+
+Rows are read from replicas with `values_list()` projections and
+`iterator()`, and written chunk by chunk, so memory doesn't depend on
+number of rows. Incremental export selects entries by `updated_at`, so it
+has new and changed entries only: deleted entries aren't tracked and
+aren't exported, consumers need a full export to drop them
+
+"""
+
+from __future__ import annotations
+import csv
+from datetime import datetime, timedelta
+from io import StringIO
+from typing import Iterable, Iterator, Sequence
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model
+from django.utils import timezone
+
+from services.routing import DEFAULT_PIN_SECONDS, get_replicas, replica_manager
+
+from .models import Product, Review
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = {
+    'products': (Product, (
+        'uuid', 'title', 'description', 'price', 'seller_id', 'pub_date',
+        'updated_at', 'review_count', 'rating_sum',
+    )),
+    'reviews': (Review, (
+        'uuid', 'product_id', 'author_id', 'text', 'rating', 'pub_date',
+        'updated_at',
+    )),
+}
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def write_csv(
+    rows: Iterable[tuple], fields: Sequence[str], chunk_size: int
+) -> Iterator[str]:
+    """Return CSV with header, one string per chunk of rows"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    for chunk in _chunks(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def write_ndjson(
+    rows: Iterable[tuple], fields: Sequence[str], chunk_size: int
+) -> Iterator[str]:
+    """Return JSON object per line, one string per chunk of rows"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for chunk in _chunks(rows, chunk_size):
+        yield ''.join(
+            encoder.encode(dict(zip(fields, row))) + '\n' for row in chunk
+        )
+
+
+def write_columnar(
+    rows: Iterable[tuple], fields: Sequence[str], chunk_size: int
+) -> Iterator[str]:
+    """Return columnar JSON lines in the spirit of Parquet row groups
+
+    The first line is a schema with field names, every next line is a row
+    group with a list of values per column
+
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield encoder.encode({'fields': list(fields)}) + '\n'
+    for chunk in _chunks(rows, chunk_size):
+        columns = dict(zip(fields, map(list, zip(*chunk))))
+        yield encoder.encode(
+            {'num_rows': len(chunk), 'columns': columns}
+        ) + '\n'
+
+
+# Writer, content type and file extension by format
+WRITERS = {
+    'csv': (write_csv, 'text/csv', 'csv'),
+    'ndjson': (write_ndjson, 'application/x-ndjson', 'ndjson'),
+    'columnar': (write_columnar, 'application/x-ndjson', 'jsonl'),
+}
+
+
+def get_watermark() -> datetime:
+    """Return watermark for the next export of an export started now
+
+    It's taken before reading, so rows changed during export are exported
+    again next time instead of being lost. With replicas it's moved back
+    by `REPLICA_PIN_SECONDS`, so rows not yet replicated aren't lost too
+
+    """
+    watermark = timezone.now()
+    if get_replicas():
+        watermark -= timedelta(seconds=getattr(
+            settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS
+        ))
+
+    return watermark
+
+
+def export_rows(
+    model: Model, fields: Sequence[str], since: datetime = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[tuple]:
+    """Iterate over field values of entries changed since watermark"""
+    entries = replica_manager(model).order_by()
+    if since is not None:
+        entries = entries.filter(updated_at__gte=since)
+
+    return entries.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def export(
+    kind: str, format: str = 'csv', since: datetime = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[str]:
+    """Return exported entries of kind as a stream of strings
+
+    Parameters
+    ----------
+    kind : str
+        `products` or `reviews`
+    format : str
+        `csv`, `ndjson` or `columnar`
+    since : datetime, optional
+        Export only entries created or changed since this watermark,
+        deleted entries aren't exported
+    chunk_size : int
+        Number of rows fetched from database and written at once
+
+    Raises
+    ------
+    ValueError
+        Raises if kind or format is unknown
+
+    """
+    if kind not in EXPORT_FIELDS:
+        raise ValueError(f'Unknown export kind: {kind}')
+    if format not in WRITERS:
+        raise ValueError(f'Unknown export format: {format}')
+
+    model, fields = EXPORT_FIELDS[kind]
+    writer = WRITERS[format][0]
+    rows = export_rows(model, fields, since, chunk_size)
+    return writer(rows, fields, chunk_size)
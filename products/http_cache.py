@@ -0,0 +1,229 @@
+"""Module with HTTP caching of catalog endpoints
+
+Validators (strong ETag and Last-Modified) of products and their reviews
+are computed from `version` and `updated_at` columns, validators of
+product list are derived from generation of its cache key and time of
+computation, so the table isn't scanned. Validators are kept in django
+cache until a write changes them, but not longer than cache timeout of
+the model. They are cached with `services.cache.fetch()`, so validators
+computed before a write commits aren't stored after its invalidation,
+and concurrent misses compute them once. Writes bypassing signals (e.g.
+`QuerySet.update()`, raw SQL or writes of other processes with a local
+cache) are picked up after timeout. Usernames of review authors aren't
+covered by validators of reviews. Conditional GETs are answered with 304
+from cached validators without touching database, and full responses
+are cached by ETag and query parameters, so a changed ETag invalidates
+them too
+
+"""
+
+from __future__ import annotations
+from datetime import datetime
+from functools import wraps
+from hashlib import md5
+from typing import Callable, Iterable, NamedTuple, Optional
+from uuid import UUID
+
+from django.db.models import Count, Max, Model
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from services.cache import (
+    fetch, get_cache, get_generation, get_timeout, invalidate_keys
+)
+from services.signals import entries_changed
+from .models import Product, Review
+
+
+# Seconds full responses are kept in cache
+RESPONSE_TIMEOUT = 60 * 10
+
+LIST_KEY = 'http:products'
+
+
+class Validators(NamedTuple):
+    """Validators of a resource
+
+    Attributes
+    ----------
+    etag : str
+        Strong ETag without quotes
+    last_modified : datetime
+        Time of the last change
+
+    """
+
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _product_key(pk: UUID) -> str:
+    return f'http:product:{Product._meta.pk.to_python(pk)}'
+
+
+def _reviews_key(pk: UUID) -> str:
+    return f'http:reviews:{Product._meta.pk.to_python(pk)}'
+
+
+def _make_validators(*parts, last_modified: datetime = None) -> Validators:
+    digest = md5(':'.join(map(str, parts)).encode()).hexdigest()
+    return Validators(digest, last_modified)
+
+
+def _get_or_compute(
+    key: str, compute: Callable, model: Model
+) -> Optional[Validators]:
+    return fetch(key, compute, get_timeout(model))
+
+
+def list_validators(request: HttpRequest) -> Validators:
+    """Return validators of product list
+
+    Every write of products or reviews bumps generation of the key, and
+    time of computation keeps ETag unique after generation expires, so
+    validators change with the list without reading it
+
+    """
+    def compute():
+        now = timezone.now()
+        return _make_validators(
+            'products', get_generation(LIST_KEY), now.isoformat(),
+            last_modified=now
+        )
+
+    return _get_or_compute(LIST_KEY, compute, Product)
+
+
+def product_validators(request: HttpRequest, pk: UUID) -> Validators:
+    """Return validators of product or `None` if it doesn't exist"""
+    def compute():
+        row = Product.objects.filter(pk=pk).values_list(
+            'version', 'updated_at'
+        ).first()
+        if row is None:
+            return None
+
+        return _make_validators('product', pk, *row, last_modified=row[1])
+
+    return _get_or_compute(_product_key(pk), compute, Product)
+
+
+def reviews_validators(request: HttpRequest, pk: UUID) -> Validators:
+    """Return validators of reviews of product
+
+    Usernames of authors aren't covered, their changes are picked up
+    after cache timeout of reviews
+
+    """
+    def compute():
+        stats = Review.objects.filter(product_id=pk).aggregate(
+            count=Count('pk'), last_modified=Max('updated_at')
+        )
+        return _make_validators(
+            'reviews', pk, stats['count'], stats['last_modified'],
+            last_modified=stats['last_modified']
+        )
+
+    return _get_or_compute(_reviews_key(pk), compute, Review)
+
+
+def invalidate(model: Model, keys: Iterable[str]) -> None:
+    """Remove validators of model data by keys, again after commit
+
+    Generations of keys are bumped, so validators computed before the
+    write aren't stored afterwards
+
+    """
+    invalidate_keys(model, list(keys))
+
+
+def _product_changed(sender: Model, instance: Product, **kwargs) -> None:
+    invalidate(Product, [LIST_KEY, _product_key(instance.pk)])
+
+
+def _products_changed(sender: Model, pks: list, **kwargs) -> None:
+    invalidate(Product, [LIST_KEY, *map(_product_key, pks)])
+
+
+def _review_changed(sender: Model, instance: Review, **kwargs) -> None:
+    invalidate(Review, [_reviews_key(instance.product_id)])
+
+
+def _reviews_changed(sender: Model, pks: list, **kwargs) -> None:
+    product_pks = set(Review.objects.filter(pk__in=pks).values_list(
+        'product_id', flat=True
+    ))
+    invalidate(Review, map(_reviews_key, product_pks))
+
+
+def connect_signals() -> None:
+    """Invalidate validators on every write of products and reviews"""
+    for sender, changed, bulk_changed in (
+        (Product, _product_changed, _products_changed),
+        (Review, _review_changed, _reviews_changed),
+    ):
+        uid = f'http_cache:{sender._meta.label_lower}'
+        post_save.connect(changed, sender=sender, dispatch_uid=uid)
+        post_delete.connect(changed, sender=sender, dispatch_uid=uid)
+        entries_changed.connect(
+            bulk_changed, sender=sender, dispatch_uid=uid
+        )
+
+
+def cached_response(validators: Callable) -> Callable:
+    """Decorate view with conditional GET and cache of full responses
+
+    Parameters
+    ----------
+    validators : callable
+        Function returning `Validators` of resource by view arguments or
+        `None` if resource doesn't exist
+
+    """
+    def get_validators(request: HttpRequest, *args, **kwargs) -> Validators:
+        # Computed once per request for both ETag and Last-Modified
+        if not hasattr(request, '_validators'):
+            request._validators = validators(request, *args, **kwargs)
+
+        return request._validators
+
+    def etag(request: HttpRequest, *args, **kwargs) -> Optional[str]:
+        result = get_validators(request, *args, **kwargs)
+        return result.etag if result is not None else None
+
+    def last_modified(request: HttpRequest, *args, **kwargs):
+        result = get_validators(request, *args, **kwargs)
+        return result.last_modified if result is not None else None
+
+    def decorator(view: Callable) -> Callable:
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            result = get_validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+
+            query = md5(
+                '&'.join(sorted(request.GET.urlencode().split('&'))).encode()
+            ).hexdigest()
+            key = f'http:response:{view.__name__}:{result.etag}:{query}'
+            cache = get_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key, (response.content, response['Content-Type']),
+                    RESPONSE_TIMEOUT
+                )
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,348 @@
+"""Module with streaming import of products and reviews
+
+Rows are read from CSV or NDJSON file lazily, validated by forms in a
+process pool and written by batches through CRUD services. At most
+`max_pending` batches are read ahead, so memory doesn't depend on file
+size. After every committed batch rejected rows are appended to a
+dead-letter file and the number of the last imported row is written to a
+checkpoint file, so interrupted import can be resumed.
+
+Resume is idempotent: primary keys of entries are derived from path of
+the file and row number, so rows committed before a crash aren't created
+again, and dead-letter file is truncated to its size at the checkpoint
+
+"""
+
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid5
+
+import django
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .forms import ProductForm, ReviewForm
+from .models import Product
+
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_PENDING = 4
+
+# Namespace of primary keys of imported entries
+IMPORT_NAMESPACE = UUID('6f1d3c52-8a4e-4b8e-9d0a-2f6c1e7b5a93')
+
+# Form and foreign keys (key in row, attname, model) by kind of import
+KINDS = {
+    'products': (ProductForm, (('seller', 'seller_id', User),)),
+    'reviews': (ReviewForm, (
+        ('product', 'product_id', Product), ('author', 'author_id', User)
+    )),
+}
+
+
+class ImportStats(NamedTuple):
+    """Statistics of import
+
+    Attributes
+    ----------
+    imported : int
+        Number of rows written by this run, rows committed before a crash
+        aren't counted again on resume
+    rejected : int
+        Number of rows written to dead-letter file
+    last_line : int
+        Number of the last processed row
+
+    """
+
+    imported: int
+    rejected: int
+    last_line: int
+
+
+def read_rows(path: Path, format: str = None) -> Iterator[Tuple[int, dict]]:
+    """Iterate over (row number, row) pairs of CSV or NDJSON file
+
+    Rows of NDJSON files that aren't JSON objects are returned as `None`
+
+    """
+    format = format or ('csv' if path.suffix == '.csv' else 'ndjson')
+    with path.open(newline='') as file:
+        if format == 'csv':
+            yield from enumerate(csv.DictReader(file), 1)
+            return
+
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+
+            yield number, row if isinstance(row, dict) else None
+
+
+def _setup_worker() -> None:
+    if not apps.ready:
+        django.setup()
+
+
+def validate_rows(
+    kind: str, rows: List[Tuple[int, dict]]
+) -> Tuple[list, list]:
+    """Validate rows by form of kind
+
+    Returns
+    -------
+    valid : list
+        (row number, cleaned data with foreign key attnames) pairs
+    rejected : list
+        (row number, row, errors) triples
+
+    """
+    form_class, foreign_keys = KINDS[kind]
+    valid = []
+    rejected = []
+    for number, row in rows:
+        if row is None:
+            rejected.append((number, row, {'__all__': ['Malformed row']}))
+            continue
+
+        form = form_class(row)
+        errors = form.errors.get_json_data() if not form.is_valid() else {}
+        data = dict(form.cleaned_data) if not errors else {}
+        for key, attname, _ in foreign_keys:
+            value = row.get(attname, row.get(key))
+            if value in (None, ''):
+                errors[key] = [{'message': 'This field is required.',
+                                'code': 'required'}]
+            else:
+                data[attname] = value
+
+        if errors:
+            rejected.append((number, row, errors))
+        else:
+            valid.append((number, data))
+
+    return valid, rejected
+
+
+class CatalogImporter:
+    """Streaming importer of products or reviews
+
+    Attributes
+    ----------
+    kind : str
+        `products` or `reviews`
+    service
+        CRUD service writing imported entries
+    batch_size : int
+        Number of rows validated and written at once
+    max_pending : int
+        Maximum number of batches read ahead of writing
+    checkpoint_path : Path
+        File with number of the last imported row
+    dead_letter_path : Path
+        File where rejected rows are appended as JSON lines
+
+    Methods
+    -------
+    run(path, format=None, executor=None)
+        Import rows of file
+
+    """
+
+    def __init__(
+        self, kind: str, service, checkpoint_path: Path,
+        dead_letter_path: Path, batch_size: int = DEFAULT_BATCH_SIZE,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ) -> None:
+        if kind not in KINDS:
+            raise ValueError(f'Unknown import kind: {kind}')
+
+        self.kind = kind
+        self.service = service
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.checkpoint_path = checkpoint_path
+        self.dead_letter_path = dead_letter_path
+
+    def read_checkpoint(self) -> Tuple[int, Optional[int]]:
+        """Return number of the last imported row and dead-letter size"""
+        if not self.checkpoint_path.exists():
+            return 0, None
+
+        checkpoint = json.loads(self.checkpoint_path.read_text())
+        return checkpoint['line'], checkpoint.get('dead_letter_size')
+
+    def write_checkpoint(self, line: int, dead_letter_size: int) -> None:
+        """Atomically write number of the last imported row"""
+        tmp_path = self.checkpoint_path.with_name(
+            self.checkpoint_path.name + '.tmp'
+        )
+        tmp_path.write_text(json.dumps(
+            {'line': line, 'dead_letter_size': dead_letter_size}
+        ))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _batches(
+        self, rows: Iterator[Tuple[int, dict]], after: int
+    ) -> Iterator[list]:
+        batch = []
+        for number, row in rows:
+            if number <= after:
+                continue
+
+            batch.append((number, row))
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def _check_foreign_keys(self, valid: list) -> Tuple[list, list]:
+        """Reject rows referencing missing entries, one query per key"""
+        rejected = []
+        for key, attname, model in KINDS[self.kind][1]:
+            to_python = model._meta.pk.to_python
+            values = set()
+            for number, data in valid:
+                try:
+                    data[attname] = to_python(data[attname])
+                except ValidationError:
+                    data[attname] = None
+                values.add(data[attname])
+
+            existing = set(model.objects.filter(
+                pk__in=values - {None}
+            ).values_list('pk', flat=True))
+            checked = []
+            for number, data in valid:
+                if data[attname] in existing:
+                    checked.append((number, data))
+                else:
+                    rejected.append((number, data, {key: [{
+                        'message': f'{model._meta.object_name} not found',
+                        'code': 'invalid',
+                    }]}))
+
+            valid = checked
+
+        return valid, rejected
+
+    def _write(
+        self, source: str, valid: list, rejected: list
+    ) -> Tuple[int, list]:
+        """Write valid rows to DB and return number of written rows
+        with rejected rows
+
+        Rows get primary keys derived from source and row number, rows
+        which are already in DB (committed before a crash) are skipped
+        and not counted
+
+        """
+        valid, missing = self._check_foreign_keys(valid)
+        rejected = rejected + missing
+        model = self.service.model
+        pk_name = model._meta.pk.attname
+        pks = [uuid5(IMPORT_NAMESPACE, f'{source}:{number}')
+               for number, _ in valid]
+        existing = set(model.objects.filter(
+            pk__in=pks
+        ).values_list('pk', flat=True))
+        rows = [
+            (number, data, pk) for (number, data), pk in zip(valid, pks)
+            if pk not in existing
+        ]
+        # Rows are already cleaned by workers, so forms aren't run again
+        result = self.service.bulk_create(
+            [{**data, pk_name: pk} for _, data, pk in rows],
+            batch_size=self.batch_size, cleaned=True
+        )
+        for index, form in result.errors.items():
+            number, data, _ = rows[index]
+            rejected.append((number, data, form.errors.get_json_data()))
+
+        rejected.sort(key=lambda item: item[0])
+        return len(result.entries), rejected
+
+    @staticmethod
+    def _reject(rejected: list, dead_letter) -> None:
+        for number, row, errors in rejected:
+            dead_letter.write(json.dumps(
+                {'line': number, 'row': row, 'errors': errors},
+                cls=DjangoJSONEncoder
+            ) + '\n')
+
+        dead_letter.flush()
+
+    def run(
+        self, path: Path, format: str = None,
+        executor: Optional[Executor] = None
+    ) -> ImportStats:
+        """Import rows of file resuming after the checkpoint
+
+        Rows are validated by executor if it's passed, otherwise in the
+        current process. Rejected rows and checkpoint are written right
+        after commit of a batch, rows committed before the checkpoint
+        are skipped on resume, so every row is imported or rejected once
+
+        """
+        last_line, dead_letter_size = self.read_checkpoint()
+        source = str(path.resolve())
+        imported = rejected = 0
+        pending = deque()
+
+        def submit(batch: list) -> None:
+            if executor is None:
+                future = Future()
+                future.set_result(validate_rows(self.kind, batch))
+            else:
+                future = executor.submit(validate_rows, self.kind, batch)
+
+            pending.append((batch[-1][0], future))
+
+        def write_oldest(dead_letter) -> None:
+            nonlocal imported, rejected, last_line
+            last_line, future = pending.popleft()
+            batch_imported, batch_rejected = self._write(
+                source, *future.result()
+            )
+            self._reject(batch_rejected, dead_letter)
+            self.write_checkpoint(last_line, dead_letter.tell())
+            imported += batch_imported
+            rejected += len(batch_rejected)
+
+        with self.dead_letter_path.open('a') as dead_letter:
+            if dead_letter_size is not None:
+                # Drop rows rejected after the checkpoint, they're read again
+                dead_letter.truncate(dead_letter_size)
+            for batch in self._batches(read_rows(path, format), last_line):
+                submit(batch)
+                while len(pending) >= self.max_pending:
+                    write_oldest(dead_letter)
+
+            while pending:
+                write_oldest(dead_letter)
+
+        return ImportStats(imported, rejected, last_line)
+
+
+def create_executor(workers: int) -> Optional[Executor]:
+    """Return process pool validating rows or `None` for zero workers"""
+    if not workers:
+        return None
+
+    return ProcessPoolExecutor(workers, initializer=_setup_worker)
@@ -0,0 +1,94 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from products.benchmarks import (
+    DEFAULT_ITERATIONS, DEFAULT_SEED, DEFAULT_SIZES, DEFAULT_TOLERANCE,
+    compare, run_benchmarks
+)
+
+
+class Command(BaseCommand):
+    """Benchmark product and review services on generated data
+
+    Benchmarks run in a throwaway test database, so real data is never
+    touched. Results are written as JSON and compared with a baseline,
+    the command fails if any operation regresses
+
+    """
+
+    help = 'Benchmark product and review services on generated data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+            help='Numbers of generated products and reviews'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=DEFAULT_ITERATIONS,
+            help='Number of calls of every operation'
+        )
+        parser.add_argument(
+            '--operations', nargs='+',
+            help='Names of benchmarked operations, all by default'
+        )
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+        parser.add_argument(
+            '--output', type=Path, help='File to write results to'
+        )
+        parser.add_argument(
+            '--baseline', type=Path, help='File with baseline results'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Write results to baseline file instead of comparing'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='Allowed share of slowdown against baseline'
+        )
+
+    def handle(self, *args, **options):
+        # Test databases of all aliases, replicas mirror the primary one
+        old_config = setup_databases(
+            verbosity=0, interactive=False, serialized_aliases=set()
+        )
+        try:
+            results = run_benchmarks(
+                options['sizes'], options['iterations'], options['seed'],
+                options['operations'],
+                reset=lambda: call_command(
+                    'flush', interactive=False, verbosity=0
+                )
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            options['output'].write_text(output)
+        else:
+            self.stdout.write(output)
+
+        baseline_path = options['baseline']
+        if baseline_path is None:
+            return
+        if options['save_baseline']:
+            baseline_path.write_text(output)
+            return
+        if not baseline_path.exists():
+            raise CommandError(f'Baseline {baseline_path} does not exist')
+
+        regressions = compare(
+            results, json.loads(baseline_path.read_text()),
+            options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
+
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from products.analytics import CHUNK_SIZE, DEFAULT_WINDOW
+from products.services.products import ProductService
+
+
+class Command(BaseCommand):
+    """Write JSON report of prices and ratings of catalog"""
+
+    help = 'Write JSON report of prices and ratings of catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', type=Path,
+            help='File of report, by default it is written to stdout'
+        )
+        parser.add_argument(
+            '--window', type=int, default=DEFAULT_WINDOW,
+            help='Number of days of moving averages'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Number of rows loaded at once'
+        )
+
+    def handle(self, *args, **options):
+        report = ProductService().analytics_report(
+            options['window'], options['chunk_size']
+        )
+        if options['output'] is None:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        with options['output'].open('w') as file:
+            json.dump(report, file, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Report is written to {options["output"]}'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.services.rankings import compact_rankings
+
+
+class Command(BaseCommand):
+    """Rebuild daily review counts and product rankings from scratch"""
+
+    help = 'Rebuild daily review counts and product rankings from scratch'
+
+    def handle(self, *args, **options):
+        counts = compact_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rankings from {counts} daily review counts'
+        ))
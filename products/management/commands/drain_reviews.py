@@ -0,0 +1,54 @@
+from time import sleep, time
+
+from django.core.management.base import BaseCommand
+
+from products.review_queue import DEFAULT_LEASE, drain, get_journal
+from products.services.reviews import ReviewService
+from services.strategies import DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Write reviews queued by `ProductService.submit_review()`
+
+    Without `--interval` the queue is drained once, otherwise the command
+    keeps polling it
+
+    """
+
+    help = 'Write reviews queued by ProductService.submit_review()'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of reviews written in one transaction'
+        )
+        parser.add_argument(
+            '--lease', type=int, default=DEFAULT_LEASE,
+            help='Seconds claimed reviews are reserved for this worker'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between polls of empty queue, 0 to drain once'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=7,
+            help='Days finished submissions are kept for status checks'
+        )
+
+    def handle(self, *args, **options):
+        journal = get_journal()
+        service = ReviewService()
+        while True:
+            stats = drain(
+                service, journal, options['batch_size'], options['lease']
+            )
+            journal.purge(time() - options['keep_days'] * 24 * 60 * 60)
+            if stats.written or stats.rejected:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Written {stats.written} reviews, '
+                    f'rejected {stats.rejected}'
+                ))
+            if not options['interval']:
+                break
+
+            sleep(options['interval'])
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import (
+    DEFAULT_BATCH_SIZE, DEFAULT_MAX_PENDING, KINDS, CatalogImporter,
+    create_executor
+)
+from products.services.products import ProductService
+
+
+class Command(BaseCommand):
+    """Import products or reviews from CSV or NDJSON file
+
+    Import is resumed from the checkpoint file if it exists, rejected rows
+    are appended to the dead-letter file
+
+    """
+
+    help = 'Import products or reviews from CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help='File to import')
+        parser.add_argument('--kind', choices=KINDS, default='products')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'),
+            help='Format of file, by default chosen by extension'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows validated and written at once'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Number of validating processes, 0 to validate inline'
+        )
+        parser.add_argument(
+            '--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+            help='Maximum number of batches read ahead of writing'
+        )
+        parser.add_argument(
+            '--checkpoint', type=Path,
+            help='Checkpoint file, by default <path>.checkpoint'
+        )
+        parser.add_argument(
+            '--dead-letter', type=Path,
+            help='File for rejected rows, by default <path>.rejected'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.exists():
+            raise CommandError(f'File {path} does not exist')
+
+        service = ProductService()
+        if options['kind'] == 'reviews':
+            service = service.review_service
+
+        importer = CatalogImporter(
+            options['kind'], service,
+            options['checkpoint'] or path.with_name(path.name + '.checkpoint'),
+            options['dead_letter'] or path.with_name(path.name + '.rejected'),
+            options['batch_size'], options['max_pending']
+        )
+        executor = create_executor(options['workers'])
+        try:
+            stats = importer.run(path, options['format'], executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.imported} rows, rejected {stats.rejected}, '
+            f'last row {stats.last_line}'
+        ))
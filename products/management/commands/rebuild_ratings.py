@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products.services.ratings import rebuild_rating_aggregates
+from services.strategies import DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Recompute rating aggregates of all products from reviews"""
+
+    help = 'Recompute rating aggregates of all products from reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of products updated in one transaction'
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt ratings of {updated} products')
+        )
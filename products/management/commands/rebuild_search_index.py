@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Rebuild full-text search index of products"""
+
+    help = 'Rebuild full-text search index of products'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.install()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt search index'))
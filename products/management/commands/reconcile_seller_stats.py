@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products.services.sellers import rebuild_seller_stats
+from services.strategies import DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Recompute summaries of all sellers from products"""
+
+    help = 'Recompute summaries of all sellers from products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of sellers updated in one transaction'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_seller_stats(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled summaries of {rebuilt} sellers')
+        )
@@ -0,0 +1,39 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from products.services.rankings import refresh_rankings
+from services.strategies import DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Update rankings of products changed by review writes
+
+    Without `--interval` queued products are updated once, otherwise the
+    command keeps polling the queue
+
+    """
+
+    help = 'Update rankings of products changed by review writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of products updated in one transaction'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between refreshes, 0 to refresh once'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            refreshed = refresh_rankings(options['batch_size'])
+            if refreshed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Updated rankings of {refreshed} products'
+                ))
+            if not options['interval']:
+                break
+
+            sleep(options['interval'])
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_review_daily_counts(apps, schema_editor):
+    Review = apps.get_model('products', 'Review')
+    ReviewDailyCount = apps.get_model('products', 'ReviewDailyCount')
+    counts = Review.objects.order_by().values(
+        'product_id', 'pub_date'
+    ).annotate(count=Count('pk'))
+    ReviewDailyCount.objects.bulk_create(
+        (
+            ReviewDailyCount(
+                product_id=row['product_id'], day=row['pub_date'],
+                count=row['count']
+            )
+            for row in counts.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewDailyCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_review_counts', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='review_daily_count_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='review_daily_count_unique')],
+            },
+        ),
+        migrations.RunPython(
+            fill_review_daily_counts, migrations.RunPython.noop
+        ),
+    ]
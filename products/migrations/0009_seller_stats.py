@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_seller_stats(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    SellerStats = apps.get_model('products', 'SellerStats')
+    stats = Product.objects.order_by().values('seller').annotate(
+        product_count=Count('pk'), price_sum=Sum('price'),
+        review_count=Sum('review_count'), rating_sum=Sum('rating_sum')
+    )
+    SellerStats.objects.bulk_create(
+        (
+            SellerStats(user_id=row.pop('seller'), **row)
+            for row in stats.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('products', '0008_review_daily_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='seller_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_seller_stats, migrations.RunPython.noop),
+    ]
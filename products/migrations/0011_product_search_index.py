@@ -0,0 +1,57 @@
+from django.db import migrations
+
+
+INDEX_NAME = 'product_search_idx'
+
+
+def _search_index():
+    """Return GIN index over search vector of `PostgresSearchBackend`"""
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(
+        SearchVector('title', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english'),
+        name=INDEX_NAME
+    )
+
+
+def _has_index(schema_editor, model) -> bool:
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+
+    return INDEX_NAME in constraints
+
+
+def add_search_index(apps, schema_editor):
+    # Index of SQLite is a FTS5 table installed after migrations
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Product = apps.get_model('products', 'Product')
+    # Earlier versions created the index after migrations
+    if not _has_index(schema_editor, Product):
+        schema_editor.add_index(Product, _search_index())
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Product = apps.get_model('products', 'Product')
+    if _has_index(schema_editor, Product):
+        schema_editor.remove_index(Product, _search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_aggregates_not_editable'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
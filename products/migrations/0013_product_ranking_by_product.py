@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_ranking'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='productranking',
+            name='product_ranking_unique',
+        ),
+        migrations.RemoveField(
+            model_name='productranking',
+            name='position',
+        ),
+        migrations.AddConstraint(
+            model_name='productranking',
+            constraint=models.UniqueConstraint(fields=('kind', 'product'), name='product_ranking_kind_product_unique'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_product_ranking_by_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingUpdate',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='products.product')),
+            ],
+        ),
+    ]
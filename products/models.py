@@ -25,6 +25,16 @@ class Product(models.Model):
         Seller that sells the product
     pub_date : DateField
         Product published date
+    updated_at : DateTimeField
+        Time of the last change of product or its rating
+    version : PositiveIntegerField
+        Version for optimistic concurrency, incremented by service updates
+    review_count : PositiveIntegerField
+        Number of reviews of product
+    rating_sum : PositiveIntegerField
+        Sum of ratings of reviews
+    rating_0 ... rating_5 : PositiveIntegerField
+        Number of reviews with each rating
 
     """
     uuid = models.UUIDField(
@@ -37,10 +47,43 @@ class Product(models.Model):
         User, on_delete=models.CASCADE, related_name='products'
     )
     pub_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # Rating aggregates, maintained by ReviewService
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_0 = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'uuid'], name='product_pub_date_uuid_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title[:50]
 
+    @property
+    def average_rating(self) -> float:
+        """Average rating of product, `None` if there are no reviews"""
+        if not self.review_count:
+            return None
+
+        return self.rating_sum / self.review_count
+
+    @property
+    def rating_histogram(self) -> list:
+        """Number of reviews with each rating from 0 to 5"""
+        return [self.rating_0, self.rating_1, self.rating_2,
+                self.rating_3, self.rating_4, self.rating_5]
+
 
 class Review(models.Model):
     """Review model
@@ -59,6 +102,10 @@ class Review(models.Model):
         Author of review
     pub_date : DateField
         Review published date
+    updated_at : DateTimeField
+        Time of the last change of review
+    version : PositiveIntegerField
+        Version for optimistic concurrency, incremented by service updates
 
     """
 
@@ -76,7 +123,163 @@ class Review(models.Model):
         User, on_delete=models.CASCADE, related_name='reviews'
     )
     pub_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'uuid'], name='review_pub_date_uuid_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:50]
 
+
+class ReviewDailyCount(models.Model):
+    """Number of reviews of product published in a day
+
+    Buckets are maintained by ReviewService and used to compute rankings
+
+    Attributes
+    ----------
+    product : ForeignKey
+        Reviewed product
+    day : DateField
+        Published date of reviews
+    count : PositiveIntegerField
+        Number of reviews
+
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='daily_review_counts'
+    )
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'day'], name='review_daily_count_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='review_daily_count_day_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.product_id} {self.day}: {self.count}'
+
+
+class ProductRanking(models.Model):
+    """Entry of a stored product ranking
+
+    Rankings are bounded top lists maintained by ReviewService and
+    `compact_rankings` command, cached on read. Entries are ordered by
+    score and product, so a changed product updates only its own row
+
+    Attributes
+    ----------
+    kind : CharField
+        Kind of ranking
+    product : ForeignKey
+        Ranked product
+    score : FloatField
+        Score of product
+    epoch : DateField
+        Epoch of forward decay of scores of ranking
+
+    """
+
+    kind = models.CharField(max_length=20)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='+'
+    )
+    score = models.FloatField()
+    epoch = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'product'],
+                name='product_ranking_kind_product_unique'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind}: {self.product_id} ({self.score})'
+
+
+class RankingUpdate(models.Model):
+    """Product whose scores changed since rankings were last refreshed
+
+    Rows are queued by ReviewService in transactions of review writes and
+    applied in batches by `refresh_rankings` command
+
+    Attributes
+    ----------
+    product : OneToOneField
+        Changed product
+
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+
+    def __str__(self) -> str:
+        return str(self.product_id)
+
+
+class SellerStats(models.Model):
+    """Summary of products and reviews of a seller
+
+    Maintained by ProductService and ReviewService, reconciled by
+    `reconcile_seller_stats` command
+
+    Attributes
+    ----------
+    user : OneToOneField
+        Seller, primary key
+    product_count : PositiveIntegerField
+        Number of products
+    price_sum : DecimalField
+        Sum of prices of products
+    review_count : PositiveIntegerField
+        Number of reviews of products
+    rating_sum : PositiveIntegerField
+        Sum of ratings of reviews of products
+
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='seller_stats'
+    )
+    product_count = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.product_count} products'
+
+    @property
+    def average_price(self):
+        """Average price of products, `None` if there are no products"""
+        if not self.product_count:
+            return None
+
+        return self.price_sum / self.product_count
+
+    @property
+    def average_rating(self) -> float:
+        """Average rating of reviews, `None` if there are no reviews"""
+        if not self.review_count:
+            return None
+
+        return self.rating_sum / self.review_count
@@ -0,0 +1,319 @@
+"""Module with write-behind queue of submitted reviews
+
+Submitted reviews are validated and appended to a local SQLite journal,
+so a submission costs one local write instead of product fetch and
+insert in the main database. `drain()` (run by `drain_reviews` command)
+claims pending entries in batches, writes each batch with one
+`bulk_create()` and updates rating aggregates of reviewed products once
+per batch.
+
+Journal handle of a submission becomes primary key of its review, so a
+batch retried after a crash skips reviews that were already written.
+Claimed entries that aren't completed within lease are claimed again
+
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from functools import lru_cache
+import json
+from pathlib import Path
+import sqlite3
+import threading
+from time import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Model
+
+from services import BaseCRUDService
+from services.strategies import DEFAULT_BATCH_SIZE
+from .models import Product, Review
+
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+DONE = 'done'
+REJECTED = 'rejected'
+
+# Seconds a claimed entry is reserved for a worker
+DEFAULT_LEASE = 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    handle TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL,
+    status TEXT NOT NULL,
+    errors TEXT,
+    claimed_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_status_idx
+    ON submissions (status, id);
+'''
+
+
+class Submission(NamedTuple):
+    """State of a submitted review
+
+    Attributes
+    ----------
+    handle : UUID
+        Handle of submission, pk of review once it's written
+    status : str
+        `pending`, `processing`, `done` or `rejected`
+    errors : dict
+        Lists of error messages by field of rejected submission
+
+    """
+
+    handle: UUID
+    status: str
+    errors: Optional[Dict[str, List[str]]] = None
+
+
+class DrainStats(NamedTuple):
+    """Result of draining the queue
+
+    Attributes
+    ----------
+    written : int
+        Number of written reviews
+    rejected : int
+        Number of rejected submissions
+
+    """
+
+    written: int = 0
+    rejected: int = 0
+
+
+class ReviewJournal:
+    """Durable journal of submitted reviews in a local SQLite file
+
+    Every thread uses its own connection. Journal is in WAL mode, so
+    submissions don't wait for draining workers
+
+    Methods
+    -------
+    append(data)
+        Append a submission and return its handle
+    status(handle)
+        Return state of submission
+    claim(limit, lease)
+        Reserve pending submissions for a worker
+    complete(done, rejected)
+        Mark claimed submissions as done or rejected
+    purge(before)
+        Remove finished submissions updated before timestamp
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection of the current thread, created on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+
+        return connection
+
+    @contextmanager
+    def _transaction(self, mode: str = '') -> Iterator[sqlite3.Connection]:
+        """Run the block in a transaction of the thread connection"""
+        connection = self.connection
+        connection.execute(f'BEGIN {mode}')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        connection.execute('COMMIT')
+
+    def append(self, data: dict) -> UUID:
+        """Append a submission and return its handle"""
+        handle = uuid4()
+        self.connection.execute(
+            'INSERT INTO submissions (handle, data, status, updated_at) '
+            'VALUES (?, ?, ?, ?)',
+            (str(handle), json.dumps(data, default=str), PENDING, time())
+        )
+        return handle
+
+    def status(self, handle: UUID) -> Optional[Submission]:
+        """Return state of submission or `None` if it's unknown"""
+        row = self.connection.execute(
+            'SELECT status, errors FROM submissions WHERE handle = ?',
+            (str(handle),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, errors = row
+        return Submission(
+            UUID(str(handle)), status, errors and json.loads(errors)
+        )
+
+    def claim(
+        self, limit: int, lease: int = DEFAULT_LEASE
+    ) -> List[Tuple[UUID, dict]]:
+        """Reserve the oldest pending submissions for a worker
+
+        Submissions claimed longer than lease seconds ago are claimed again
+
+        """
+        now = time()
+        with self._transaction('IMMEDIATE') as connection:
+            rows = connection.execute(
+                'SELECT id, handle, data FROM submissions '
+                'WHERE status = ? OR (status = ? AND claimed_at < ?) '
+                'ORDER BY id LIMIT ?',
+                (PENDING, PROCESSING, now - lease, limit)
+            ).fetchall()
+            connection.executemany(
+                'UPDATE submissions SET status = ?, claimed_at = ?, '
+                'updated_at = ? WHERE id = ?',
+                [(PROCESSING, now, now, row[0]) for row in rows]
+            )
+
+        return [(UUID(handle), json.loads(data)) for _, handle, data in rows]
+
+    def complete(
+        self, done: List[UUID], rejected: Dict[UUID, dict] = None
+    ) -> None:
+        """Mark claimed submissions as done or rejected with errors"""
+        now = time()
+        rows = [(DONE, None, now, str(handle)) for handle in done]
+        rows.extend(
+            (REJECTED, json.dumps(errors), now, str(handle))
+            for handle, errors in (rejected or {}).items()
+        )
+        with self._transaction() as connection:
+            connection.executemany(
+                'UPDATE submissions SET status = ?, errors = ?, '
+                'updated_at = ? WHERE handle = ?',
+                rows
+            )
+
+    def purge(self, before: float) -> int:
+        """Remove finished submissions updated before timestamp"""
+        return self.connection.execute(
+            'DELETE FROM submissions WHERE status IN (?, ?) '
+            'AND updated_at < ?',
+            (DONE, REJECTED, before)
+        ).rowcount
+
+
+@lru_cache(maxsize=None)
+def _open(path: str) -> ReviewJournal:
+    return ReviewJournal(path)
+
+
+def get_journal() -> ReviewJournal:
+    """Return journal at path of `REVIEW_QUEUE_PATH` setting"""
+    return _open(str(settings.REVIEW_QUEUE_PATH))
+
+
+def _existing(model: Model, pks: set) -> set:
+    return set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+def write_batch(
+    entries: List[Tuple[UUID, dict]], service: BaseCRUDService,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Tuple[List[UUID], Dict[UUID, dict]]:
+    """Write claimed submissions with one bulk create of review service
+
+    Returns handles of written (or already written) submissions and
+    errors of rejected ones by handle, including rows rejected by bulk
+    create (e.g. of products deleted after the existence check)
+
+    """
+    User = get_user_model()
+    to_product_pk = Product._meta.pk.to_python
+    to_user_pk = User._meta.pk.to_python
+    entries = [
+        (handle, {
+            **data,
+            'product_id': to_product_pk(data['product_id']),
+            'author_id': to_user_pk(data['author_id']),
+        })
+        for handle, data in entries
+    ]
+    written = _existing(Review, {handle for handle, _ in entries})
+    products = _existing(Product, {data['product_id'] for _, data in entries})
+    authors = _existing(User, {data['author_id'] for _, data in entries})
+
+    rows = []
+    handles = []
+    rejected = {}
+    for handle, data in entries:
+        if handle in written:
+            continue
+
+        errors = {}
+        if data['product_id'] not in products:
+            errors['product'] = ['Product does not exist.']
+        if data['author_id'] not in authors:
+            errors['author'] = ['Author does not exist.']
+        if errors:
+            rejected[handle] = errors
+            continue
+
+        rows.append({Review._meta.pk.name: handle, **data})
+        handles.append(handle)
+
+    result = service.bulk_create(rows, batch_size=batch_size, cleaned=True)
+    for index, form in result.errors.items():
+        rejected[handles[index]] = {
+            field: list(messages) for field, messages in form.errors.items()
+        }
+
+    done = list(written)
+    done.extend(
+        handle for index, handle in enumerate(handles)
+        if index not in result.errors
+    )
+    return done, rejected
+
+
+def drain(
+    service: BaseCRUDService, journal: ReviewJournal = None,
+    batch_size: int = DEFAULT_BATCH_SIZE, lease: int = DEFAULT_LEASE,
+    max_batches: int = None
+) -> DrainStats:
+    """Write pending submissions in batches until the queue is empty
+
+    Journal is updated after commit of every batch
+
+    """
+    journal = journal or get_journal()
+    written = rejected = batches = 0
+    while max_batches is None or batches < max_batches:
+        entries = journal.claim(batch_size, lease)
+        if not entries:
+            break
+
+        with transaction.atomic():
+            done, errors = write_batch(entries, service, batch_size)
+
+        journal.complete(done, errors)
+        written += len(done)
+        rejected += len(errors)
+        batches += 1
+
+    return DrainStats(written, rejected)
@@ -0,0 +1,346 @@
+"""Module with full-text search of products
+
+Search backend is chosen by `PRODUCT_SEARCH_BACKEND` setting (dotted path
+to backend class) or by vendor of products database: FTS5 virtual table on
+SQLite, GIN indexed search vector on PostgreSQL and `icontains` lookups on
+other databases
+
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import re
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q, QuerySet
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+DEFAULT_LIMIT = 20
+
+
+def _filter(products: QuerySet, filters: Optional[dict]) -> QuerySet:
+    """Apply price range and seller filters to products"""
+    filters = filters or {}
+    condition = Q()
+    if filters.get('price_min') is not None:
+        condition &= Q(price__gte=filters['price_min'])
+    if filters.get('price_max') is not None:
+        condition &= Q(price__lte=filters['price_max'])
+    if filters.get('seller') is not None:
+        condition &= Q(seller=filters['seller'])
+
+    return products.filter(condition)
+
+
+class BaseSearchBackend(ABC):
+    """Base class for product search backends
+
+    Methods
+    -------
+    install()
+        Create or repair search index
+    rebuild()
+        Rebuild search index from scratch
+    filter_products(products, query)
+        Return products matching query ordered by rank
+    search(query, filters=None, limit=20)
+        Return pks of products matching query ordered by rank
+
+    """
+
+    def __init__(self, using: str) -> None:
+        self.using = using
+        self.connection = connections[using]
+
+    def install(self) -> None:
+        """Create or repair search index"""
+        pass
+
+    def _is_table_created(self) -> bool:
+        """Check is products table created by migrations"""
+        with self.connection.cursor() as cursor:
+            tables = self.connection.introspection.table_names(cursor)
+
+        return Product._meta.db_table in tables
+
+    def rebuild(self) -> None:
+        """Rebuild search index from scratch"""
+        pass
+
+    @abstractmethod
+    def filter_products(self, products: QuerySet, query: str) -> QuerySet:
+        """Return products matching query ordered by rank
+
+        Rank is computed by database, so the result can be paginated
+        without fetching all matches
+
+        """
+        pass
+
+    def search(
+        self, query: str, filters: dict = None,
+        limit: Optional[int] = DEFAULT_LIMIT
+    ) -> list:
+        """Return pks of products matching query ordered by rank
+
+        Parameters
+        ----------
+        query : str
+            Search query
+        filters : dict, optional
+            `price_min`, `price_max` and `seller` filters
+        limit : int, optional
+            Maximum number of results, `None` for no limit
+
+        """
+        products = self.filter_products(
+            _filter(Product.objects.using(self.using), filters), query
+        ).values_list('pk', flat=True)
+        return list(products[:limit] if limit is not None else products)
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Search backend without index based on `icontains` lookups"""
+
+    def filter_products(self, products: QuerySet, query: str) -> QuerySet:
+        """Return products containing all words of query, not ranked"""
+        words = query.split()
+        if not words:
+            return products.none()
+
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(title__icontains=word) | Q(description__icontains=word)
+            )
+
+        return products.filter(condition)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Search backend based on FTS5 virtual table of SQLite
+
+    Index is a contentless FTS5 table kept in sync by triggers, so writes
+    bypassing ORM are indexed too. Its documents are keyed by `INTEGER
+    PRIMARY KEY` of a table of product pks, which `VACUUM` keeps, unlike
+    implicit rowids of products table
+
+    """
+
+    # Weights of title and description in bm25 rank
+    weights = (10.0, 1.0)
+
+    def __init__(self, using: str) -> None:
+        super().__init__(using)
+        quote = self.connection.ops.quote_name
+        self.table = Product._meta.db_table
+        self.fts_table = f'{self.table}_fts'
+        self.keys_table = f'{self.table}_fts_keys'
+        self._table = quote(self.table)
+        self._fts_table = quote(self.fts_table)
+        self._keys_table = quote(self.keys_table)
+
+    def _key(self, row: str) -> str:
+        """Return SQL of index key of product row (`new` or `old`)"""
+        return f'(SELECT id FROM {self._keys_table} WHERE uuid = {row}.uuid)'
+
+    def _schema(self) -> dict:
+        """Return SQL creating tables and triggers of index by name"""
+        table, fts, keys = self._table, self._fts_table, self._keys_table
+        delete = (
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', {self._key('old')}, old.title, "
+            "old.description);"
+        )
+        insert = (
+            f"INSERT INTO {fts}(rowid, title, description) "
+            f"VALUES ({self._key('new')}, new.title, new.description);"
+        )
+        triggers = {
+            f'{self.fts_table}_ai': (
+                f'AFTER INSERT ON {table} BEGIN '
+                f'INSERT INTO {keys}(uuid) VALUES (new.uuid); {insert} END'
+            ),
+            f'{self.fts_table}_ad': (
+                f'AFTER DELETE ON {table} BEGIN '
+                f'{delete} DELETE FROM {keys} WHERE uuid = old.uuid; END'
+            ),
+            f'{self.fts_table}_au': (
+                f'AFTER UPDATE OF title, description ON {table} '
+                f'BEGIN {delete} {insert} END'
+            ),
+        }
+        return {
+            self.keys_table: (
+                f'CREATE TABLE {keys} '
+                '(id INTEGER PRIMARY KEY, uuid char(32) NOT NULL UNIQUE)'
+            ),
+            self.fts_table: (
+                f'CREATE VIRTUAL TABLE {fts} '
+                "USING fts5(title, description, content='')"
+            ),
+            **{
+                name: f'CREATE TRIGGER {name} {body}'
+                for name, body in triggers.items()
+            },
+        }
+
+    def install(self) -> None:
+        """Create tables and triggers of index, rebuild it if they changed
+
+        SQLite migrations remake tables dropping their triggers, and index
+        of an older layout is replaced, so index is rebuilt whenever any
+        table or trigger is missing or differs
+
+        """
+        if not self._is_table_created():
+            return
+
+        schema = self._schema()
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, type, sql FROM sqlite_master "
+                "WHERE name IN (%s, %s) "
+                "OR (type = 'trigger' AND tbl_name = %s)",
+                [self.keys_table, self.fts_table, self.table]
+            )
+            existing = {name: (type, sql) for name, type, sql in cursor}
+            changed = [
+                name for name, sql in schema.items()
+                if existing.get(name, (None, None))[1] != sql
+            ]
+            for name in changed:
+                if name in existing:
+                    cursor.execute(
+                        f'DROP {existing[name][0].upper()} '
+                        f'{self.connection.ops.quote_name(name)}'
+                    )
+                cursor.execute(schema[name])
+
+        if changed:
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """Rebuild FTS index from products table"""
+        table, fts, keys = self._table, self._fts_table, self._keys_table
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {keys}')
+                cursor.execute(
+                    f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"
+                )
+                cursor.execute(
+                    f'INSERT INTO {keys}(uuid) SELECT uuid FROM {table}'
+                )
+                cursor.execute(
+                    f'INSERT INTO {fts}(rowid, title, description) '
+                    f'SELECT k.id, p.title, p.description FROM {table} p '
+                    f'JOIN {keys} k ON k.uuid = p.uuid'
+                )
+
+    @staticmethod
+    def _match(query: str) -> str:
+        """Return FTS5 query matching all words of query
+
+        Words are quoted, so query syntax can't be injected, and the last
+        word is matched as prefix
+
+        """
+        words = [f'"{word}"' for word in re.findall(r'\w+', query)]
+        if words:
+            words[-1] += '*'
+
+        return ' '.join(words)
+
+    def filter_products(self, products: QuerySet, query: str) -> QuerySet:
+        """Return products matching query ordered by bm25 rank
+
+        Index tables are joined to products, rank is annotated as
+        `search_rank`, lower is better
+
+        """
+        match = self._match(query)
+        if not match:
+            return products.none()
+
+        fts, keys = self._fts_table, self._keys_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return products.extra(
+            select={'search_rank': f'bm25({fts}, {weights})'},
+            tables=[self.fts_table, self.keys_table],
+            where=[
+                f'{fts} MATCH %s', f'{keys}.id = {fts}.rowid',
+                f'{keys}.uuid = {self._table}.uuid',
+            ],
+            params=[match],
+        ).order_by('search_rank')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Search backend based on GIN indexed search vector of PostgreSQL
+
+    GIN index over the same expression is created by migration
+    `0011_product_search_index`
+
+    """
+
+    config = 'english'
+
+    def _vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('description', weight='B', config=self.config)
+        )
+
+    def filter_products(self, products: QuerySet, query: str) -> QuerySet:
+        """Return products matching query ordered by rank
+
+        Rank is annotated as `search_rank`, higher is better
+
+        """
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        if not query.strip():
+            return products.none()
+
+        vector = self._vector()
+        search_query = SearchQuery(
+            query, config=self.config, search_type='websearch'
+        )
+        return products.annotate(
+            search=vector, search_rank=SearchRank(vector, search_query)
+        ).filter(search=search_query).order_by('-search_rank')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using: str = None) -> BaseSearchBackend:
+    """Return search backend for database of products"""
+    if using is None:
+        using = router.db_for_read(Product)
+
+    backend = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if backend is not None:
+        backend_class = import_string(backend)
+    else:
+        backend_class = BACKENDS.get(
+            connections[using].vendor, SimpleSearchBackend
+        )
+
+    return backend_class(using)
+
+
+def install_search_index(using: str, **kwargs) -> None:
+    """Create or repair search index after migrations"""
+    get_search_backend(using).install()
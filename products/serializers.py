@@ -0,0 +1,215 @@
+"""Module with fast JSON serialization of products and reviews
+
+Serializers are compiled once per model: every output field gets a
+getter and an encoder chosen by type of its model field, so an entry is
+encoded with plain function calls instead of `model_to_dict()` and type
+checks of `DjangoJSONEncoder` for every value. Values are encoded like
+by `DjangoJSONEncoder`, so output doesn't depend on JSON backend. orjson
+is used if it's installed, standard library otherwise
+
+"""
+
+from __future__ import annotations
+from datetime import date, datetime
+import json
+from operator import attrgetter
+from typing import (
+    Any, Callable, Iterable, Iterator, List, Sequence, Tuple, Union
+)
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Field, Model
+from django.http import HttpResponse
+
+from .models import Product, Review
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+CONTENT_TYPE = 'application/json'
+
+PRODUCT_FIELDS = (
+    'uuid', 'title', 'description', 'price', ('seller', 'seller_id'),
+    'pub_date', 'updated_at', 'version', 'review_count', 'average_rating',
+    'rating_histogram',
+)
+# Fields of `ProductSummary` rows of product listings
+PRODUCT_SUMMARY_FIELDS = (
+    'uuid', 'title', 'price', ('seller', 'seller_id'), 'pub_date',
+    'review_count', 'average_rating',
+)
+REVIEW_FIELDS = (
+    'uuid', 'text', 'rating', ('author', 'author.username'), 'pub_date',
+)
+# Fields of `ReviewSummary` rows of review listings
+REVIEW_SUMMARY_FIELDS = (
+    'uuid', 'text', 'rating', ('author', 'author_username'), 'pub_date',
+)
+
+
+def dumps(data: Any) -> bytes:
+    """Return compact UTF-8 JSON of data of JSON types"""
+    if orjson is not None:
+        return orjson.dumps(data)
+
+    return json.dumps(
+        data, separators=(',', ':'), ensure_ascii=False
+    ).encode()
+
+
+def encode_datetime(value: datetime) -> str:
+    """Return ISO datetime with milliseconds like `DjangoJSONEncoder`"""
+    text = value.isoformat()
+    if value.microsecond:
+        text = text[:23] + text[26:]
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+
+    return text
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _nullable(encoder: Callable) -> Callable:
+    def encode(value: Any) -> Any:
+        return None if value is None else encoder(value)
+
+    return encode
+
+
+def get_encoder(field: Field) -> Callable:
+    """Return function encoding values of model field to JSON types"""
+    if field.is_relation:
+        encoder = get_encoder(field.target_field)
+    else:
+        internal_type = field.get_internal_type()
+        if internal_type == 'DecimalField':
+            encoder = str
+        elif internal_type == 'DateTimeField':
+            encoder = encode_datetime
+        elif internal_type in ('UUIDField', 'DateField'):
+            # orjson encodes them natively like `DjangoJSONEncoder`
+            encoder = _identity if orjson is not None else (
+                str if internal_type == 'UUIDField' else date.isoformat
+            )
+        else:
+            encoder = _identity
+
+    if encoder is not _identity and field.null:
+        encoder = _nullable(encoder)
+
+    return encoder
+
+
+class ModelSerializer:
+    """Precompiled JSON serializer of model entries
+
+    Parameters
+    ----------
+    model : Model
+        Model of serialized entries or of rows with attributes named like
+        its fields (e.g. summaries)
+    fields
+        Names of output fields or pairs of (name, source), where source
+        is a model field attname or a dotted attribute path. Attributes
+        which aren't model fields (e.g. properties) must have values of
+        JSON types
+
+    Methods
+    -------
+    to_dict(entry)
+        Return entry encoded to a dict of JSON types
+    to_list(entries)
+        Return entries encoded to dicts of JSON types
+    dumps(entry)
+        Return JSON of entry
+    iter_array(entries, chunk_size)
+        Return JSON array of entries as a stream of chunks
+
+    """
+
+    def __init__(
+        self, model: Model, fields: Sequence[Union[str, Tuple[str, str]]]
+    ) -> None:
+        self.model = model
+        names, sources = zip(*(
+            (field, field) if isinstance(field, str) else field
+            for field in fields
+        ))
+        self._names = names
+        # One getter of all values runs in C instead of a call per field
+        getter = attrgetter(*sources)
+        self._get = getter if len(sources) > 1 else (
+            lambda entry: (getter(entry),)
+        )
+        self._encoders: List[Tuple[int, Callable]] = []
+        for index, source in enumerate(sources):
+            encoder = self._get_encoder(source)
+            if encoder is not _identity:
+                self._encoders.append((index, encoder))
+
+    def _get_encoder(self, source: str) -> Callable:
+        """Return encoder of values of source of output field"""
+        try:
+            return get_encoder(self.model._meta.get_field(source))
+        except FieldDoesNotExist:
+            return _identity
+
+    def to_dict(self, entry: Model) -> dict:
+        """Return entry encoded to a dict of JSON types"""
+        values = list(self._get(entry))
+        for index, encode in self._encoders:
+            values[index] = encode(values[index])
+
+        return dict(zip(self._names, values))
+
+    def to_list(self, entries: Iterable[Model]) -> List[dict]:
+        """Return entries encoded to dicts of JSON types"""
+        to_dict = self.to_dict
+        return [to_dict(entry) for entry in entries]
+
+    def dumps(self, entry: Model) -> bytes:
+        """Return JSON of entry"""
+        return dumps(self.to_dict(entry))
+
+    def iter_array(
+        self, entries: Iterable[Model], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """Return JSON array of entries as a stream of chunks
+
+        Only one chunk of entries is encoded at once, so memory doesn't
+        depend on length of array
+
+        """
+        yield b'['
+        chunk = []
+        separator = b''
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) == chunk_size:
+                yield separator + dumps(self.to_list(chunk))[1:-1]
+                separator = b','
+                chunk = []
+
+        if chunk:
+            yield separator + dumps(self.to_list(chunk))[1:-1]
+
+        yield b']'
+
+
+def json_response(data: Any, status: int = 200) -> HttpResponse:
+    """Return response with JSON of data of JSON types"""
+    return HttpResponse(dumps(data), content_type=CONTENT_TYPE, status=status)
+
+
+product_serializer = ModelSerializer(Product, PRODUCT_FIELDS)
+product_summary_serializer = ModelSerializer(Product, PRODUCT_SUMMARY_FIELDS)
+review_serializer = ModelSerializer(Review, REVIEW_FIELDS)
+review_summary_serializer = ModelSerializer(Review, REVIEW_SUMMARY_FIELDS)
@@ -1,56 +1,540 @@
 from __future__ import annotations
+from datetime import datetime
+from functools import partial
 from uuid import UUID
-from typing import Any
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple
 
-from django.db.models import QuerySet, Model
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, QuerySet, Model, Window
+from django.db.models.signals import post_delete, post_save
+from django.db.models.functions import RowNumber
 from django.forms import Form
+from django.http import Http404
 
-from services import BaseCRUDService
-from ..models import Product
+from services import AsyncBaseCRUDService, cache
+from services.pagination import Page
+from services.routing import replica_manager, use_primary
+from services.schema import get_schema
+from services.signals import entries_changed
+from services.strategies import (
+    AsyncCachedCRUDStrategy, BulkResult, CachedCRUDStrategy, Conflict,
+    DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE, MultiGetResult, lock_rows
+)
+from ..models import Product, Review, SellerStats
+from ..review_queue import Submission, get_journal
+from ..summaries import ProductSummary, to_cents
 from ..forms import ProductForm
+from ..export import DEFAULT_CHUNK_SIZE, export
+from ..search import DEFAULT_LIMIT, get_search_backend
+from .rankings import get_top
 from .reviews import ReviewService
+from .sellers import (
+    apply_price_change, apply_product_changes, discount_products, to_decimal
+)
 
 
-class ProductService(BaseCRUDService):
+class ProductReviews(NamedTuple):
+    """Product with its newest reviews
+
+    Attributes
+    ----------
+    product : Product
+        Product
+    reviews : list
+        Newest reviews of product
+
+    """
+
+    product: Product
+    reviews: List[Model]
+
+
+def reviews_key(product_pk: UUID) -> str:
+    """Return cache key of review listing of product"""
+    return f'{cache.make_key(Product, product_pk)}:reviews'
+
+
+def _invalidate_listings(product_pks: Iterable[UUID]) -> None:
+    cache.invalidate_keys(Review, [reviews_key(pk) for pk in product_pks])
+
+
+def _review_saved(sender: Model, instance: Review, **kwargs) -> None:
+    _invalidate_listings([instance.product_id])
+
+
+def _reviews_changed(sender: Model, pks: list, **kwargs) -> None:
+    _invalidate_listings(set(Review.objects.filter(pk__in=pks).values_list(
+        'product_id', flat=True
+    )))
+
+
+def _product_saved(sender: Model, instance: Product, **kwargs) -> None:
+    _invalidate_listings([instance.pk])
+
+
+def _products_changed(sender: Model, pks: list, **kwargs) -> None:
+    _invalidate_listings(pks)
+
+
+def connect_listing_signals() -> None:
+    """Invalidate cached review listings on writes of reviews
+
+    Service writes of reviews also change rating aggregates of products,
+    so writes of products invalidate listings too
+
+    """
+    for sender, saved, changed in (
+        (Review, _review_saved, _reviews_changed),
+        (Product, _product_saved, _products_changed),
+    ):
+        uid = f'review_listings:{sender._meta.label_lower}'
+        post_save.connect(saved, sender=sender, dispatch_uid=uid)
+        post_delete.connect(saved, sender=sender, dispatch_uid=uid)
+        entries_changed.connect(changed, sender=sender, dispatch_uid=uid)
+
+
+class ProductService(AsyncBaseCRUDService):
     """Service with business logic for products
 
+    Every write keeps summaries of sellers up to date in the same
+    transaction
+
     Attributes
     ----------
+    crud_strategy
+        Strategy with cached reads
+    async_crud_strategy
+        Async strategy with cached reads
     model : Model
         Product model
     form : Form
         Product form
+    page_ordering : tuple
+        Newest entries first
     review_service
         Service to work with reviews
+    review_fields : tuple
+        Fields of reviews loaded by `get_reviews`
+    review_author_fields : tuple
+        Fields of review authors loaded by `get_reviews`
 
     Methods
     -------
     get_reviews(product_pk)
-        Return reviews of product
+        Return cached reviews of product
+    get_many_with_reviews(pks, per_product=3)
+        Return many products with their newest reviews
+    list_summaries(after=None, limit=20, cents=False)
+        Return a page of read-only summaries of products
+    aget_reviews(product_pk)
+        Return cached reviews of product asynchronously
     add_review(product_pk, **data)
         Add new review for product
+    aadd_review(product_pk, **data)
+        Add new review for product asynchronously
     remove_review(review_pk)
         Remove a review
+    submit_review(product_pk, **data)
+        Validate a review and queue it to be written later
+    review_status(handle)
+        Return state of a queued review
+    search(query, filters=None, limit=20)
+        Return products matching query ordered by rank
+    top(kind='top_rated', k=10)
+        Return top k products of ranking
+    seller_summary(user)
+        Return summary of products and reviews of seller
+    analytics_report(window=7, chunk_size=100000)
+        Return report of prices and ratings of catalog
+    export(kind='products', format='csv', since=None, chunk_size=2000)
+        Return a stream of exported products or reviews
 
     """
 
+    crud_strategy = CachedCRUDStrategy
+    async_crud_strategy = AsyncCachedCRUDStrategy
     model = Product
     form = ProductForm
+    page_ordering = ('-pub_date', '-uuid')
     review_service = ReviewService()
+    review_fields = ('text', 'product', 'rating', 'author', 'pub_date')
+    review_author_fields = ('username', 'first_name', 'last_name')
+
+    def __init__(self) -> None:
+        super().__init__()
+        connect_listing_signals()
+
+    def _get_counted(self, pks: Iterable[UUID]) -> Dict[UUID, tuple]:
+        """Return (seller pk, price, review count, rating sum) by pk
+
+        Rows are locked by `lock_rows()`
+
+        """
+        return lock_rows(
+            Product, pks, ('seller_id', 'price', 'review_count', 'rating_sum')
+        )
+
+    @transaction.atomic
+    def create(self, **data) -> Any[Model, Form]:
+        """Create a new product and count it in summary of seller"""
+        product = super().create(**data)
+        if isinstance(product, Model):
+            apply_product_changes([(product.seller_id, 1, product.price)])
+
+        return product
+
+    @transaction.atomic
+    def create_cleaned(self, **data) -> Model:
+        """Create a new product from cleaned data and count it"""
+        product = super().create_cleaned(**data)
+        apply_product_changes([(product.seller_id, 1, product.price)])
+        return product
+
+    def update(self, pk: UUID, **data) -> Any[Model, Form, Conflict]:
+        """Update a product and recount price in summary of seller
+
+        Accepts `version` and `partial` like `SimpleCRUDStrategy.update()`.
+        Summary is touched only if price is passed. With `version` the
+        summary is recounted by a single UPDATE before the product is
+        updated, so the product still isn't selected first, and the
+        recount is rolled back if the product isn't updated
+
+        """
+        if 'price' not in data:
+            return super().update(pk, **data)
+
+        if data.get('version') is not None:
+            return self._update_versioned(pk, **data)
+
+        with transaction.atomic():
+            old = self._get_counted([pk]).get(
+                self.model._meta.pk.to_python(pk)
+            )
+            product = super().update(pk, **data)
+            if (
+                old is not None and isinstance(product, Model)
+                and 'price' not in product.get_deferred_fields()
+            ):
+                apply_product_changes(
+                    [(old[0], 0, to_decimal(product.price) - old[1])]
+                )
+
+        return product
+
+    def _update_versioned(
+        self, pk: UUID, version: int, **data
+    ) -> Any[Model, Form, Conflict]:
+        """Update a product with version and price"""
+        try:
+            price = self.form.base_fields['price'].clean(data['price'])
+        except ValidationError:
+            return super().update(pk, version=version, **data)
+
+        with transaction.atomic():
+            apply_price_change(pk, version, price)
+            product = super().update(pk, version=version, **data)
+            if not isinstance(product, Model):
+                transaction.set_rollback(True)
+
+        return product
+
+    @transaction.atomic
+    def delete(self, pk: UUID) -> None:
+        """Delete a product and discount it with reviews from summary"""
+        old = self._get_counted([pk])
+        super().delete(pk)
+        discount_products(old.values())
+
+    @transaction.atomic
+    def bulk_create(
+        self, rows: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+        cleaned: bool = False
+    ) -> BulkResult:
+        """Create new products and count them in summaries of sellers"""
+        result = super().bulk_create(
+            rows, batch_size=batch_size, cleaned=cleaned
+        )
+        apply_product_changes(
+            (product.seller_id, 1, product.price)
+            for product in result.entries
+        )
+        return result
+
+    @transaction.atomic
+    def bulk_update(
+        self, pk_to_data: Dict[UUID, dict],
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> BulkResult:
+        """Update products and recount prices in summaries of sellers"""
+        to_python = self.model._meta.pk.to_python
+        old = self._get_counted(
+            to_python(pk) for pk, data in pk_to_data.items()
+            if 'price' in data
+        )
+        result = super().bulk_update(pk_to_data, batch_size=batch_size)
+        apply_product_changes(
+            (
+                old[product.pk][0], 0,
+                to_decimal(product.price) - old[product.pk][1]
+            )
+            for product in result.entries if product.pk in old
+        )
+        return result
+
+    @transaction.atomic
+    def bulk_delete(
+        self, pks: Iterable[UUID], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> int:
+        """Delete products and discount them from summaries of sellers"""
+        pks = list(pks)
+        old = self._get_counted(pks)
+        deleted = super().bulk_delete(pks, batch_size=batch_size)
+        discount_products(old.values())
+        return deleted
+
+    async def acreate(self, **data) -> Any[Model, Form]:
+        """Create a new product and count it in summary of seller"""
+        return await sync_to_async(self.create)(**data)
+
+    async def aupdate(self, pk: UUID, **data) -> Any[Model, Form, Conflict]:
+        """Update a product and recount price in summary of seller"""
+        return await sync_to_async(self.update)(pk, **data)
+
+    async def adelete(self, pk: UUID) -> None:
+        """Delete a product and discount it from summary of seller"""
+        return await sync_to_async(self.delete)(pk)
+
+    def _all_reviews(self) -> QuerySet:
+        """Return queryset of reviews with fields loaded by `get_reviews`"""
+        return replica_manager(
+            self.review_service.model
+        ).select_related('author').only(
+            *self.review_fields,
+            *(f'author__{field}' for field in self.review_author_fields)
+        )
+
+    def _reviews(self, product_pk: UUID) -> QuerySet:
+        """Return queryset of reviews of product with product_pk"""
+        return self._all_reviews().filter(product_id=product_pk)
+
+    def _load_reviews(self, product_pk: UUID) -> List[Model]:
+        """Return list of reviews of product with product_pk
+
+        Existence of product is checked only if it has no reviews
+
+        """
+        reviews = list(self._reviews(product_pk))
+        if not reviews and not replica_manager(self.model).filter(
+            pk=product_pk
+        ).exists():
+            raise Http404('No Product matches the given query.')
 
-    def get_reviews(self, product_pk: UUID) -> QuerySet:
-        """Return reviews of product with product_pk"""
-        product = self.get_concrete(product_pk)
-        reviews = product.reviews.all()
         return reviews
 
+    def _load_reviews_to_cache(self, product_pk: UUID) -> List[Model]:
+        """Return list of reviews of product read from the primary"""
+        with use_primary():
+            return self._load_reviews(product_pk)
+
+    def get_reviews(self, product_pk: UUID) -> List[Model]:
+        """Return list of reviews of product with product_pk
+
+        Listings are cached like products, concurrent misses are
+        coalesced to one load and writes of reviews invalidate them.
+        Existence of product is checked only if it has no reviews
+
+        """
+        key = reviews_key(product_pk)
+        if not cache.is_cacheable(self.review_service.model, key):
+            return self._load_reviews(product_pk)
+
+        return cache.fetch(
+            key, partial(self._load_reviews_to_cache, product_pk),
+            cache.get_timeout(self.review_service.model)
+        )
+
+    async def aget_reviews(self, product_pk: UUID) -> List[Model]:
+        """Return list of reviews of product with product_pk
+
+        Listings are read through cache like by `get_reviews()`, which is
+        sync, so it runs in a thread
+
+        """
+        return await sync_to_async(self.get_reviews)(product_pk)
+
+    def get_many_with_reviews(
+        self, pks: Iterable[UUID], per_product: int = 3
+    ) -> MultiGetResult:
+        """Return many products with their newest reviews
+
+        Products are read through cache, reviews of all products are read
+        in one query numbering them per product with a window function.
+        Entries of result are `ProductReviews` by product pk
+
+        """
+        result = self.get_many(pks)
+        reviews = {pk: [] for pk in result.entries}
+        if reviews and per_product > 0:
+            ordering = [
+                F(field[1:]).desc() if field.startswith('-') else F(field)
+                for field in self.review_service.page_ordering
+            ]
+            rows = self._all_reviews().filter(
+                product_id__in=list(reviews)
+            ).annotate(
+                row=Window(
+                    RowNumber(), partition_by=F('product_id'),
+                    order_by=ordering
+                )
+            ).filter(row__lte=per_product).order_by('product_id', 'row')
+            for review in rows:
+                reviews[review.product_id].append(review)
+
+        return MultiGetResult(
+            {
+                pk: ProductReviews(product, reviews[pk])
+                for pk, product in result.entries.items()
+            },
+            result.missing
+        )
+
+    def list_summaries(
+        self, after: str = None, limit: int = DEFAULT_PAGE_SIZE,
+        cents: bool = False
+    ) -> Page:
+        """Return a page of `ProductSummary` ordered like `get_page()`
+
+        Prices are integer cents computed by database if cents is true
+
+        """
+        return self.get_rows(
+            ProductSummary, after=after, limit=limit,
+            expressions={'price': to_cents()} if cents else None
+        )
+
     def add_review(self, product_pk: UUID, **data) -> Any[Form, Model]:
         """Add new review for product with product_pk"""
-        product = self.get_concrete(product_pk)
-        response = self.review_service.create(product=product, **data)
+        response = self.review_service.create(product_id=product_pk, **data)
         return response
 
+    async def aadd_review(
+        self, product_pk: UUID, **data
+    ) -> Any[Form, Model]:
+        """Add new review for product with product_pk"""
+        return await self.review_service.acreate(
+            product_id=product_pk, **data
+        )
+
     def remove_review(self, review_pk: UUID) -> None:
         """Remove a review with review_pk"""
         self.review_service.delete(review_pk)
 
+    def submit_review(self, product_pk: UUID, **data) -> Any[Form, UUID]:
+        """Validate a review and queue it to be written later
+
+        Returns handle of submission or form with errors. Product isn't
+        fetched, submissions of missing products are rejected when the
+        queue is drained by `drain_reviews` command
+
+        """
+        form = self.review_service.form(data)
+        if not form.is_valid():
+            return form
+
+        row = {'product_id': product_pk, **form.cleaned_data}
+        for name, value in data.items():
+            if name not in form.fields:
+                if isinstance(value, Model):
+                    name, value = f'{name}_id', value.pk
+                row[name] = value
+
+        review_service = self.review_service
+        get_schema(review_service.model, review_service.form).check(row)
+        return get_journal().append(row)
+
+    def review_status(self, handle: UUID) -> Submission:
+        """Return state of a queued review with handle
+
+        Raises
+        ------
+        Http404
+            Raises if there is no submission with handle
+
+        """
+        submission = get_journal().status(handle)
+        if submission is None:
+            raise Http404('No Submission matches the given query.')
+
+        return submission
+
+    def search(
+        self, query: str, filters: dict = None, limit: int = DEFAULT_LIMIT
+    ) -> List[Product]:
+        """Return products matching query ordered by rank
+
+        Supported filters are `price_min`, `price_max` and `seller`
+
+        """
+        pks = get_search_backend().search(query, filters, limit)
+        products = replica_manager(self.model).in_bulk(pks)
+        return [products[pk] for pk in pks if pk in products]
+
+    def top(self, kind: str = 'top_rated', k: int = 10) -> List[Product]:
+        """Return top k products of ranking
+
+        Kinds are `top_rated`, `most_reviewed` (this week) and `trending`.
+        Rankings are precomputed by `compact_rankings` command and kept up
+        to date by `refresh_rankings` one, so only k products are read.
+        Nothing is returned until they are built
+
+        Raises
+        ------
+        ValueError
+            Raises if kind of ranking is unknown or k is less than one
+
+        """
+        pks = get_top(kind, k)
+        products = replica_manager(self.model).in_bulk(pks)
+        return [products[pk] for pk in pks if pk in products]
+
+    def seller_summary(self, user) -> SellerStats:
+        """Return summary of products and reviews of seller in one query
+
+        User is passed as instance or pk. Sellers without products get an
+        unsaved summary with zeros
+
+        """
+        user_pk = getattr(user, 'pk', user)
+        return replica_manager(SellerStats).filter(
+            user_id=user_pk
+        ).first() or SellerStats(user_id=user_pk)
+
+    def analytics_report(
+        self, window: int = 7, chunk_size: int = 100_000
+    ) -> dict:
+        """Return JSON serializable report of prices and ratings of catalog
+
+        Report contains price percentiles, rating distribution of catalog
+        and of every reviewed product, and moving averages of daily
+        reviews over window of days. NumPy is imported
+        on first call
+
+        """
+        from ..analytics import build_report
+
+        return build_report(window, chunk_size)
+
+    def export(
+        self, kind: str = 'products', format: str = 'csv',
+        since: datetime = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[str]:
+        """Return a stream of exported products or reviews
+
+        Memory doesn't depend on number of exported rows. With `since`
+        only entries created or changed since this watermark are
+        exported, deleted entries aren't
+
+        """
+        return export(kind, format, since, chunk_size)
@@ -0,0 +1,364 @@
+"""Module with top-N and trending rankings of products
+
+Rankings are bounded lists of (score, product pk) pairs sorted by score.
+They are stored in `ProductRanking` table, row per ranked product, and
+cached in django cache on read, so reading top k products is O(k) and a
+cache miss (e.g. eviction or a per process cache) reloads at most
+`RANKING_SIZE` rows. Review writes only queue their products in
+`RankingUpdate` table, and `refresh_rankings()` (e.g. `refresh_rankings`
+command every minute) recomputes scores of queued products in batches:
+only their rows are upserted, and rows ranked below `RANKING_SIZE` are
+evicted, so concurrent updates of other products don't overwrite each
+other. `compact_rankings()` rebuilds daily
+review counts and rankings from scratch. Rankings are never computed on
+read, so compaction should run on deploy and periodically (e.g. daily,
+which also moves the weekly window and ranks again products evicted
+before others dropped below them)
+
+Trending score uses forward decay: a review of day d weighs
+2 ** ((d - epoch) / half life). Ratio of weights of two days doesn't
+depend on epoch, so order of stored scores doesn't change as time goes
+and compaction only moves epoch to keep numbers small
+
+"""
+
+from __future__ import annotations
+from collections import defaultdict
+from datetime import date, timedelta
+from heapq import heappush, heappushpop
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from services.cache import fetch, get_timeout, invalidate_keys
+from services.strategies import DEFAULT_BATCH_SIZE
+from ..models import (
+    Product, ProductRanking, RankingUpdate, Review, ReviewDailyCount
+)
+
+
+KINDS = ('top_rated', 'most_reviewed', 'trending')
+
+# Number of stored entries of every ranking, the largest k of reads
+RANKING_SIZE = 100
+
+WEEK_DAYS = 7
+TRENDING_DAYS = 28
+TRENDING_HALF_LIFE = 3
+
+# Top rated products are ordered by Bayesian average, which pulls ratings
+# of products with few reviews to the prior
+PRIOR_REVIEWS = 10
+PRIOR_RATING = 2.5
+
+
+class Ranking(NamedTuple):
+    """Stored ranking
+
+    Attributes
+    ----------
+    epoch : date
+        Epoch of forward decay of scores
+    entries : list
+        (score, product pk) pairs sorted by score descending
+
+    """
+
+    epoch: date
+    entries: List[Tuple[float, UUID]]
+
+
+def _key(kind: str) -> str:
+    return f'ranking:{kind}'
+
+
+def load_rankings(kinds: Iterable[str] = KINDS) -> Dict[str, Ranking]:
+    """Return stored rankings of kinds, rankings not built yet are missed"""
+    rows = ProductRanking.objects.filter(kind__in=kinds).order_by(
+        'kind', '-score', '-product_id'
+    ).values_list('kind', 'epoch', 'score', 'product_id')
+    rankings = {}
+    for kind, group in groupby(rows, key=itemgetter(0)):
+        entries = list(group)
+        rankings[kind] = Ranking(
+            entries[0][1], [(score, pk) for _, _, score, pk in entries]
+        )
+
+    return rankings
+
+
+def store_rankings(rankings: Dict[str, Ranking]) -> None:
+    """Replace stored rankings and invalidate their cached copies"""
+    with transaction.atomic():
+        ProductRanking.objects.filter(kind__in=rankings).delete()
+        ProductRanking.objects.bulk_create([
+            ProductRanking(
+                kind=kind, product_id=pk, score=score, epoch=ranking.epoch
+            )
+            for kind, ranking in rankings.items()
+            for score, pk in ranking.entries
+        ])
+        invalidate_keys(ProductRanking, list(map(_key, rankings)))
+
+
+def _update_ranking(
+    kind: str, epoch: date, pks: set, scores: List[tuple]
+) -> None:
+    """Upsert scores of products to stored ranking and evict the lowest
+
+    Rows of products of pks without a score are removed
+
+    """
+    rows = ProductRanking.objects.filter(kind=kind)
+    ranked = {pk for _, pk in scores}
+    rows.filter(product_id__in=pks - ranked).delete()
+    if not scores:
+        return
+
+    ProductRanking.objects.bulk_create(
+        [
+            ProductRanking(kind=kind, product_id=pk, score=score, epoch=epoch)
+            for score, pk in scores
+        ],
+        update_conflicts=True, unique_fields=['kind', 'product'],
+        update_fields=['score']
+    )
+    evicted = list(rows.order_by('-score', '-product_id').values_list(
+        'pk', flat=True
+    )[RANKING_SIZE:])
+    if evicted:
+        ProductRanking.objects.filter(pk__in=evicted).delete()
+
+
+def rating_score(rating_sum: int, review_count: int) -> float:
+    """Return Bayesian average rating"""
+    return (
+        (rating_sum + PRIOR_RATING * PRIOR_REVIEWS)
+        / (review_count + PRIOR_REVIEWS)
+    )
+
+
+def decay_weight(day: date, epoch: date) -> float:
+    """Return forward decay weight of reviews of day"""
+    return 2 ** ((day - epoch).days / TRENDING_HALF_LIFE)
+
+
+def _window_scores(
+    pks: Iterable[UUID] = None, today: date = None, epoch: date = None
+) -> Iterator[Tuple[UUID, int, float]]:
+    """Iterate over (pk, weekly count, trending score) of products"""
+    rows = ReviewDailyCount.objects.filter(
+        day__gte=today - timedelta(days=TRENDING_DAYS - 1), count__gt=0
+    )
+    if pks is not None:
+        rows = rows.filter(product_id__in=pks)
+
+    week_start = today - timedelta(days=WEEK_DAYS - 1)
+    rows = rows.order_by('product_id').values_list(
+        'product_id', 'day', 'count'
+    )
+    for pk, group in groupby(rows.iterator(), key=itemgetter(0)):
+        week = 0
+        trending = 0.0
+        for _, day, count in group:
+            if day >= week_start:
+                week += count
+            trending += count * decay_weight(day, epoch)
+
+        yield pk, week, trending
+
+
+def _rating_scores(pks: Iterable[UUID] = None) -> Iterator[tuple]:
+    """Iterate over (score, pk) of top rated ranking"""
+    products = Product.objects.filter(review_count__gt=0)
+    if pks is not None:
+        products = products.filter(pk__in=pks)
+
+    for pk, rating_sum, review_count in products.values_list(
+        'pk', 'rating_sum', 'review_count'
+    ).iterator():
+        yield rating_score(rating_sum, review_count), pk
+
+
+def _push(heap: list, entry: tuple) -> None:
+    """Push entry to min-heap bounded by `RANKING_SIZE`"""
+    if len(heap) < RANKING_SIZE:
+        heappush(heap, entry)
+    elif entry > heap[0]:
+        heappushpop(heap, entry)
+
+
+def rebuild_rankings() -> Dict[str, Ranking]:
+    """Recompute all rankings from daily review counts"""
+    today = timezone.now().date()
+    heaps = {kind: [] for kind in KINDS}
+    for entry in _rating_scores():
+        _push(heaps['top_rated'], entry)
+
+    for pk, week, trending in _window_scores(today=today, epoch=today):
+        if week:
+            _push(heaps['most_reviewed'], (week, pk))
+        _push(heaps['trending'], (trending, pk))
+
+    rankings = {
+        kind: Ranking(today, sorted(heap, reverse=True))
+        for kind, heap in heaps.items()
+    }
+    store_rankings(rankings)
+    return rankings
+
+
+def update_rankings(product_pks: Iterable[UUID]) -> None:
+    """Recompute scores of products in stored rankings
+
+    Only rows of products are written, other entries aren't loaded.
+    Rankings that aren't stored start empty, so `compact_rankings` should
+    run on deploy to rank products changed before
+
+    """
+    pks = set(product_pks)
+    if not pks:
+        return
+
+    today = timezone.now().date()
+    epoch = ProductRanking.objects.values_list(
+        'epoch', flat=True
+    ).first() or today
+    scores = {kind: [] for kind in KINDS}
+    scores['top_rated'].extend(_rating_scores(pks))
+    for pk, week, trending in _window_scores(pks, today, epoch):
+        if week:
+            scores['most_reviewed'].append((week, pk))
+        scores['trending'].append((trending, pk))
+
+    with transaction.atomic():
+        for kind in KINDS:
+            _update_ranking(kind, epoch, pks, scores[kind])
+
+        invalidate_keys(ProductRanking, list(map(_key, KINDS)))
+
+
+def record_review_counts(changes: Iterable[Tuple[UUID, date, int]]) -> None:
+    """Update daily review counts and queue products for rankings
+
+    Parameters
+    ----------
+    changes
+        Triples of (product pk, published date, delta), where delta is 1
+        for added reviews and -1 for removed ones
+
+    """
+    deltas = defaultdict(int)
+    for product_pk, day, delta in changes:
+        deltas[product_pk, day] += delta
+
+    ReviewDailyCount.objects.bulk_create(
+        [
+            ReviewDailyCount(product_id=product_pk, day=day)
+            for (product_pk, day), delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+    for (product_pk, day), delta in deltas.items():
+        if delta:
+            ReviewDailyCount.objects.filter(
+                product_id=product_pk, day=day
+            ).update(count=Greatest(F('count') + delta, 0))
+
+    schedule_update({product_pk for product_pk, _ in deltas})
+
+
+def schedule_update(product_pks: Iterable[UUID]) -> None:
+    """Queue products for the next `refresh_rankings()` with one insert"""
+    product_pks = set(product_pks)
+    if product_pks:
+        RankingUpdate.objects.bulk_create(
+            [RankingUpdate(product_id=pk) for pk in product_pks],
+            ignore_conflicts=True
+        )
+
+
+def refresh_rankings(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Update rankings of queued products in batches
+
+    Queued rows are removed in the transaction that updates rankings, so
+    products changed during a refresh are queued again. Returns number of
+    updated products
+
+    """
+    refreshed = 0
+    while True:
+        with transaction.atomic():
+            pks = list(RankingUpdate.objects.select_for_update(
+                skip_locked=True
+            ).values_list('product_id', flat=True)[:batch_size])
+            if not pks:
+                return refreshed
+
+            RankingUpdate.objects.filter(product_id__in=pks).delete()
+            update_rankings(pks)
+
+        refreshed += len(pks)
+
+
+def get_top(kind: str, k: int) -> List[UUID]:
+    """Return pks of top k products of ranking, k is at most 100
+
+    Ranking is read from cache or loaded from table into it, rankings
+    changed during the load aren't cached. Rankings aren't computed on
+    read, so nothing is returned until they are built by
+    `compact_rankings` command
+
+    Raises
+    ------
+    ValueError
+        Raises if kind of ranking is unknown or k is less than one
+
+    """
+    if kind not in KINDS:
+        raise ValueError(f'Unknown ranking: {kind}')
+    if k < 1:
+        raise ValueError(f'Incorrect k: {k}')
+
+    ranking = fetch(
+        _key(kind),
+        lambda: load_rankings([kind]).get(kind, Ranking(None, [])),
+        get_timeout(ProductRanking)
+    )
+    return [pk for _, pk in ranking.entries[:k]]
+
+
+def compact_rankings() -> int:
+    """Rebuild daily review counts of trending window and all rankings
+
+    Counts older than the window and queued updates are removed. Returns
+    number of stored daily counts
+
+    """
+    # Products queued later stay queued for `refresh_rankings()`
+    RankingUpdate.objects.all().delete()
+    start = timezone.now().date() - timedelta(days=TRENDING_DAYS - 1)
+    counts = Review.objects.filter(pub_date__gte=start).order_by().values(
+        'product_id', 'pub_date'
+    ).annotate(count=Count('pk'))
+    with transaction.atomic():
+        ReviewDailyCount.objects.all().delete()
+        created = ReviewDailyCount.objects.bulk_create(
+            [
+                ReviewDailyCount(
+                    product_id=row['product_id'], day=row['pub_date'],
+                    count=row['count']
+                )
+                for row in counts.iterator()
+            ],
+            batch_size=1000
+        )
+
+    rebuild_rankings()
+    return len(created)
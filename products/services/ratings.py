@@ -0,0 +1,102 @@
+"""Module with maintenance of product rating aggregates"""
+
+from __future__ import annotations
+from collections import defaultdict
+from typing import Iterable, Tuple
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from services.signals import entries_changed
+from services.strategies import DEFAULT_BATCH_SIZE
+from ..models import Product, Review
+from .sellers import apply_review_changes
+
+
+RATINGS = range(6)
+
+
+def apply_rating_changes(changes: Iterable[Tuple[UUID, int, int]]) -> int:
+    """Update rating aggregates of products and summaries of their sellers
+
+    Parameters
+    ----------
+    changes
+        Triples of (product pk, rating, delta), where delta is 1 for added
+        reviews and -1 for removed ones
+
+    Returns
+    -------
+    updated : int
+        Number of updated products
+
+    """
+    changes = list(changes)
+    deltas = defaultdict(lambda: defaultdict(int))
+    for product_pk, rating, delta in changes:
+        product_deltas = deltas[product_pk]
+        product_deltas['review_count'] += delta
+        product_deltas['rating_sum'] += rating * delta
+        product_deltas[f'rating_{rating}'] += delta
+
+    updated = 0
+    for product_pk, product_deltas in deltas.items():
+        # Reviews written bypassing services (e.g. in admin) aren't
+        # counted, so aggregates are clamped at zero until rebuild
+        values = {
+            field: F(field) + delta if delta > 0 else Greatest(
+                F(field) + delta, 0
+            )
+            for field, delta in product_deltas.items() if delta
+        }
+        if values:
+            updated += Product.objects.filter(pk=product_pk).update(
+                updated_at=timezone.now(), **values
+            )
+
+    if updated:
+        apply_review_changes(changes)
+    if deltas:
+        entries_changed.send(sender=Product, pks=list(deltas))
+
+    return updated
+
+
+def _count(**filters) -> Coalesce:
+    reviews = Review.objects.filter(
+        product=OuterRef('pk'), **filters
+    ).values('product').annotate(value=Count('pk')).values('value')
+    return Coalesce(Subquery(reviews, output_field=IntegerField()), 0)
+
+
+def rebuild_rating_aggregates(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Recompute rating aggregates of all products from reviews
+
+    Returns number of updated products
+
+    """
+    rating_sum = Review.objects.filter(
+        product=OuterRef('pk')
+    ).values('product').annotate(value=Sum('rating')).values('value')
+    values = {
+        'review_count': _count(),
+        'rating_sum': Coalesce(
+            Subquery(rating_sum, output_field=IntegerField()), 0
+        ),
+        **{f'rating_{rating}': _count(rating=rating) for rating in RATINGS},
+    }
+
+    updated = 0
+    pks = Product.objects.order_by('pk').values_list('pk', flat=True)
+    batch = list(pks[:batch_size])
+    while batch:
+        with transaction.atomic():
+            updated += Product.objects.filter(pk__in=batch).update(**values)
+            entries_changed.send(sender=Product, pks=batch)
+
+        batch = list(pks.filter(pk__gt=batch[-1])[:batch_size])
+
+    return updated
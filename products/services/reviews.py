@@ -1,20 +1,242 @@
-from services import BaseCRUDService
+from __future__ import annotations
+from uuid import UUID
+from typing import Any, Dict, Iterable
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Model
+from django.forms import Form
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from services import AsyncBaseCRUDService
+from services.pagination import Page
+from services.strategies import (
+    AsyncCachedCRUDStrategy, BulkResult, CachedCRUDStrategy, Conflict,
+    DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE, lock_rows
+)
 from ..models import Review
 from ..forms import ReviewForm
+from ..summaries import ReviewSummary
+from .rankings import record_review_counts, schedule_update
+from .ratings import apply_rating_changes
 
 
-class ReviewService(BaseCRUDService):
+class ReviewService(AsyncBaseCRUDService):
     """Service with business logic for reviews
 
+    Every write keeps rating aggregates and daily review counts of reviewed
+    products up to date in the same transaction, rankings are updated
+    after commit
+
     Attributes
     ----------
+    crud_strategy
+        Strategy with cached reads
+    async_crud_strategy
+        Async strategy with cached reads
     model : Model
         Review model
     form : Form
         Review form
+    page_ordering : tuple
+        Newest entries first
+
+    Methods
+    -------
+    list_summaries(after=None, limit=20, product_pk=None)
+        Return a page of read-only summaries of reviews
 
     """
 
+    crud_strategy = CachedCRUDStrategy
+    async_crud_strategy = AsyncCachedCRUDStrategy
     model = Review
     form = ReviewForm
+    page_ordering = ('-pub_date', '-uuid')
+
+    def _get_ratings(self, pks: Iterable[UUID]) -> Dict[UUID, tuple]:
+        """Return (product pk, rating, published date) of reviews by pk
+
+        Rows are locked by `lock_rows()`
+
+        """
+        return lock_rows(Review, pks, ('product_id', 'rating', 'pub_date'))
+
+    def _count_created(self, review: Review) -> None:
+        """Count a new review in product rating and rankings"""
+        if not apply_rating_changes([(review.product_id, review.rating, 1)]):
+            raise Http404('No Product matches the given query.')
+
+        record_review_counts([(review.product_id, review.pub_date, 1)])
+
+    def list_summaries(
+        self, after: str = None, limit: int = DEFAULT_PAGE_SIZE,
+        product_pk: UUID = None
+    ) -> Page:
+        """Return a page of `ReviewSummary` ordered like `get_page()`
+
+        Reviews are limited to product with product_pk if it's passed.
+        Usernames of authors are joined in the same query
+
+        """
+        return self.get_rows(
+            ReviewSummary, after=after, limit=limit,
+            expressions={'author_username': F('author__username')},
+            filters=None if product_pk is None else {'product_id': product_pk}
+        )
+
+    @transaction.atomic
+    def create(self, **data) -> Any[Model, Form]:
+        """Create a new review and count it in product rating
+
+        Product can be passed by pk as `product_id` without loading it
+
+        Raises
+        ------
+        Http404
+            Raises if product doesn't exist
+
+        """
+        review = super().create(**data)
+        if isinstance(review, Model):
+            self._count_created(review)
+
+        return review
+
+    @transaction.atomic
+    def create_cleaned(self, **data) -> Model:
+        """Create a new review from cleaned data and count it in rating
+
+        Raises
+        ------
+        Http404
+            Raises if product doesn't exist
+
+        """
+        review = super().create_cleaned(**data)
+        self._count_created(review)
+        return review
+
+    @transaction.atomic
+    def update(
+        self, pk: UUID, version: int = None, partial: bool = False, **data
+    ) -> Any[Model, Form, Conflict]:
+        """Update a review and recount product rating
+
+        Accepts `version` and `partial` like `SimpleCRUDStrategy.update()`.
+        Reviews can't be moved to other products, so only rating is
+        recounted and only if it's written.
+
+        Without `version` old rating is read with the review locked. With
+        `version` partial updates without rating read nothing before the
+        conditional UPDATE, and old rating is read without a lock
+        otherwise: every write bumps version, so the UPDATE succeeds only
+        if rating hasn't changed since the read
+
+        """
+        pk = self.model._meta.pk.to_python(pk)
+        if version is None:
+            old = self._get_ratings([pk]).get(pk)
+        elif partial and 'rating' not in data:
+            old = None
+        else:
+            old = self.model.objects.filter(pk=pk).values_list(
+                'product_id', 'rating', 'version'
+            ).first()
+            if old is not None and old[2] != version:
+                return Conflict(pk, version, old[2])
+
+        review = super().update(pk, version=version, partial=partial, **data)
+        if (
+            isinstance(review, Model) and old is not None
+            and 'rating' not in review.get_deferred_fields()
+            and old[1] != review.rating
+        ):
+            apply_rating_changes([
+                (old[0], old[1], -1), (old[0], review.rating, 1)
+            ])
+            schedule_update([old[0]])
+
+        return review
+
+    @transaction.atomic
+    def delete(self, pk: UUID) -> None:
+        """Delete a review and discount it from product rating"""
+        review = get_object_or_404(
+            self.model.objects.select_for_update().only(
+                'product_id', 'rating', 'pub_date'
+            ),
+            pk=pk
+        )
+        review.delete()
+        apply_rating_changes([(review.product_id, review.rating, -1)])
+        record_review_counts([(review.product_id, review.pub_date, -1)])
+
+    @transaction.atomic
+    def bulk_create(
+        self, rows: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+        cleaned: bool = False
+    ) -> BulkResult:
+        """Create new reviews and count them in product ratings"""
+        result = super().bulk_create(
+            rows, batch_size=batch_size, cleaned=cleaned
+        )
+        apply_rating_changes(
+            (review.product_id, review.rating, 1)
+            for review in result.entries
+        )
+        record_review_counts(
+            (review.product_id, review.pub_date, 1)
+            for review in result.entries
+        )
+        return result
+
+    @transaction.atomic
+    def bulk_update(
+        self, pk_to_data: Dict[UUID, dict],
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> BulkResult:
+        """Update reviews and recount product ratings"""
+        to_python = self.model._meta.pk.to_python
+        old = self._get_ratings([to_python(pk) for pk in pk_to_data])
+        result = super().bulk_update(pk_to_data, batch_size=batch_size)
+        changes = []
+        for review in result.entries:
+            product_pk, rating, _ = old[review.pk]
+            if rating != review.rating:
+                changes.append((product_pk, rating, -1))
+                changes.append((review.product_id, review.rating, 1))
+
+        apply_rating_changes(changes)
+        schedule_update(product_pk for product_pk, _, _ in changes)
+        return result
+
+    @transaction.atomic
+    def bulk_delete(
+        self, pks: Iterable[UUID], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> int:
+        """Delete reviews and discount them from product ratings"""
+        pks = list(pks)
+        old = self._get_ratings(pks)
+        deleted = super().bulk_delete(pks, batch_size=batch_size)
+        apply_rating_changes(
+            (product_pk, rating, -1) for product_pk, rating, _ in old.values()
+        )
+        record_review_counts(
+            (product_pk, pub_date, -1)
+            for product_pk, _, pub_date in old.values()
+        )
+        return deleted
+
+    async def acreate(self, **data) -> Any[Model, Form]:
+        """Create a new review and count it in product rating"""
+        return await sync_to_async(self.create)(**data)
+
+    async def aupdate(self, pk: UUID, **data) -> Any[Model, Form, Conflict]:
+        """Update a review and recount product rating"""
+        return await sync_to_async(self.update)(pk, **data)
 
+    async def adelete(self, pk: UUID) -> None:
+        """Delete a review and discount it from product rating"""
+        return await sync_to_async(self.delete)(pk)
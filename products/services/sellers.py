@@ -0,0 +1,203 @@
+"""Module with maintenance of seller summaries
+
+`SellerStats` rows are updated incrementally by writes of product and
+review services in their transactions. Writes bypassing services (e.g. in
+admin) aren't counted, so missing rows are created before deltas are
+applied, values are clamped at zero and `rebuild_seller_stats()`
+recomputes them from products
+
+"""
+
+from __future__ import annotations
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Count, F, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from services.strategies import DEFAULT_BATCH_SIZE, batches
+from ..models import Product, SellerStats
+
+
+def to_decimal(price) -> Decimal:
+    """Convert price passed to model (e.g. a string) to decimal"""
+    return price if isinstance(price, Decimal) else Decimal(str(price))
+
+
+def _values(deltas: Dict[str, object]) -> dict:
+    return {
+        field: F(field) + delta if delta > 0 else Greatest(
+            F(field) + delta, Value(type(delta)(0))
+        )
+        for field, delta in deltas.items() if delta
+    }
+
+
+def _create_missing(seller_pks: Iterable[int]) -> None:
+    """Create empty summaries of sellers which have none yet
+
+    Deltas are applied by UPDATE, so they'd be lost for sellers without
+    summary rows (e.g. with products created bypassing services)
+
+    """
+    SellerStats.objects.bulk_create(
+        [SellerStats(user_id=seller_pk) for seller_pk in seller_pks],
+        ignore_conflicts=True
+    )
+
+
+def apply_product_changes(
+    changes: Iterable[Tuple[int, int, Decimal]]
+) -> None:
+    """Update product counts and price sums of sellers
+
+    Parameters
+    ----------
+    changes
+        Triples of (seller pk, delta, price delta), where delta is 1 for
+        added products, -1 for removed ones and 0 for changed prices
+
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for seller_pk, delta, price_delta in changes:
+        seller_deltas = deltas[seller_pk]
+        seller_deltas['product_count'] += delta
+        seller_deltas['price_sum'] += to_decimal(price_delta)
+
+    _create_missing(deltas)
+    for seller_pk, seller_deltas in deltas.items():
+        values = _values(seller_deltas)
+        if values:
+            SellerStats.objects.filter(user_id=seller_pk).update(**values)
+
+
+def apply_price_change(product_pk: UUID, version: int, price) -> int:
+    """Recount price of product at version in summary of its seller
+
+    Old price and seller are read by subqueries of a single UPDATE, so
+    product isn't selected before it's updated. Nothing is changed if
+    product has other version. Returns number of updated summaries
+
+    """
+    product = Product.objects.filter(pk=product_pk, version=version)
+    stats = SellerStats.objects.filter(
+        user_id=Subquery(product.values('seller')[:1])
+    )
+    price_sum = Greatest(
+        F('price_sum') + Value(to_decimal(price))
+        - Subquery(product.values('price')[:1]),
+        Value(Decimal(0))
+    )
+    updated = stats.update(price_sum=price_sum)
+    if not updated:
+        # Product has other version or its seller has no summary yet
+        _create_missing(product.values_list('seller', flat=True))
+        updated = stats.update(price_sum=price_sum)
+
+    return updated
+
+
+def discount_products(rows: Iterable[Tuple[int, Decimal, int, int]]) -> None:
+    """Discount deleted products and their reviews from summaries
+
+    Parameters
+    ----------
+    rows
+        Quadruples of (seller pk, price, review count, rating sum) of
+        deleted products, whose reviews are deleted by cascade
+
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for seller_pk, price, review_count, rating_sum in rows:
+        seller_deltas = deltas[seller_pk]
+        seller_deltas['product_count'] -= 1
+        seller_deltas['price_sum'] -= to_decimal(price)
+        seller_deltas['review_count'] -= review_count
+        seller_deltas['rating_sum'] -= rating_sum
+
+    _create_missing(deltas)
+    for seller_pk, seller_deltas in deltas.items():
+        values = _values(seller_deltas)
+        if values:
+            SellerStats.objects.filter(user_id=seller_pk).update(**values)
+
+
+def apply_review_changes(
+    changes: Iterable[Tuple[UUID, int, int]]
+) -> None:
+    """Update review counts and rating sums of sellers of products
+
+    Parameters
+    ----------
+    changes
+        Triples of (product pk, rating, delta) like in
+        `apply_rating_changes()`
+
+    """
+    product_deltas = defaultdict(lambda: [0, 0])
+    for product_pk, rating, delta in changes:
+        product_deltas[product_pk][0] += delta
+        product_deltas[product_pk][1] += rating * delta
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for batch in batches(product_deltas, DEFAULT_BATCH_SIZE):
+        for product_pk, seller_pk in Product.objects.filter(
+            pk__in=batch
+        ).values_list('pk', 'seller'):
+            review_count, rating_sum = product_deltas[product_pk]
+            deltas[seller_pk]['review_count'] += review_count
+            deltas[seller_pk]['rating_sum'] += rating_sum
+
+    _create_missing(deltas)
+    for seller_pk, seller_deltas in deltas.items():
+        values = _values(seller_deltas)
+        if values:
+            SellerStats.objects.filter(user_id=seller_pk).update(**values)
+
+
+def rebuild_seller_stats(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Recompute summaries of all sellers from products
+
+    Review counts and rating sums are taken from rating aggregates of
+    products, so they should be rebuilt first. Returns number of sellers
+    with products
+
+    """
+    SellerStats.objects.exclude(
+        user_id__in=Product.objects.values('seller')
+    ).delete()
+
+    rebuilt = 0
+    sellers = Product.objects.order_by('seller').values_list(
+        'seller', flat=True
+    ).distinct()
+    batch = list(sellers[:batch_size])
+    while batch:
+        stats = Product.objects.filter(seller__in=batch).order_by().values(
+            'seller'
+        ).annotate(
+            product_count=Count('pk'),
+            price_sum=Coalesce(Sum('price'), Value(Decimal(0))),
+            review_count=Coalesce(Sum('review_count'), 0),
+            rating_sum=Coalesce(Sum('rating_sum'), 0),
+        )
+        with transaction.atomic():
+            SellerStats.objects.bulk_create(
+                [
+                    SellerStats(user_id=row.pop('seller'), **row)
+                    for row in stats
+                ],
+                update_conflicts=True, unique_fields=['user'],
+                update_fields=[
+                    'product_count', 'price_sum', 'review_count',
+                    'rating_sum'
+                ]
+            )
+
+        rebuilt += len(batch)
+        batch = list(sellers.filter(seller__gt=batch[-1])[:batch_size])
+
+    return rebuilt
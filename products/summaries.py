@@ -0,0 +1,97 @@
+"""Module with read-only summaries of products and reviews
+
+Summaries are named tuples built straight from `values_list()` rows.
+They have no per instance dict and no model state, so a page of 1000
+summaries takes several times less memory than a page of model
+instances and serializes without model field machinery
+
+"""
+
+from __future__ import annotations
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple, Optional, Union
+from uuid import UUID
+
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+
+
+class ProductSummary(NamedTuple):
+    """Summary of product
+
+    Attributes
+    ----------
+    uuid : UUID
+        Pk of product
+    title : str
+        Title of product
+    price : Decimal or int
+        Price of product, in integer cents if they were requested
+    seller_id : int
+        Pk of seller
+    pub_date : date
+        Product published date
+    review_count : int
+        Number of reviews of product
+    rating_sum : int
+        Sum of ratings of reviews
+
+    """
+
+    uuid: UUID
+    title: str
+    price: Union[Decimal, int]
+    seller_id: int
+    pub_date: date
+    review_count: int
+    rating_sum: int
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        """Average rating of product, `None` if there are no reviews"""
+        if not self.review_count:
+            return None
+
+        return self.rating_sum / self.review_count
+
+
+class ReviewSummary(NamedTuple):
+    """Summary of review
+
+    Attributes
+    ----------
+    uuid : UUID
+        Pk of review
+    product_id : UUID
+        Pk of reviewed product
+    author_id : int
+        Pk of author
+    author_username : str
+        Username of author
+    rating : int
+        Rating from 0 to 5
+    text : str
+        Text of review
+    pub_date : date
+        Review published date
+
+    """
+
+    uuid: UUID
+    product_id: UUID
+    author_id: int
+    author_username: str
+    rating: int
+    text: str
+    pub_date: date
+
+
+def to_cents(field: str = 'price') -> Cast:
+    """Return expression of decimal field in integer cents
+
+    Value is rounded before cast, so prices stored as floats (e.g. by
+    SQLite) aren't truncated
+
+    """
+    return Cast(Round(F(field) * 100), IntegerField())
@@ -1,12 +1,60 @@
 # TODO: Create tests for ProductService
+import asyncio
+import base64
+import csv
+import json
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from threading import Barrier
+from unittest import skipUnless
+from unittest.mock import patch
 
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import admin
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
 from django.contrib.auth import get_user_model
-from django.db.models import Model
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Model, Sum
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
 
-from .models import Product, Review
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import benchmarks, export, serializers, views
+from .importer import CatalogImporter
+from .review_queue import DONE, PENDING, REJECTED, drain, get_journal
+from .models import (
+    Product, ProductRanking, RankingUpdate, Review, ReviewDailyCount,
+    SellerStats
+)
 from .services.products import ProductService
+from .services.rankings import rebuild_rankings
+from .services.reviews import ReviewService
+from .summaries import ProductSummary, ReviewSummary
+from services.cache import (
+    CachedValue, fetch, get_local_cache, invalidate_keys, store
+)
+from services.instrumentation import registry
+from services.strategies import Conflict, SimpleCRUDStrategy
+from services import identity, routing
 
 
 User = get_user_model()
@@ -87,3 +135,2049 @@ class ProductServiceTests(TestCase):
         all_reviews = self.service.get_reviews(self.product.pk)
         self.assertEqual(len(all_reviews), 0)
 
+
+class CachedCRUDStrategyTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_local_cache(Product).clear()
+        get_local_cache(Review).clear()
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    def test_get_concrete_is_cached(self):
+        self.service.get_concrete(self.product.pk)
+        with self.assertNumQueries(0):
+            product = self.service.get_concrete(self.product.pk)
+
+        self.assertEqual(product, self.product)
+
+    async def test_async_reads_use_cache(self):
+        await self.service.aget_concrete(self.product.pk)
+        await self.service.aget_reviews(self.product.pk)
+        # Writes bypassing signals aren't seen by cached reads
+        await Product.objects.filter(pk=self.product.pk).aupdate(title='new')
+        await Review.objects.abulk_create([Review(
+            product=self.product, text='review', rating=4, author=self.user
+        )])
+        product = await self.service.aget_concrete(self.product.pk)
+        self.assertEqual(product.title, 'test')
+        self.assertEqual(await self.service.aget_reviews(self.product.pk), [])
+
+    def test_shared_cache_tier(self):
+        self.service.get_concrete(self.product.pk)
+        get_local_cache(Product).clear()
+        with self.assertNumQueries(0):
+            product = self.service.get_concrete(self.product.pk)
+
+        self.assertEqual(product.title, 'test')
+
+    def test_get_many_is_cached(self):
+        missing = uuid.uuid4()
+        self.service.get_concrete(self.product.pk)
+        other = Product.objects.create(
+            title='other', description='test desc',
+            price='10.00', seller=self.user
+        )
+        # Only the entry missing in cache is read
+        with self.assertNumQueries(1):
+            result = self.service.get_many([other.pk, self.product.pk])
+        self.assertEqual(list(result.entries), [other.pk, self.product.pk])
+
+        get_local_cache(Product).clear()
+        with self.assertNumQueries(0):
+            result = self.service.get_many([self.product.pk, other.pk])
+        self.assertEqual(result.entries[other.pk].title, 'other')
+
+        with self.assertNumQueries(1):
+            result = self.service.get_many([missing, other.pk])
+        self.assertEqual(result.missing, [missing])
+
+    def test_update_invalidates(self):
+        self.service.get_concrete(self.product.pk)
+        self.service.update(
+            self.product.pk, title='new title', description='new desc',
+            price='50.00'
+        )
+        product = self.service.get_concrete(self.product.pk)
+        self.assertEqual(product.title, 'new title')
+
+    def test_delete_invalidates(self):
+        self.service.get_concrete(self.product.pk)
+        self.service.delete(self.product.pk)
+        with self.assertRaises(Http404):
+            self.service.get_concrete(self.product.pk)
+
+    def test_cascade_delete_invalidates(self):
+        review = Review.objects.create(
+            text='test_review', product=self.product,
+            rating=5, author=self.user
+        )
+        review_service = ReviewService()
+        review_service.get_concrete(review.pk)
+        self.product.delete()
+        with self.assertRaises(Http404):
+            review_service.get_concrete(review.pk)
+
+    def test_review_listing_is_cached(self):
+        self.service.add_review(
+            self.product.pk, text='first', rating=5, author=self.user
+        )
+        self.service.get_reviews(self.product.pk)
+        with self.assertNumQueries(0):
+            reviews = self.service.get_reviews(self.product.pk)
+            authors = [review.author.username for review in reviews]
+        self.assertEqual(authors, ['testuser'])
+
+        self.service.add_review(
+            self.product.pk, text='second', rating=1, author=self.user
+        )
+        reviews = self.service.get_reviews(self.product.pk)
+        self.assertEqual(
+            sorted(review.text for review in reviews), ['first', 'second']
+        )
+
+
+class CacheStampedeTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return 'new'
+
+    def test_concurrent_misses_are_coalesced(self):
+        barrier = Barrier(8)
+
+        def slow_compute():
+            self.calls += 1
+            time.sleep(0.2)
+            return 'new'
+
+        def read(_):
+            barrier.wait()
+            return fetch('stampede', slow_compute, 60)
+
+        with ThreadPoolExecutor(8) as executor:
+            values = list(executor.map(read, range(8)))
+
+        self.assertEqual(values, ['new'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_refreshed(self):
+        store('stampede', 'old', -1)
+        cache.add('lock:stampede', 1)
+        self.assertEqual(fetch('stampede', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+        cache.delete('lock:stampede')
+        self.assertEqual(fetch('stampede', self.compute, 60), 'new')
+        self.assertEqual(fetch('stampede', self.compute, 60), 'new')
+        self.assertEqual(self.calls, 1)
+
+    def test_failed_compute_releases_lock(self):
+        def missing():
+            raise Http404
+
+        with self.assertRaises(Http404):
+            fetch('stampede', missing, 60)
+        self.assertIsNone(cache.get('lock:stampede'))
+        self.assertIsNone(cache.get('stampede'))
+
+    def test_value_loaded_before_invalidation_is_not_stored(self):
+        def compute_racing_write():
+            # A write invalidates the key while the old value is loaded
+            invalidate_keys(Product, ['stampede'])
+            return 'old'
+
+        self.assertEqual(fetch('stampede', compute_racing_write, 60), 'old')
+        self.assertIsNone(cache.get('stampede'))
+        self.assertEqual(fetch('stampede', self.compute, 60), 'new')
+        self.assertEqual(cache.get('stampede').value, 'new')
+
+    def test_early_expiration(self):
+        now = time.time()
+        with patch('services.cache.random.random', return_value=0.5):
+            # -ln(0.5) * 10 seconds of computation is beyond 1 second left
+            self.assertFalse(CachedValue('v', now + 1, 10).is_fresh())
+            self.assertTrue(CachedValue('v', now + 1, 0.1).is_fresh())
+
+
+class MultiGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_local_cache(Product).clear()
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.products = [
+            Product.objects.create(
+                title=f'test {i}', description='test desc',
+                price='100.00', seller=self.user
+            )
+            for i in range(3)
+        ]
+
+    def test_get_many(self):
+        missing = uuid.uuid4()
+        pks = [self.products[2].pk, missing, str(self.products[0].pk)]
+        with self.assertNumQueries(1):
+            result = self.service.get_many(pks)
+
+        self.assertEqual(
+            list(result.entries), [self.products[2].pk, self.products[0].pk]
+        )
+        self.assertEqual(result.missing, [missing])
+
+    def test_get_many_without_cache(self):
+        strategy = SimpleCRUDStrategy(Product, ProductService.form)
+        missing = uuid.uuid4()
+        with self.assertNumQueries(1):
+            result = strategy.get_many([missing, self.products[1].pk])
+
+        self.assertEqual(list(result.entries), [self.products[1].pk])
+        self.assertEqual(result.missing, [missing])
+
+    def test_get_many_with_reviews(self):
+        for rating in range(4):
+            review = Review.objects.create(
+                text=f'review {rating}', product=self.products[0],
+                rating=rating, author=self.user
+            )
+            Review.objects.filter(pk=review.pk).update(
+                pub_date=timezone.now().date() - timedelta(days=rating)
+            )
+        Review.objects.create(
+            text='other', product=self.products[1], rating=5,
+            author=self.user
+        )
+
+        pks = [product.pk for product in self.products]
+        with self.assertNumQueries(2):
+            result = self.service.get_many_with_reviews(pks, per_product=2)
+            texts = {
+                pk: [review.text for review in entry.reviews]
+                for pk, entry in result.entries.items()
+            }
+            authors = [
+                review.author.username
+                for entry in result.entries.values()
+                for review in entry.reviews
+            ]
+
+        self.assertEqual(texts, {
+            self.products[0].pk: ['review 0', 'review 1'],
+            self.products[1].pk: ['other'],
+            self.products[2].pk: [],
+        })
+        self.assertEqual(set(authors), {'testuser'})
+        self.assertEqual(result.entries[pks[1]].product, self.products[1])
+
+
+class IdentityMapTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.other = Product.objects.create(
+            title='other', description='test desc',
+            price='10.00', seller=self.user
+        )
+
+    def test_repeated_lookups(self):
+        with identity.identity_scope():
+            product = self.service.get_concrete(self.product.pk)
+            with self.assertNumQueries(0):
+                same = self.service.get_concrete(str(self.product.pk))
+                other_service = ProductService().get_concrete(
+                    self.product.pk
+                )
+
+            self.assertIs(same, product)
+            self.assertIs(other_service, product)
+            with self.assertNumQueries(1):
+                result = self.service.get_many(
+                    [self.other.pk, self.product.pk]
+                )
+            self.assertIs(result.entries[self.product.pk], product)
+
+        self.assertIsNone(identity.get_identity_map())
+        self.assertIsNot(self.service.get_concrete(self.product.pk), product)
+
+    def test_writes_invalidate(self):
+        with identity.identity_scope():
+            product = self.service.get_concrete(self.product.pk)
+            self.service.update(
+                self.product.pk, version=1, partial=True, title='new'
+            )
+            updated = self.service.get_concrete(self.product.pk)
+            self.assertIsNot(updated, product)
+            self.assertEqual(updated.title, 'new')
+
+            self.service.delete(self.product.pk)
+            with self.assertRaises(Http404):
+                self.service.get_concrete(self.product.pk)
+
+    def test_middleware(self):
+        lookups = []
+
+        def view(request):
+            lookups.append(self.service.get_concrete(self.product.pk))
+            lookups.append(self.service.get_concrete(self.product.pk))
+            return HttpResponse()
+
+        middleware = identity.IdentityMapMiddleware(view)
+        middleware(RequestFactory().get('/'))
+        middleware(RequestFactory().get('/'))
+        self.assertIs(lookups[0], lookups[1])
+        self.assertIsNot(lookups[1], lookups[2])
+
+    async def test_async_requests_have_own_maps(self):
+        maps = []
+
+        async def view(request):
+            maps.append(identity.get_identity_map())
+            await asyncio.sleep(0)
+            maps.append(identity.get_identity_map())
+            product = await self.service.aget_concrete(self.product.pk)
+            self.assertIs(
+                await self.service.aget_concrete(self.product.pk), product
+            )
+            return HttpResponse()
+
+        middleware = identity.IdentityMapMiddleware(view)
+        await asyncio.gather(
+            middleware(RequestFactory().get('/')),
+            middleware(RequestFactory().get('/')),
+        )
+        self.assertIs(maps[0], maps[2])
+        self.assertIsNot(maps[0], maps[1])
+        self.assertIsNone(identity.get_identity_map())
+
+
+class BulkCRUDTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    def test_bulk_create(self):
+        rows = [
+            {'title': f'title {i}', 'description': 'desc',
+             'price': '10.00', 'seller': self.user}
+            for i in range(5)
+        ]
+        rows.insert(2, {'title': 'bad', 'description': 'desc',
+                        'price': 'nan-price', 'seller': self.user})
+        # Check of sellers, three batched inserts inside a savepoint, and
+        # seller summary upsert inside an outer savepoint
+        with self.assertNumQueries(10):
+            result = self.service.bulk_create(rows, batch_size=2)
+
+        self.assertEqual(len(result.entries), 5)
+        self.assertEqual(list(result.errors), [2])
+        self.assertIn('price', result.errors[2].errors)
+        self.assertEqual(Product.objects.count(), 6)
+
+    def test_bulk_update(self):
+        missing_pk = uuid.uuid4()
+        result = self.service.bulk_update({
+            self.product.pk: {
+                'title': 'new title', 'description': 'new desc',
+                'price': '5.00'
+            },
+            missing_pk: {
+                'title': 'missing', 'description': 'desc', 'price': '1.00'
+            },
+        })
+        self.assertEqual(result.missing, [missing_pk])
+        self.assertEqual(result.errors, {})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, 'new title')
+        self.assertEqual(self.product.price, Decimal('5.00'))
+
+    def test_bulk_update_errors(self):
+        result = self.service.bulk_update({
+            str(self.product.pk): {'title': 'new title'},
+        })
+        self.assertEqual(result.entries, [])
+        self.assertIn(self.product.pk, result.errors)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, 'test')
+
+    def test_bulk_delete(self):
+        Review.objects.create(
+            text='test_review', product=self.product,
+            rating=5, author=self.user
+        )
+        deleted = self.service.bulk_delete([self.product.pk, uuid.uuid4()])
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Review.objects.exists())
+
+
+class SchemaTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    def test_create_checks_fields(self):
+        data = {'title': 'title', 'description': 'desc', 'price': '1.00'}
+        with self.assertRaisesMessage(ValueError, "missing ['seller']"):
+            self.service.create(**data)
+        with self.assertRaisesMessage(ValueError, "unknown ['color']"):
+            self.service.create(**data, seller=self.user, color='red')
+
+        product = self.service.create(**data, seller_id=self.user.pk)
+        self.assertEqual(product.seller, self.user)
+
+    def test_create_cleaned(self):
+        review = self.service.review_service.create_cleaned(
+            text='text', rating=4, product_id=self.product.pk,
+            author_id=self.user.pk
+        )
+        self.assertEqual(review.rating, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+
+    def test_bulk_create_reports_incorrect_rows(self):
+        rows = [
+            {'title': 'ok', 'description': 'desc', 'price': Decimal('1'),
+             'seller_id': self.user.pk},
+            {'title': 'color', 'description': 'desc', 'price': Decimal('1'),
+             'seller_id': self.user.pk, 'color': 'red'},
+            {'title': 'no seller', 'description': 'desc',
+             'price': Decimal('1')},
+            {'title': 'ghost', 'description': 'desc', 'price': Decimal('1'),
+             'seller_id': 0},
+            {'title': 'rated', 'description': 'desc', 'price': Decimal('1'),
+             'seller_id': self.user.pk, 'review_count': 100},
+        ]
+        result = self.service.bulk_create(rows, cleaned=True)
+        self.assertEqual([entry.title for entry in result.entries], ['ok'])
+        self.assertEqual(list(result.errors), [1, 2, 3, 4])
+        self.assertIn(
+            'review_count', str(result.errors[4].non_field_errors())
+        )
+        self.assertIn('color', str(result.errors[1].non_field_errors()))
+        self.assertIn('seller', str(result.errors[2].non_field_errors()))
+        self.assertIn(
+            'does not exist', str(result.errors[3].non_field_errors())
+        )
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_bulk_create_reviews_of_missing_products(self):
+        result = self.service.review_service.bulk_create([
+            {'text': 'ok', 'rating': 5, 'product_id': self.product.pk,
+             'author_id': self.user.pk},
+            {'text': 'ghost', 'rating': 5, 'product_id': uuid.uuid4(),
+             'author_id': self.user.pk},
+        ], cleaned=True)
+        self.assertEqual(len(result.entries), 1)
+        self.assertEqual(list(result.errors), [1])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+
+    def test_bulk_create_cleaned(self):
+        rows = [
+            {'title': f'title {i}', 'description': 'desc',
+             'price': Decimal('10.00'), 'seller_id': self.user.pk}
+            for i in range(3)
+        ]
+        result = self.service.bulk_create(rows, cleaned=True)
+        self.assertEqual(len(result.entries), 3)
+        self.assertEqual(Product.objects.count(), 4)
+
+    def test_bulk_create_cleaned_with_existing_pks(self):
+        pk = uuid.uuid4()
+        rows = [
+            {'uuid': row_pk, 'title': 'title', 'description': 'desc',
+             'price': Decimal('10.00'), 'seller_id': self.user.pk}
+            for row_pk in (uuid.uuid4(), self.product.pk, pk, pk)
+        ]
+        result = self.service.bulk_create(rows, cleaned=True)
+        self.assertEqual(len(result.entries), 2)
+        self.assertEqual(list(result.errors), [1, 3])
+        self.assertIn('already exists', str(result.errors[1].errors))
+        self.assertEqual(Product.objects.count(), 3)
+
+
+class VersionedUpdateTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.data = {
+            'title': 'new', 'description': 'new desc', 'price': '50.00'
+        }
+
+    def test_update_with_version(self):
+        SellerStats.objects.create(
+            user=self.user, product_count=1, price_sum='100.00'
+        )
+        # Seller summary update and conditional update inside a savepoint
+        with self.assertNumQueries(4):
+            product = self.service.update(
+                self.product.pk, version=1, **self.data
+            )
+
+        self.assertEqual(product.version, 2)
+        self.assertEqual(product.title, 'new')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.version, 2)
+        self.assertEqual(self.product.price, Decimal('50.00'))
+
+    def test_update_without_price(self):
+        # Only the conditional update without price
+        with self.assertNumQueries(1):
+            product = self.service.update(
+                self.product.pk, version=1, partial=True, title='new'
+            )
+
+        self.assertEqual(product.version, 2)
+
+    def test_update_with_stale_version(self):
+        self.service.update(self.product.pk, version=1, **self.data)
+        conflict = self.service.update(
+            self.product.pk, version=1, title='other', partial=True
+        )
+        self.assertEqual(conflict, Conflict(self.product.pk, 1, 2))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, 'new')
+
+        with self.assertRaises(Http404):
+            self.service.update(uuid.uuid4(), version=1, **self.data)
+
+    def test_partial_update(self):
+        # Aggregates changed concurrently must not be overwritten
+        Product.objects.filter(pk=self.product.pk).update(review_count=3)
+        product = self.service.update(
+            self.product.pk, partial=True, title='new'
+        )
+        self.assertEqual(product.version, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, 'new')
+        self.assertEqual(self.product.description, 'test desc')
+        self.assertEqual(self.product.review_count, 3)
+
+        form = self.service.update(self.product.pk, partial=True, price='x')
+        self.assertIn('price', form.errors)
+
+    def test_review_update_with_version(self):
+        review_service = self.service.review_service
+        review = review_service.create(
+            text='text', rating=5, product=self.product, author=self.user
+        )
+        review_service.update(review.pk, version=1, partial=True, rating=1)
+        with CaptureQueriesContext(connection) as queries:
+            review_service.update(
+                review.pk, version=2, partial=True, text='t'
+            )
+        # Review isn't read before the conditional UPDATE
+        statements = [
+            query['sql'].split()[0] for query in queries
+            if 'products_review' in query['sql']
+        ]
+        self.assertEqual(statements[0], 'UPDATE')
+        conflict = review_service.update(
+            review.pk, version=2, partial=True, rating=3
+        )
+        self.assertEqual(conflict, Conflict(review.pk, 2, 3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_histogram, [0, 1, 0, 0, 0, 0])
+
+    async def test_aupdate_with_version(self):
+        product = await self.service.aupdate(
+            self.product.pk, version=1, **self.data
+        )
+        self.assertEqual(product.version, 2)
+        conflict = await self.service.aupdate(
+            self.product.pk, version=1, **self.data
+        )
+        self.assertEqual(conflict.current_version, 2)
+
+
+class PaginationTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        for i in range(5):
+            Product.objects.create(
+                title=f'test {i}', description='test desc',
+                price='100.00', seller=self.user
+            )
+
+    def test_get_page(self):
+        expected = list(Product.objects.order_by('-pub_date', '-uuid'))
+        entries = []
+        cursor = None
+        while True:
+            page = self.service.get_page(after=cursor, limit=2)
+            entries.extend(page.entries)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(entries, expected)
+
+    def test_get_page_ordering(self):
+        first = self.service.get_page(limit=3, order_by=('title',))
+        second = self.service.get_page(
+            after=first.next_cursor, limit=3, order_by=('title',)
+        )
+        titles = [entry.title for entry in first.entries + second.entries]
+        self.assertEqual(titles, [f'test {i}' for i in range(5)])
+        self.assertIsNone(second.next_cursor)
+
+    def test_incorrect_cursor(self):
+        with self.assertRaises(ValueError):
+            self.service.get_page(after='incorrect')
+
+        for values in ([1, 2], [{}, 'x'], [None, 'x'], {'a': 1}):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(values).encode()
+            ).decode()
+            with self.subTest(values=values), self.assertRaises(ValueError):
+                self.service.get_page(after=cursor)
+
+        cursor = base64.urlsafe_b64encode(b'[1,2]').decode()
+        response = self.client.get(
+            reverse('products:product-list'), {'after': cursor}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_incorrect_limit(self):
+        for limit in (0, -1):
+            with self.subTest(limit=limit), self.assertRaises(ValueError):
+                self.service.get_page(limit=limit)
+            with self.subTest(limit=limit), self.assertRaises(ValueError):
+                self.service.list_summaries(limit=limit)
+
+    def test_list_summaries(self):
+        expected = [entry.pk for entry in self.service.get_page().entries]
+        summaries = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                page = self.service.list_summaries(after=cursor, limit=2)
+            summaries.extend(page.entries)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual([summary.uuid for summary in summaries], expected)
+        self.assertIsInstance(summaries[0], ProductSummary)
+        self.assertEqual(summaries[0].price, Decimal('100.00'))
+        self.assertIsNone(summaries[0].average_rating)
+
+    def test_list_summaries_in_cents(self):
+        product = Product.objects.create(
+            title='cheap', description='test desc', price='19.99',
+            seller=self.user
+        )
+        prices = {
+            summary.uuid: summary.price
+            for summary in self.service.list_summaries(cents=True).entries
+        }
+        self.assertEqual(prices[product.pk], 1999)
+        self.assertIsInstance(prices[product.pk], int)
+        self.assertEqual(set(prices.values()), {1999, 10000})
+
+    def test_list_review_summaries(self):
+        product, other = Product.objects.all()[:2]
+        for rating in range(3):
+            self.service.add_review(
+                product.pk, text=f'review {rating}', rating=rating,
+                author=self.user
+            )
+        self.service.add_review(
+            other.pk, text='other', rating=5, author=self.user
+        )
+
+        page = self.service.review_service.list_summaries(
+            limit=2, product_pk=product.pk
+        )
+        rest = self.service.review_service.list_summaries(
+            after=page.next_cursor, limit=2, product_pk=product.pk
+        )
+        summaries = page.entries + rest.entries
+        self.assertIsInstance(summaries[0], ReviewSummary)
+        self.assertEqual(
+            [summary.uuid for summary in summaries],
+            list(Review.objects.filter(product=product).order_by(
+                '-pub_date', '-uuid'
+            ).values_list('pk', flat=True))
+        )
+        self.assertIsNone(rest.next_cursor)
+        self.assertEqual(
+            {summary.product_id for summary in summaries}, {product.pk}
+        )
+
+
+class RatingAggregatesTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    def assertRating(self, review_count, rating_sum, histogram):
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.review_count, review_count)
+        self.assertEqual(product.rating_sum, rating_sum)
+        self.assertEqual(product.rating_histogram, histogram)
+
+    def test_add_review(self):
+        self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        self.service.add_review(
+            self.product.pk, text='review', rating=2, author=self.user
+        )
+        self.assertRating(2, 6, [0, 0, 1, 0, 1, 0])
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.average_rating, 3)
+
+    def test_invalid_review(self):
+        self.service.add_review(
+            self.product.pk, text='review', rating=6, author=self.user
+        )
+        self.assertRating(0, 0, [0] * 6)
+
+    def test_update_review(self):
+        review = self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        self.service.review_service.update(review.pk, text='new', rating=1)
+        self.assertRating(1, 1, [0, 1, 0, 0, 0, 0])
+
+    def test_remove_review(self):
+        review = self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        self.service.remove_review(review.pk)
+        self.assertRating(0, 0, [0] * 6)
+
+    def test_bulk_reviews(self):
+        result = self.service.review_service.bulk_create([
+            {'text': 'review', 'rating': rating,
+             'product': self.product, 'author': self.user}
+            for rating in (5, 5, 3)
+        ])
+        self.assertRating(3, 13, [0, 0, 0, 1, 0, 2])
+        self.service.review_service.bulk_delete(
+            [review.pk for review in result.entries[:2]]
+        )
+        self.assertRating(1, 3, [0, 0, 0, 1, 0, 0])
+
+    def test_rebuild_command(self):
+        for rating in (1, 5):
+            Review.objects.create(
+                text='review', product=self.product,
+                rating=rating, author=self.user
+            )
+
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertRating(2, 6, [0, 1, 0, 0, 0, 1])
+
+
+class SellerStatsTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = self.service.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.service.create(
+            title='other', description='test desc',
+            price='50.00', seller=self.user
+        )
+
+    def assertSummary(self, product_count, price_sum, review_count,
+                      rating_sum):
+        summary = self.service.seller_summary(self.user)
+        self.assertEqual(
+            (summary.product_count, summary.price_sum,
+             summary.review_count, summary.rating_sum),
+            (product_count, Decimal(price_sum), review_count, rating_sum)
+        )
+
+    def test_products(self):
+        self.assertSummary(2, '150.00', 0, 0)
+        self.service.update(
+            self.product.pk, version=1, partial=True, price='80.00'
+        )
+        self.assertSummary(2, '130.00', 0, 0)
+        summary = self.service.seller_summary(self.user.pk)
+        self.assertEqual(summary.average_price, Decimal('65.00'))
+
+    def test_missing_summaries_are_created(self):
+        SellerStats.objects.all().delete()
+        self.service.update(
+            self.product.pk, version=1, partial=True, price='80.00'
+        )
+        self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        self.assertSummary(0, '0', 1, 4)
+
+    def test_stale_price_update(self):
+        conflict = self.service.update(
+            self.product.pk, version=2, partial=True, price='80.00'
+        )
+        self.assertIsInstance(conflict, Conflict)
+        self.assertSummary(2, '150.00', 0, 0)
+
+    def test_reviews(self):
+        review = self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        self.service.add_review(
+            self.product.pk, text='review', rating=2, author=self.user
+        )
+        self.service.review_service.update(review.pk, text='new', rating=5)
+        self.assertSummary(2, '150.00', 2, 7)
+        self.assertEqual(
+            self.service.seller_summary(self.user).average_rating, 3.5
+        )
+
+        self.service.delete(self.product.pk)
+        self.assertSummary(1, '50.00', 0, 0)
+
+    def test_summary_query(self):
+        with self.assertNumQueries(1):
+            self.service.seller_summary(self.user)
+
+        seller = User.objects.create_user(
+            username='seller', password='testpass'
+        )
+        summary = self.service.seller_summary(seller)
+        self.assertEqual(summary.product_count, 0)
+        self.assertIsNone(summary.average_price)
+
+    def test_reconcile_command(self):
+        SellerStats.objects.all().delete()
+        Product.objects.create(
+            title='admin', description='test desc',
+            price='25.00', seller=self.user
+        )
+        Review.objects.create(
+            text='review', product=self.product, rating=3, author=self.user
+        )
+        call_command('rebuild_ratings', stdout=StringIO())
+        call_command('reconcile_seller_stats', stdout=StringIO())
+        self.assertSummary(3, '175.00', 1, 3)
+
+
+class ReviewQueueTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            REVIEW_QUEUE_PATH=Path(directory.name) / 'queue.sqlite3'
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    def submit(self, product_pk, rating=4):
+        return self.service.submit_review(
+            product_pk, text='review', rating=rating, author=self.user
+        )
+
+    def test_submit(self):
+        with self.assertNumQueries(0):
+            handle = self.submit(self.product.pk)
+
+        self.assertEqual(self.service.review_status(handle).status, PENDING)
+        self.assertFalse(Review.objects.exists())
+        form = self.submit(self.product.pk, rating=6)
+        self.assertIn('rating', form.errors)
+        with self.assertRaises(Http404):
+            self.service.review_status(uuid.uuid4())
+
+    def test_drain(self):
+        handles = [self.submit(self.product.pk, rating) for rating in (4, 2)]
+        missing = self.submit(uuid.uuid4())
+        stats = drain(self.service.review_service)
+        self.assertEqual((stats.written, stats.rejected), (2, 1))
+
+        for handle in handles:
+            self.assertEqual(self.service.review_status(handle).status, DONE)
+            self.assertTrue(Review.objects.filter(pk=handle).exists())
+        submission = self.service.review_status(missing)
+        self.assertEqual(submission.status, REJECTED)
+        self.assertIn('product', submission.errors)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.rating_sum, 6)
+
+    def test_drain_product_deleted_after_check(self):
+        handle = self.submit(self.product.pk)
+        bulk_create = self.service.review_service.bulk_create
+
+        def delete_and_create(*args, **kwargs):
+            Product.objects.filter(pk=self.product.pk).delete()
+            return bulk_create(*args, **kwargs)
+
+        with patch.object(
+            self.service.review_service, 'bulk_create', delete_and_create
+        ):
+            stats = drain(self.service.review_service)
+
+        self.assertEqual((stats.written, stats.rejected), (0, 1))
+        submission = self.service.review_status(handle)
+        self.assertEqual(submission.status, REJECTED)
+        self.assertIn('__all__', submission.errors)
+        self.assertFalse(Review.objects.exists())
+
+    def test_retry_after_crash(self):
+        handle = self.submit(self.product.pk)
+        # Batch is written, but worker dies before completing journal
+        journal = get_journal()
+        drain_batch = journal.claim(10)
+        self.service.review_service.bulk_create(
+            [{'uuid': pk, **data, 'product_id': self.product.pk}
+             for pk, data in drain_batch],
+            cleaned=True
+        )
+        self.assertEqual(drain(self.service.review_service).written, 0)
+
+        drain(self.service.review_service, lease=-1)
+        self.assertEqual(self.service.review_status(handle).status, DONE)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+
+    def test_drain_command(self):
+        handle = self.submit(self.product.pk)
+        call_command('drain_reviews', stdout=StringIO())
+        self.assertEqual(self.service.review_status(handle).status, DONE)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.seller = User.objects.create_user(
+            username='seller', password='testpass'
+        )
+        self.phone = self.service.create(
+            title='Red phone', description='Cheap phone with a case',
+            price='100.00', seller=self.user
+        )
+        self.case = self.service.create(
+            title='Phone case', description='Red leather case',
+            price='10.00', seller=self.seller
+        )
+
+    def test_search(self):
+        products = self.service.search('red phone')
+        self.assertEqual(products, [self.phone, self.case])
+
+    def test_search_prefix(self):
+        self.assertEqual(self.service.search('leath'), [self.case])
+
+    def test_search_filters(self):
+        self.assertEqual(
+            self.service.search('phone', {'price_max': '50'}), [self.case]
+        )
+        self.assertEqual(
+            self.service.search('phone', {'seller': self.user}), [self.phone]
+        )
+
+    def test_search_syntax_is_escaped(self):
+        self.assertEqual(self.service.search('"phone* OR'), [])
+        self.assertEqual(self.service.search('  '), [])
+
+    def test_index_is_synced(self):
+        self.service.update(
+            self.case.pk, title='Cover', description='Leather cover',
+            price='10.00'
+        )
+        self.assertEqual(self.service.search('case'), [self.phone])
+        self.service.delete(self.phone.pk)
+        self.assertEqual(self.service.search('case'), [])
+        self.assertEqual(self.service.search('cover'), [self.case])
+
+    def test_admin_search(self):
+        model_admin = admin.site._registry[Product]
+        queryset, distinct = model_admin.get_search_results(
+            None, Product.objects.all(), 'leather'
+        )
+        self.assertEqual(list(queryset), [self.case])
+        self.assertFalse(distinct)
+
+    def test_admin_changelist_keeps_rank(self):
+        admin_user = User.objects.create_superuser(
+            username='admin', password='testpass'
+        )
+        self.client.force_login(admin_user)
+        url = reverse('admin:products_product_changelist')
+        response = self.client.get(url, {'q': 'red phone'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.phone, self.case]
+        )
+        response = self.client.get(url, {'q': 'nothing'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite index')
+    def test_index_survives_renumbered_rowids(self):
+        # Like `VACUUM`, which may renumber implicit rowids
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE products_product SET rowid = rowid + 100'
+            )
+
+        self.assertEqual(self.service.search('leather'), [self.case])
+        self.assertEqual(self.service.search('cheap'), [self.phone])
+
+
+class ReviewQueriesTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.empty_product = Product.objects.create(
+            title='empty', description='test desc',
+            price='100.00', seller=self.user
+        )
+        for rating in range(3):
+            self.review = self.service.add_review(
+                self.product.pk, text='review', rating=rating,
+                author=self.user
+            )
+
+    def test_get_reviews_queries(self):
+        with self.assertNumQueries(1):
+            reviews = self.service.get_reviews(self.product.pk)
+            authors = [review.author.username for review in reviews]
+
+        self.assertEqual(authors, ['testuser'] * 3)
+
+    def test_get_empty_reviews_queries(self):
+        with self.assertNumQueries(2):
+            reviews = self.service.get_reviews(self.empty_product.pk)
+
+        self.assertEqual(len(reviews), 0)
+        with self.assertRaises(Http404):
+            self.service.get_reviews(uuid.uuid4())
+
+    def test_add_review_queries(self):
+        # Insert, rating update, select of seller, upsert and update of
+        # seller summary, daily count update and queued ranking update
+        # inside a savepoint, nothing after commit
+        with self.assertNumQueries(10), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.service.add_review(
+                self.product.pk, text='review', rating=5, author=self.user
+            )
+
+    def test_add_review_to_missing_product(self):
+        with self.assertRaises(Http404):
+            self.service.add_review(
+                uuid.uuid4(), text='review', rating=5, author=self.user
+            )
+
+        self.assertEqual(Review.objects.count(), 3)
+
+    def test_remove_review_queries(self):
+        # Projected select, delete, rating update, select of seller, upsert
+        # and update of seller summary, daily count update and queued
+        # ranking update inside a savepoint, nothing after commit
+        with self.assertNumQueries(10), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.service.remove_review(self.review.pk)
+
+
+class RankingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.products = [
+            Product.objects.create(
+                title=f'test {i}', description='test desc',
+                price='100.00', seller=self.user
+            )
+            for i in range(3)
+        ]
+        # Built by `compact_rankings` command on deploy
+        rebuild_rankings()
+
+    def refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_rankings', stdout=StringIO())
+
+    def add_reviews(self, product, *ratings, refresh=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            reviews = [
+                self.service.add_review(
+                    product.pk, text='review', rating=rating,
+                    author=self.user
+                )
+                for rating in ratings
+            ]
+
+        if refresh:
+            self.refresh()
+        return reviews
+
+    def test_updates_are_coalesced(self):
+        self.add_reviews(self.products[0], 5, 4, refresh=False)
+        self.assertEqual(self.service.top('top_rated'), [])
+        self.assertEqual(RankingUpdate.objects.count(), 1)
+
+        self.refresh()
+        self.assertEqual(self.service.top('top_rated'), self.products[:1])
+        self.assertFalse(RankingUpdate.objects.exists())
+
+    def test_top(self):
+        self.add_reviews(self.products[0], 5)
+        self.add_reviews(self.products[1], 4, 4, 4)
+        self.assertEqual(
+            self.service.top('most_reviewed', 5), self.products[1::-1]
+        )
+        # Ranking changed by writes is reloaded once
+        self.assertEqual(self.service.top('top_rated', 1), [self.products[1]])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.service.top('top_rated', 1), [self.products[1]]
+            )
+
+        with self.assertRaises(ValueError):
+            self.service.top('unknown')
+        with self.assertRaises(ValueError):
+            self.service.top('top_rated', -1)
+
+    def test_top_after_cache_is_cleared(self):
+        self.add_reviews(self.products[0], 5)
+        cache.clear()
+        # Ranking rows and products
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                self.service.top('top_rated'), self.products[:1]
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.service.top('top_rated'), self.products[:1]
+            )
+
+    def test_rankings_are_not_built_on_read(self):
+        self.add_reviews(self.products[0], 5)
+        ProductRanking.objects.all().delete()
+        cache.clear()
+        self.assertEqual(self.service.top('top_rated'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('compact_rankings', stdout=StringIO())
+        self.assertEqual(self.service.top('top_rated'), self.products[:1])
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.service.top('trending'), [])
+        reviews = self.add_reviews(self.products[2], 3, 3)
+        self.add_reviews(self.products[0], 1)
+        self.assertEqual(
+            self.service.top('trending'),
+            [self.products[2], self.products[0]]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for review in reviews:
+                self.service.remove_review(review.pk)
+
+        self.refresh()
+        self.assertEqual(self.service.top('trending'), [self.products[0]])
+        self.assertEqual(
+            ReviewDailyCount.objects.get(product=self.products[2]).count, 0
+        )
+
+    def test_updates_write_only_rows_of_changed_products(self):
+        self.add_reviews(self.products[0], 5)
+        rows = set(ProductRanking.objects.values_list('pk', 'score'))
+        self.add_reviews(self.products[1], 1)
+        changed = set(
+            ProductRanking.objects.values_list('pk', 'score')
+        ) - rows
+        self.assertEqual(
+            set(ProductRanking.objects.filter(
+                pk__in=[pk for pk, _ in changed]
+            ).values_list('product_id', flat=True)),
+            {self.products[1].pk}
+        )
+
+    def test_lowest_entries_are_evicted(self):
+        with patch('products.services.rankings.RANKING_SIZE', 1):
+            self.add_reviews(self.products[0], 5)
+            self.add_reviews(self.products[1], 1)
+            self.add_reviews(self.products[2], 5, 5)
+
+        self.assertEqual(self.service.top('top_rated'), self.products[2:])
+        self.assertEqual(
+            ProductRanking.objects.filter(kind='top_rated').count(), 1
+        )
+
+    def test_compact_rankings(self):
+        self.add_reviews(self.products[0], 2)
+        # Reviews created bypassing services are counted by compaction
+        for _ in range(2):
+            Review.objects.create(
+                text='review', product=self.products[1], rating=5,
+                author=self.user
+            )
+        self.assertEqual(self.service.top('most_reviewed'), self.products[:1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('compact_rankings', stdout=StringIO())
+        self.assertEqual(ReviewDailyCount.objects.count(), 2)
+        self.assertEqual(
+            self.service.top('most_reviewed'), self.products[1::-1]
+        )
+
+
+class CatalogEndpointTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.url = reverse('products:product-detail', args=[self.product.pk])
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'test')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.service.update(
+            self.product.pk, version=1, partial=True, title='new'
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'new')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_responses(self):
+        url = reverse('products:product-list')
+        response = self.client.get(url, {'limit': 10})
+        self.assertEqual(response.json()['results'], [{
+            'uuid': str(self.product.pk), 'title': 'test', 'price': '100.00',
+            'seller': self.user.pk,
+            'pub_date': self.product.pub_date.isoformat(),
+            'review_count': 0, 'average_rating': None,
+        }])
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {'limit': 10})
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        self.assertEqual(
+            self.client.get(url, {'after': 'bad'}).status_code, 400
+        )
+
+    def test_reviews_invalidated_by_writes(self):
+        url = reverse('products:product-reviews', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        product_etag = self.client.get(self.url)['ETag']
+        self.service.add_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'][0]['author'], 'testuser')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=product_etag)
+        self.assertEqual(response.json()['review_count'], 1)
+
+    def test_list_validators_dont_scan_products(self):
+        from . import http_cache
+
+        with self.assertNumQueries(0):
+            validators = http_cache.list_validators(None)
+        self.assertEqual(http_cache.list_validators(None), validators)
+
+        self.service.create(
+            title='new', description='test desc', price='1.00',
+            seller=self.user
+        )
+        self.assertNotEqual(
+            http_cache.list_validators(None).etag, validators.etag
+        )
+
+    def test_validators_of_write_during_compute_not_stored(self):
+        from . import http_cache
+
+        make_validators = http_cache._make_validators
+
+        def write_and_make(*args, **kwargs):
+            # Validators are computed from the old row, then a write commits
+            validators = make_validators(*args, **kwargs)
+            Product.objects.get(pk=self.product.pk).save()
+            return validators
+
+        with patch.object(http_cache, '_make_validators', write_and_make):
+            old = http_cache.product_validators(None, self.product.pk)
+
+        new = http_cache.product_validators(None, self.product.pk)
+        self.assertNotEqual(new.last_modified, old.last_modified)
+
+    def test_validators_expire(self):
+        with override_settings(CRUD_CACHE_TIMEOUTS={'products.product': 0}):
+            etag = self.client.get(self.url)['ETag']
+            Product.objects.filter(pk=self.product.pk).update(version=5)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 5)
+
+    def test_missing_product(self):
+        url = reverse('products:product-detail', args=[uuid.uuid4()])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse('products:product-reviews', args=[uuid.uuid4()])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SerializerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='tést', description='test desc',
+            price='19.90', seller=self.user
+        )
+        self.review = Review.objects.create(
+            product=self.product, text='review', rating=4, author=self.user
+        )
+        self.product.refresh_from_db()
+
+    def expected(self, product: Product) -> dict:
+        return json.loads(json.dumps({
+            'uuid': product.uuid,
+            'title': product.title,
+            'description': product.description,
+            'price': product.price,
+            'seller': product.seller_id,
+            'pub_date': product.pub_date,
+            'updated_at': product.updated_at,
+            'version': product.version,
+            'review_count': product.review_count,
+            'average_rating': product.average_rating,
+            'rating_histogram': product.rating_histogram,
+        }, cls=DjangoJSONEncoder))
+
+    def test_encoded_like_django(self):
+        for orjson in (serializers.orjson, None):
+            with self.subTest(orjson=orjson), patch.object(
+                serializers, 'orjson', orjson
+            ):
+                serializer = serializers.ModelSerializer(
+                    Product, serializers.PRODUCT_FIELDS
+                )
+                content = serializer.dumps(self.product)
+                self.assertEqual(json.loads(content), self.expected(
+                    self.product
+                ))
+                self.assertEqual(json.loads(content)['price'], '19.90')
+                self.assertIn('tést'.encode(), content)
+
+    def test_iter_array(self):
+        products = [self.product] * 5
+        expected = serializers.dumps(
+            serializers.product_serializer.to_list(products)
+        )
+        for chunk_size in (1, 2, 5, 10):
+            content = b''.join(serializers.product_serializer.iter_array(
+                products, chunk_size=chunk_size
+            ))
+            self.assertEqual(content, expected)
+
+        empty = b''.join(serializers.product_serializer.iter_array([]))
+        self.assertEqual(json.loads(empty), [])
+
+    def test_paginated_reviews(self):
+        Review.objects.create(
+            product=self.product, text='newer', rating=2, author=self.user
+        )
+        expected = list(Review.objects.order_by(
+            '-pub_date', '-uuid'
+        ).values_list('uuid', 'text', 'rating'))
+        url = reverse('products:product-reviews', args=[self.product.pk])
+        page = self.client.get(url, {'limit': 1}).json()
+        rest = self.client.get(url, {'limit': 1, 'after': page['next']})
+        self.assertIsNone(rest.json()['next'])
+        self.assertEqual(
+            [(uuid.UUID(review['uuid']), review['text'], review['rating'])
+             for review in page['results'] + rest.json()['results']],
+            expected
+        )
+        self.assertEqual(rest.json()['results'][0]['author'], 'testuser')
+        self.assertEqual(
+            self.client.get(url, {'after': 'bad'}).status_code, 400
+        )
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        with override_settings(SERVICE_INSTRUMENTATION=True):
+            class InstrumentedProductService(ProductService):
+                pass
+
+        self.service = InstrumentedProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        registry.reset()
+
+    def test_registry(self):
+        self.service.get_reviews(self.product.pk)
+        self.service.get_concrete(self.product.pk)
+        with self.assertRaises(Http404):
+            self.service.get_concrete(uuid.uuid4())
+
+        metrics = registry.snapshot()
+        get_reviews = metrics['InstrumentedProductService', 'get_reviews']
+        self.assertEqual(get_reviews.calls, 1)
+        self.assertEqual(get_reviews.queries, 2)
+        self.assertEqual(get_reviews.rows, 0)
+        get_concrete = metrics['InstrumentedProductService', 'get_concrete']
+        self.assertEqual(get_concrete.calls, 2)
+        self.assertEqual(get_concrete.errors, 1)
+        self.assertEqual(get_concrete.rows, 1)
+        self.assertEqual(sum(get_concrete.latency_buckets), 2)
+
+    async def test_async_methods(self):
+        await self.service.aget_concrete(self.product.pk)
+        metrics = registry.snapshot()[
+            'InstrumentedProductService', 'aget_concrete'
+        ]
+        self.assertEqual(metrics.calls, 1)
+        self.assertEqual(metrics.queries, 1)
+        self.assertEqual(metrics.rows, 1)
+
+    def test_prometheus_endpoint(self):
+        self.service.get_all()
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        with override_settings(SERVICE_METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code, 403)
+            response = self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer '
+        ).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'service_calls_total{service="InstrumentedProductService",'
+            'method="get_all"} 1', response.content.decode()
+        )
+
+    def test_incomplete_sink(self):
+        from services.instrumentation import BaseMetricsSink
+
+        class IncompleteSink(BaseMetricsSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSink()
+
+    @override_settings(SERVICE_METRICS_SINKS=[
+        'services.instrumentation.LoggingSink'
+    ])
+    def test_logging_sink(self):
+        with self.assertLogs('services.metrics', 'INFO') as logs:
+            self.service.get_all()
+
+        self.assertEqual(logs.records[0].service, 'InstrumentedProductService')
+        self.assertEqual(logs.records[0].method, 'get_all')
+        self.assertEqual(registry.snapshot(), {})
+
+
+class BenchmarkTests(TestCase):
+
+    def test_seed_is_deterministic(self):
+        data = benchmarks.seed(20, seed=1)
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Review.objects.count(), 20)
+        self.assertEqual(
+            SellerStats.objects.aggregate(Sum('product_count')),
+            {'product_count__sum': 20}
+        )
+        titles = list(Product.objects.order_by('pk').values_list('title'))
+
+        User.objects.all().delete()
+        self.assertEqual(benchmarks.seed(20, seed=1)['products'],
+                         data['products'])
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('title')), titles
+        )
+
+    def test_run_and_compare(self):
+        results = benchmarks.run_benchmarks(
+            sizes=[10], iterations=3,
+            operations=['get_concrete', 'add_review']
+        )
+        operations = results['results']['10']
+        self.assertEqual(set(operations), {'get_concrete', 'add_review'})
+        self.assertEqual(benchmarks.compare(results, results), [])
+
+        baseline = json.loads(json.dumps(results))
+        baseline['results']['10']['add_review']['p50_ms'] /= 10
+        regressions = benchmarks.compare(results, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('add_review [10]: p50_ms'))
+
+
+class AsyncServiceTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+
+    async def test_aget_concrete(self):
+        product = await self.service.aget_concrete(self.product.pk)
+        self.assertEqual(product, self.product)
+        with self.assertRaises(Http404):
+            await self.service.aget_concrete(uuid.uuid4())
+
+    async def test_aget_all(self):
+        products = [product async for product in self.service.aget_all()]
+        self.assertEqual(products, [self.product])
+
+    async def test_acreate_aupdate_adelete(self):
+        product = await self.service.acreate(
+            title='new title', description='new desc',
+            price='10.00', seller=self.user
+        )
+        self.assertIsInstance(product, Product)
+        form = await self.service.acreate(title='new title')
+        self.assertFalse(form.is_valid())
+
+        product = await self.service.aupdate(
+            product.pk, title='updated', description='new desc',
+            price='20.00'
+        )
+        self.assertEqual(product.title, 'updated')
+        await self.service.adelete(product.pk)
+        self.assertFalse(
+            await Product.objects.filter(pk=product.pk).aexists()
+        )
+        with self.assertRaises(Http404):
+            await self.service.adelete(product.pk)
+
+    async def test_reviews(self):
+        review = await self.service.aadd_review(
+            self.product.pk, text='review', rating=4, author=self.user
+        )
+        reviews = await self.service.aget_reviews(self.product.pk)
+        self.assertEqual(reviews, [review])
+        self.assertEqual(reviews[0].author.username, 'testuser')
+        product = await Product.objects.aget(pk=self.product.pk)
+        self.assertEqual(product.review_count, 1)
+        with self.assertRaises(Http404):
+            await self.service.aget_reviews(uuid.uuid4())
+
+
+@skipUnless(numpy, 'NumPy is not installed')
+class AnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.products = [
+            self.service.create(
+                title=f'test {price}', description='test desc',
+                price=f'{price}.00', seller=self.user
+            )
+            for price in (10, 20, 30, 40)
+        ]
+        self.today = timezone.now().date()
+        for product, rating, days_ago in (
+            (self.products[0], 5, 0), (self.products[0], 3, 0),
+            (self.products[1], 1, 2),
+        ):
+            review = self.service.add_review(
+                product.pk, text='review', rating=rating, author=self.user
+            )
+            Review.objects.filter(pk=review.pk).update(
+                pub_date=self.today - timedelta(days=days_ago)
+            )
+
+    def test_prices(self):
+        from .analytics import get_percentiles, load_prices
+
+        prices = load_prices(chunk_size=3)
+        self.assertEqual(sorted(prices.tolist()), [10, 20, 30, 40])
+        self.assertEqual(get_percentiles(prices, [50])['p50'], 25)
+
+    def test_rating_distributions(self):
+        from .analytics import load_rating_distributions
+
+        distributions = load_rating_distributions(chunk_size=2)
+        pks = distributions.pks.tolist()
+        self.assertCountEqual(pks, [product.pk for product in self.products])
+        rows = dict(zip(pks, distributions.counts.tolist()))
+        self.assertEqual(rows[self.products[0].pk], [0, 0, 0, 1, 0, 1])
+        averages = dict(zip(pks, distributions.averages))
+        self.assertEqual(averages[self.products[0].pk], 4)
+        self.assertTrue(numpy.isnan(averages[self.products[2].pk]))
+
+    def test_moving_averages(self):
+        from .analytics import load_daily_reviews, moving_averages
+
+        daily = load_daily_reviews(chunk_size=2)
+        self.assertEqual(daily.start, self.today - timedelta(days=2))
+        self.assertEqual(daily.counts.tolist(), [1, 0, 2])
+        averages = moving_averages(daily, window=2)
+        self.assertEqual(averages['reviews'].tolist(), [1, 0.5, 1])
+        self.assertEqual(averages['rating'].tolist(), [1, 1, 4])
+        averages = moving_averages(daily, window=1)
+        self.assertTrue(numpy.isnan(averages['rating'][1]))
+        with self.assertRaises(ValueError):
+            moving_averages(daily, window=0)
+
+    def test_daily_reviews_ignore_reviews_after_bounds(self):
+        from .analytics import load_daily_reviews
+
+        later = Review.objects.create(
+            product=self.products[2], text='later', rating=2,
+            author=self.user
+        )
+        Review.objects.filter(pk=later.pk).update(
+            pub_date=self.today + timedelta(days=3)
+        )
+        queryset = Review.objects.all()
+        with patch.object(
+            type(queryset), 'aggregate', return_value={
+                'start': self.today - timedelta(days=2), 'end': self.today
+            }
+        ):
+            daily = load_daily_reviews(queryset, chunk_size=2)
+
+        self.assertEqual(daily.counts.tolist(), [1, 0, 2])
+
+    def test_report_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'report.json'
+            call_command(
+                'catalog_report', output=path, window=3, stdout=StringIO()
+            )
+            report = json.loads(path.read_text())
+
+        self.assertEqual(report['prices']['count'], 4)
+        self.assertEqual(report['prices']['mean'], 25)
+        self.assertEqual(report['ratings']['distribution'],
+                         [0, 1, 0, 1, 0, 1])
+        self.assertEqual(report['ratings']['rated_products'], 2)
+        self.assertCountEqual(report['ratings']['products'], [
+            {'pk': str(self.products[0].pk),
+             'distribution': [0, 0, 0, 1, 0, 1], 'average': 4},
+            {'pk': str(self.products[1].pk),
+             'distribution': [0, 1, 0, 0, 0, 0], 'average': 1},
+        ])
+        self.assertEqual(report['daily_reviews']['moving_rating'],
+                         [1, 1, 3])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.service = ProductService()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass', is_staff=True
+        )
+        self.products = [
+            Product.objects.create(
+                title=f'test {i}', description='test, "desc"',
+                price='100.00', seller=self.user
+            )
+            for i in range(3)
+        ]
+
+    def test_export_without_user(self):
+        # API-only workers have no authentication middleware
+        request = RequestFactory().get('/')
+        self.assertEqual(views.export(request, 'products').status_code, 403)
+
+    @override_settings(
+        DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=30
+    )
+    def test_watermark_covers_replication_lag(self):
+        before = timezone.now()
+        watermark = export.get_watermark()
+        lag = timedelta(seconds=30)
+        self.assertTrue(before - lag <= watermark <= timezone.now() - lag)
+
+    def test_export_csv(self):
+        content = ''.join(self.service.export(chunk_size=2))
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            {row['uuid'] for row in rows},
+            {str(product.pk) for product in self.products}
+        )
+        self.assertEqual(rows[0]['description'], 'test, "desc"')
+        self.assertEqual(rows[0]['price'], '100.00')
+
+    def test_export_ndjson(self):
+        lines = ''.join(
+            self.service.export('products', 'ndjson')
+        ).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['price'], '100.00')
+
+    def test_export_columnar(self):
+        lines = [
+            json.loads(line) for line in ''.join(
+                self.service.export('products', 'columnar', chunk_size=2)
+            ).splitlines()
+        ]
+        self.assertIn('title', lines[0]['fields'])
+        self.assertEqual([line['num_rows'] for line in lines[1:]], [2, 1])
+        self.assertEqual(len(lines[1]['columns']['title']), 2)
+
+    def test_incremental_export(self):
+        watermark = timezone.now()
+        self.service.update(
+            self.products[0].pk, title='new', description='desc',
+            price='1.00'
+        )
+        review = self.service.add_review(
+            self.products[1].pk, text='review', rating=5, author=self.user
+        )
+        products = ''.join(
+            self.service.export('products', 'ndjson', since=watermark)
+        ).splitlines()
+        self.assertEqual(
+            {json.loads(line)['uuid'] for line in products},
+            {str(self.products[0].pk), str(self.products[1].pk)}
+        )
+        reviews = ''.join(
+            self.service.export('reviews', 'ndjson', since=watermark)
+        ).splitlines()
+        self.assertEqual(json.loads(reviews[0])['uuid'], str(review.pk))
+
+    def test_export_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            '/api/export/reviews/', {'format': 'ndjson'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('X-Export-Watermark', response)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        response = self.client.get('/api/export/products/?format=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_view_is_for_staff(self):
+        response = self.client.get('/api/export/products/')
+        self.assertEqual(response.status_code, 403)
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass'
+        )
+        self.product = Product.objects.create(
+            title='test', description='test desc',
+            price='100.00', seller=self.user
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'catalog.csv'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_csv(self, rows):
+        with self.path.open('w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def test_import_products(self):
+        self.write_csv([
+            {'title': 'first', 'description': 'desc', 'price': '1.00',
+             'seller': self.user.pk},
+            {'title': 'bad price', 'description': 'desc', 'price': 'x',
+             'seller': self.user.pk},
+            {'title': 'unknown seller', 'description': 'desc',
+             'price': '1.00', 'seller': 404},
+            {'title': 'second', 'description': 'desc', 'price': '2.00',
+             'seller': self.user.pk},
+        ])
+        call_command(
+            'import_catalog', str(self.path), '--workers', '0',
+            '--batch-size', '2', stdout=StringIO()
+        )
+        self.assertEqual(
+            set(Product.objects.values_list('title', flat=True)),
+            {'test', 'first', 'second'}
+        )
+        rejected = [
+            json.loads(line) for line in
+            Path(str(self.path) + '.rejected').read_text().splitlines()
+        ]
+        self.assertEqual([row['line'] for row in rejected], [2, 3])
+        self.assertIn('price', rejected[0]['errors'])
+        self.assertIn('seller', rejected[1]['errors'])
+        checkpoint = json.loads(
+            Path(str(self.path) + '.checkpoint').read_text()
+        )
+        self.assertEqual(checkpoint['line'], 4)
+
+    def test_resume_from_checkpoint(self):
+        self.write_csv([
+            {'title': f'title {i}', 'description': 'desc', 'price': '1.00',
+             'seller': self.user.pk}
+            for i in range(4)
+        ])
+        Path(str(self.path) + '.checkpoint').write_text('{"line": 3}')
+        call_command(
+            'import_catalog', str(self.path), '--workers', '0',
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            set(Product.objects.values_list('title', flat=True)),
+            {'test', 'title 3'}
+        )
+
+    def test_resume_is_idempotent(self):
+        self.write_csv([
+            {'title': 'first', 'description': 'desc', 'price': '1.00',
+             'seller': self.user.pk},
+            {'title': 'bad price', 'description': 'desc', 'price': 'x',
+             'seller': self.user.pk},
+        ])
+        rejected_path = Path(str(self.path) + '.rejected')
+        outputs = []
+        for _ in range(2):
+            output = StringIO()
+            call_command(
+                'import_catalog', str(self.path), '--workers', '0',
+                stdout=output
+            )
+            outputs.append(output.getvalue())
+            # Crash after commit of the batch, before the checkpoint
+            Path(str(self.path) + '.checkpoint').write_text(
+                '{"line": 0, "dead_letter_size": 0}'
+            )
+
+        self.assertEqual(Product.objects.filter(title='first').count(), 1)
+        self.assertIn('Imported 1 rows', outputs[0])
+        # Row committed before the crash isn't counted again
+        self.assertIn('Imported 0 rows', outputs[1])
+        self.assertEqual(len(rejected_path.read_text().splitlines()), 1)
+        stats = SellerStats.objects.get(user=self.user)
+        self.assertEqual(stats.product_count, 1)
+
+    def test_import_reviews_ndjson(self):
+        path = Path(self.tmp_dir.name) / 'reviews.ndjson'
+        path.write_text('\n'.join([
+            json.dumps({'text': 'good', 'rating': 5,
+                        'product': str(self.product.pk),
+                        'author': self.user.pk}),
+            'not json',
+            json.dumps({'text': 'bad', 'rating': 1,
+                        'product_id': str(self.product.pk),
+                        'author_id': self.user.pk}),
+        ]))
+        importer = CatalogImporter(
+            'reviews', ReviewService(), Path(str(path) + '.checkpoint'),
+            Path(str(path) + '.rejected'), batch_size=1, max_pending=2
+        )
+        with ThreadPoolExecutor(2) as executor:
+            stats = importer.run(path, executor=executor)
+
+        self.assertEqual(stats, (2, 1, 3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.rating_sum, 6)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class RoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routing.ReplicaRouter()
+
+    def read(self):
+        return self.router.db_for_read(Product, replica=True)
+
+    def test_hinted_reads_go_to_replica(self):
+        with routing.routing_context():
+            self.assertEqual(self.read(), 'replica')
+            self.assertIsNone(self.router.db_for_read(Product))
+            with routing.use_primary():
+                self.assertEqual(self.read(), 'default')
+
+    def test_reads_after_write_go_to_primary(self):
+        with routing.routing_context():
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+            self.assertEqual(self.read(), 'replica')
+            routing._written(sender=Product)
+            self.assertEqual(self.read(), 'default')
+
+        with routing.routing_context():
+            self.assertEqual(self.read(), 'replica')
+
+    def test_writes_outside_context_do_not_pin(self):
+        routing.mark_written()
+        self.assertFalse(routing.has_written())
+        self.assertEqual(self.read(), 'replica')
+
+    def test_write_alias_does_not_pin(self):
+        with routing.routing_context():
+            self.assertEqual(routing.write_alias(Product), 'default')
+            self.assertFalse(routing.has_written())
+            self.assertEqual(self.read(), 'replica')
+
+    def test_middleware_pins_client_after_write(self):
+        reads = []
+
+        def view(request):
+            reads.append(self.read())
+            if request.method == 'POST':
+                routing.mark_written()
+            return HttpResponse()
+
+        middleware = routing.ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertNotIn(routing.PIN_COOKIE, response.cookies)
+
+        response = middleware(factory.post('/'))
+        self.assertEqual(
+            response.cookies[routing.PIN_COOKIE]['max-age'], 5
+        )
+
+        request = factory.get('/')
+        request.COOKIES[routing.PIN_COOKIE] = '1'
+        middleware(request)
+        self.assertEqual(reads, ['replica', 'replica', 'default'])
+
+    async def test_async_middleware_pins_client_after_write(self):
+        reads = []
+
+        async def view(request):
+            reads.append(self.read())
+            if request.method == 'POST':
+                await sync_to_async(routing.mark_written)()
+            return HttpResponse()
+
+        middleware = routing.ReplicaPinMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = RequestFactory()
+        response = await middleware(factory.get('/'))
+        self.assertNotIn(routing.PIN_COOKIE, response.cookies)
+
+        response = await middleware(factory.post('/'))
+        self.assertIn(routing.PIN_COOKIE, response.cookies)
+
+        request = factory.get('/')
+        request.COOKIES[routing.PIN_COOKIE] = '1'
+        await middleware(request)
+        self.assertEqual(reads, ['replica', 'replica', 'default'])
+
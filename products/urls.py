@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import views
+
+
+app_name = 'products'
+
+urlpatterns = [
+    path('products/', views.product_list, name='product-list'),
+    path(
+        'products/<uuid:pk>/', views.product_detail, name='product-detail'
+    ),
+    path(
+        'products/<uuid:pk>/reviews/', views.product_reviews,
+        name='product-reviews'
+    ),
+    path('export/<str:kind>/', views.export, name='export'),
+]
@@ -1,3 +1,131 @@
-from django.shortcuts import render
+from typing import Tuple
+from uuid import UUID
 
-# Create your views here.
+from django.http import (
+    HttpRequest, HttpResponse, HttpResponseBadRequest,
+    HttpResponseForbidden, StreamingHttpResponse
+)
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from services.views import is_staff
+
+from .export import WRITERS, get_watermark
+from .http_cache import (
+    cached_response, list_validators, product_validators, reviews_validators
+)
+from .serializers import (
+    CONTENT_TYPE, json_response, product_serializer,
+    product_summary_serializer, review_summary_serializer
+)
+from .services.products import ProductService
+
+
+product_service = ProductService()
+
+MAX_PAGE_SIZE = 100
+
+
+def _get_page_params(request: HttpRequest) -> Tuple[str, int]:
+    """Return cursor and limit of page from query parameters
+
+    Raises
+    ------
+    ValueError
+        Raises if limit isn't an integer
+
+    """
+    limit = min(int(request.GET.get('limit', 20)), MAX_PAGE_SIZE)
+    return request.GET.get('after'), max(limit, 1)
+
+
+@require_GET
+@cached_response(list_validators)
+def product_list(request: HttpRequest) -> HttpResponse:
+    """Return a page of product summaries, newest first
+
+    Query parameters are `after` (cursor of the next page) and `limit`.
+    Summaries are read as rows without building model instances
+
+    """
+    try:
+        after, limit = _get_page_params(request)
+        page = product_service.list_summaries(after=after, limit=limit)
+    except ValueError:
+        return HttpResponseBadRequest('Incorrect `after` or `limit`')
+
+    return json_response({
+        'results': product_summary_serializer.to_list(page.entries),
+        'next': page.next_cursor,
+    })
+
+
+@require_GET
+@cached_response(product_validators)
+def product_detail(request: HttpRequest, pk: UUID) -> HttpResponse:
+    """Return a product"""
+    product = product_service.get_concrete(pk)
+    return HttpResponse(
+        product_serializer.dumps(product), content_type=CONTENT_TYPE
+    )
+
+
+@require_GET
+@cached_response(reviews_validators)
+def product_reviews(request: HttpRequest, pk: UUID) -> HttpResponse:
+    """Return a page of review summaries of a product, newest first
+
+    Query parameters are like of product list, every page is kept in
+    response cache by its own query
+
+    """
+    try:
+        after, limit = _get_page_params(request)
+        page = product_service.review_service.list_summaries(
+            after=after, limit=limit, product_pk=pk
+        )
+    except ValueError:
+        return HttpResponseBadRequest('Incorrect `after` or `limit`')
+
+    if not page.entries and after is None:
+        # Raises Http404 if product doesn't exist
+        product_service.get_concrete(pk)
+
+    return json_response({
+        'results': review_summary_serializer.to_list(page.entries),
+        'next': page.next_cursor,
+    })
+
+
+@require_GET
+def export(request: HttpRequest, kind: str) -> StreamingHttpResponse:
+    """Stream export of products or reviews for staff
+
+    Query parameters are `format` (`csv`, `ndjson` or `columnar`) and
+    `since` (ISO datetime watermark). Watermark for the next incremental
+    export is returned in `X-Export-Watermark` header
+
+    """
+    if not is_staff(request):
+        return HttpResponseForbidden()
+
+    format = request.GET.get('format', 'csv')
+    since = request.GET.get('since')
+    if since is not None:
+        since = parse_datetime(since)
+        if since is None:
+            return HttpResponseBadRequest('Incorrect `since` datetime')
+
+    watermark = get_watermark()
+    try:
+        stream = product_service.export(kind, format, since)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    _, content_type, extension = WRITERS[format]
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['X-Export-Watermark'] = watermark.isoformat()
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{extension}"'
+    )
+    return response
@@ -1,5 +1,4 @@
-from .base import BaseCRUDService
+from .base import AsyncBaseCRUDService, BaseCRUDService
 
 
-__all__ = ['BaseCRUDService']
-
+__all__ = ['AsyncBaseCRUDService', 'BaseCRUDService']
@@ -2,7 +2,8 @@ from abc import ABC
 
 from django.core.exceptions import ImproperlyConfigured
 
-from .strategies import SimpleCRUDStrategy
+from . import instrumentation
+from .strategies import AsyncCRUDStrategy, SimpleCRUDStrategy
 
 
 class BaseCRUDService(ABC):
@@ -14,25 +15,47 @@ class BaseCRUDService(ABC):
         Strategy with CRUD realisation
     model : Model
         Model service work with
+    page_ordering : tuple
+        Default ordering of pages
 
     Methods
     -------
     get_concrete(*args, **kwargs)
         Return a concrete entry
+    get_many(*args, **kwargs)
+        Return many entries by pk
     get_all(*args, **kwargs)
         Return all entries
+    get_page(*args, **kwargs)
+        Return a page of entries
+    get_rows(*args, **kwargs)
+        Return a page of read-only rows of entries
     update(*args, **kwargs)
         Update an entry
     create(*args, **kwargs)
         Create an entry
+    create_cleaned(*args, **kwargs)
+        Create an entry from already cleaned data
     delete(*args, **kwargs)
         Delete an entry
+    bulk_create(*args, **kwargs)
+        Create many entries
+    bulk_update(*args, **kwargs)
+        Update many entries
+    bulk_delete(*args, **kwargs)
+        Delete many entries
 
     """
 
     crud_strategy = SimpleCRUDStrategy
     model = None
     form = None
+    page_ordering = ('pk',)
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if instrumentation.is_enabled():
+            instrumentation.instrument_service(cls)
 
     def __init__(self) -> None:
         if not all((self.model, self.form)):
@@ -47,10 +70,24 @@ class BaseCRUDService(ABC):
         """Return a concrete entry"""
         return self._strategy.get_concrete(*args, **kwargs)
 
+    def get_many(self, *args, **kwargs):
+        """Return many entries by pk"""
+        return self._strategy.get_many(*args, **kwargs)
+
     def get_all(self, *args, **kwargs):
         """Return all entries"""
         return self._strategy.get_all(*args, **kwargs)
 
+    def get_page(self, *args, **kwargs):
+        """Return a page of entries"""
+        kwargs.setdefault('order_by', self.page_ordering)
+        return self._strategy.get_page(*args, **kwargs)
+
+    def get_rows(self, *args, **kwargs):
+        """Return a page of read-only rows of entries"""
+        kwargs.setdefault('order_by', self.page_ordering)
+        return self._strategy.get_rows(*args, **kwargs)
+
     def update(self, *args, **kwargs):
         """Update an entry"""
         return self._strategy.update(*args, **kwargs)
@@ -59,7 +96,75 @@ class BaseCRUDService(ABC):
         """Create a new entry"""
         return self._strategy.create(*args, **kwargs)
 
+    def create_cleaned(self, *args, **kwargs):
+        """Create a new entry from already cleaned data"""
+        return self._strategy.create_cleaned(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
         """Delete an entry"""
         return self._strategy.delete(*args, **kwargs)
 
+    def bulk_create(self, *args, **kwargs):
+        """Create many new entries"""
+        return self._strategy.bulk_create(*args, **kwargs)
+
+    def bulk_update(self, *args, **kwargs):
+        """Update many entries"""
+        return self._strategy.bulk_update(*args, **kwargs)
+
+    def bulk_delete(self, *args, **kwargs):
+        """Delete many entries"""
+        return self._strategy.bulk_delete(*args, **kwargs)
+
+
+class AsyncBaseCRUDService(BaseCRUDService):
+    """Base class with sync and native async CRUD functionality
+
+    Async ORM doesn't support transactions, so subclasses with writes of
+    several statements override async writes to run sync ones in a thread
+
+    Attributes
+    ----------
+    async_crud_strategy
+        Strategy with async CRUD realisation
+
+    Methods
+    -------
+    aget_concrete(*args, **kwargs)
+        Return a concrete entry
+    aget_all(*args, **kwargs)
+        Return async iterator over all entries
+    aupdate(*args, **kwargs)
+        Update an entry
+    acreate(*args, **kwargs)
+        Create an entry
+    adelete(*args, **kwargs)
+        Delete an entry
+
+    """
+
+    async_crud_strategy = AsyncCRUDStrategy
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._async_strategy = self.async_crud_strategy(self.model, self.form)
+
+    async def aget_concrete(self, *args, **kwargs):
+        """Return a concrete entry"""
+        return await self._async_strategy.aget_concrete(*args, **kwargs)
+
+    def aget_all(self, *args, **kwargs):
+        """Return async iterator over all entries"""
+        return self._async_strategy.aget_all(*args, **kwargs)
+
+    async def aupdate(self, *args, **kwargs):
+        """Update an entry"""
+        return await self._async_strategy.aupdate(*args, **kwargs)
+
+    async def acreate(self, *args, **kwargs):
+        """Create a new entry"""
+        return await self._async_strategy.acreate(*args, **kwargs)
+
+    async def adelete(self, *args, **kwargs):
+        """Delete an entry"""
+        return await self._async_strategy.adelete(*args, **kwargs)
@@ -0,0 +1,379 @@
+"""Module with cache helpers for CRUD strategies
+
+Values of django cache are computed once for all workers: on a miss only
+the worker that takes a lock of the key (`cache.add()` is atomic in all
+backends) computes the value, others wait for it. Values are kept for
+`CRUD_CACHE_STALE_TIMEOUT` seconds after expiration and served stale
+while the lock holder refreshes them. Every read may refresh a value a
+bit earlier with probability growing towards expiration (XFetch), so
+refreshes of hot keys are spread in time instead of happening at once
+
+Every invalidation bumps a generation of the key, and values are stored
+only if generation didn't change since their load started, so a reader
+that loaded an entry before a write can't put it back after
+invalidation. In-process LRU tier of entries is disabled by default
+(`CRUD_CACHE_LOCAL_SIZE = 0`): it's cleared only in the process that
+wrote, so other processes may serve stale entries for up to
+`CRUD_CACHE_LOCAL_TIMEOUT` seconds
+
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from math import log
+import random
+from threading import Lock, local
+from time import monotonic, sleep, time
+from typing import (
+    Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional
+)
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Model
+
+from .routing import write_alias
+
+
+DEFAULT_TIMEOUT = 300
+# In-process tier is opt-in, its entries may be stale in other processes
+DEFAULT_LOCAL_SIZE = 0
+DEFAULT_LOCAL_TIMEOUT = 5
+DEFAULT_STALE_TIMEOUT = 60
+DEFAULT_LOCK_TIMEOUT = 10
+
+# Seconds generations of keys are kept, must be longer than any load
+GENERATION_TIMEOUT = 60 * 60
+# Seconds a miss waits for a value computed by the lock holder
+LOCK_WAIT = 2
+# XFetch scale of early expiration, larger values refresh earlier
+XFETCH_BETA = 1.0
+
+
+class CachedValue(NamedTuple):
+    """Value of django cache with metadata of early expiration
+
+    Attributes
+    ----------
+    value
+        Cached value
+    expires : float
+        Timestamp of expiration, value is stale but still served after it
+    delta : float
+        Seconds of computation of value
+
+    """
+
+    value: Any
+    expires: float
+    delta: float
+
+    def is_fresh(self, beta: float = XFETCH_BETA) -> bool:
+        """Check is value fresh, expiring it early with XFetch"""
+        return time() - self.delta * beta * log(
+            1 - random.random()
+        ) < self.expires
+
+
+class LRUCache:
+    """Bounded thread-safe in-process cache with per-entry expiration
+
+    Attributes
+    ----------
+    maxsize : int
+        Maximum number of entries
+    timeout : float
+        Seconds entry lives in cache
+
+    Methods
+    -------
+    get(key, default=None)
+        Return value by key or default
+    set(key, value)
+        Put value to cache, evicting least recently used entry
+    delete(key)
+        Remove entry from cache
+    clear()
+        Remove all entries
+
+    """
+
+    def __init__(self, maxsize: int, timeout: float) -> None:
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return value by key or default"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires, value = item
+            if expires < monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Put value to cache, evicting least recently used entry"""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove entry from cache"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_local_caches = {}
+_local_caches_lock = Lock()
+
+# Keys invalidated inside a not yet committed transaction. Reads of these
+# keys bypass the cache until commit, so rolled back or uncommitted data
+# never gets cached
+_dirty = local()
+
+
+def get_cache():
+    """Return django cache used by CRUD strategies"""
+    return caches[getattr(settings, 'CRUD_CACHE_ALIAS', 'default')]
+
+
+def get_timeout(model: Model) -> int:
+    """Return cache timeout for model from `CRUD_CACHE_TIMEOUTS` setting"""
+    timeouts = getattr(settings, 'CRUD_CACHE_TIMEOUTS', {})
+    return timeouts.get(model._meta.label_lower, DEFAULT_TIMEOUT)
+
+
+def get_stale_timeout() -> int:
+    """Return seconds stale values are served while refreshed"""
+    return getattr(
+        settings, 'CRUD_CACHE_STALE_TIMEOUT', DEFAULT_STALE_TIMEOUT
+    )
+
+
+def wrap(value: Any, timeout: int, delta: float = 0) -> CachedValue:
+    """Return value with metadata of expiration in timeout seconds"""
+    return CachedValue(value, time() + timeout, delta)
+
+
+def _generation_key(key: str) -> str:
+    return f'generation:{key}'
+
+
+def get_generations(keys: Iterable[str]) -> Dict[str, int]:
+    """Return generations of keys, bumped by every invalidation"""
+    keys = list(keys)
+    generations = get_cache().get_many(map(_generation_key, keys))
+    return {key: generations.get(_generation_key(key), 0) for key in keys}
+
+
+def get_generation(key: str) -> int:
+    """Return generation of key, bumped by every invalidation"""
+    return get_generations([key])[key]
+
+
+def _bump_generations(keys: Iterable[str]) -> None:
+    django_cache = get_cache()
+    for key in map(_generation_key, keys):
+        if not django_cache.add(key, 1, GENERATION_TIMEOUT):
+            try:
+                django_cache.incr(key)
+            except ValueError:
+                # Expired between add and incr
+                django_cache.add(key, 1, GENERATION_TIMEOUT)
+
+
+def store(
+    key: str, value: Any, timeout: int, delta: float = 0,
+    generation: Optional[int] = None
+) -> bool:
+    """Put value to django cache keeping it stale after timeout
+
+    Value isn't stored if generation of key isn't the passed one, i.e.
+    key was invalidated after value was loaded. Returns is it stored
+
+    """
+    if generation is not None and get_generation(key) != generation:
+        return False
+
+    get_cache().set(
+        key, wrap(value, timeout, delta), timeout + get_stale_timeout()
+    )
+    return True
+
+
+def store_many(
+    values: Dict[str, Any], timeout: int,
+    generations: Optional[Dict[str, int]] = None
+) -> Dict[str, Any]:
+    """Put values to django cache keeping them stale after timeout
+
+    Values of keys whose generations changed since the passed ones
+    aren't stored. Returns stored values by key
+
+    """
+    if generations is not None and values:
+        current = get_generations(values)
+        values = {
+            key: value for key, value in values.items()
+            if current[key] == generations.get(key, 0)
+        }
+
+    if values:
+        get_cache().set_many(
+            {key: wrap(value, timeout) for key, value in values.items()},
+            timeout + get_stale_timeout()
+        )
+
+    return values
+
+
+def _compute(key: str, compute: Callable, timeout: int) -> Any:
+    generation = get_generation(key)
+    start = monotonic()
+    value = compute()
+    store(key, value, timeout, monotonic() - start, generation)
+    return value
+
+
+def fetch(key: str, compute: Callable[[], Any], timeout: int) -> Any:
+    """Return value by key from django cache, computing it on miss
+
+    Concurrent misses of a key are coalesced: value is computed by one
+    worker holding the lock of the key, while others serve the stale
+    value or wait for the new one up to `LOCK_WAIT` seconds. Exceptions
+    of compute (e.g. `Http404`) aren't cached
+
+    """
+    django_cache = get_cache()
+    cached = django_cache.get(key)
+    if cached is not None and cached.is_fresh():
+        return cached.value
+
+    lock_key = f'lock:{key}'
+    lock_timeout = getattr(
+        settings, 'CRUD_CACHE_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT
+    )
+    if django_cache.add(lock_key, 1, lock_timeout):
+        try:
+            return _compute(key, compute, timeout)
+        finally:
+            django_cache.delete(lock_key)
+
+    if cached is not None:
+        return cached.value
+
+    deadline = monotonic() + LOCK_WAIT
+    delay = 0.005
+    while monotonic() < deadline:
+        sleep(delay)
+        delay = min(delay * 2, 0.1)
+        cached = django_cache.get(key)
+        if cached is not None:
+            return cached.value
+        if django_cache.get(lock_key) is None:
+            # Holder failed (e.g. entry doesn't exist) or value was
+            # invalidated right after computation
+            break
+
+    return _compute(key, compute, timeout)
+
+
+def get_local_cache(model: Model) -> LRUCache:
+    """Return in-process cache shared by all strategies of model"""
+    label = model._meta.label_lower
+    local_cache = _local_caches.get(label)
+    if local_cache is None:
+        with _local_caches_lock:
+            local_cache = _local_caches.setdefault(label, LRUCache(
+                getattr(settings, 'CRUD_CACHE_LOCAL_SIZE', DEFAULT_LOCAL_SIZE),
+                getattr(
+                    settings, 'CRUD_CACHE_LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT
+                ),
+            ))
+
+    return local_cache
+
+
+def make_key(model: Model, pk: Any) -> str:
+    """Return cache key for model entry with pk"""
+    pk = model._meta.pk.to_python(pk)
+    return f'crud:{model._meta.label_lower}:{pk}'
+
+
+def _dirty_keys(using: str) -> set:
+    keys = getattr(_dirty, using, None)
+    if keys is None:
+        keys = set()
+        setattr(_dirty, using, keys)
+
+    return keys
+
+
+def is_cacheable(model: Model, key: str) -> bool:
+    """Check can entry with key be read from and written to cache"""
+    using = write_alias(model)
+    keys = _dirty_keys(using)
+    if not transaction.get_connection(using).in_atomic_block:
+        keys.clear()
+        return True
+
+    return key not in keys
+
+
+def _delete(model: Model, keys: list) -> None:
+    local_cache = get_local_cache(model)
+    for key in keys:
+        local_cache.delete(key)
+
+    _bump_generations(keys)
+    get_cache().delete_many(keys)
+
+
+def invalidate(model: Model, pks: Iterable) -> None:
+    """Remove entries of model with pks from all cache tiers
+
+    Inside a transaction entries are removed again after commit, because
+    other processes may cache old values until then
+
+    """
+    invalidate_keys(model, [make_key(model, pk) for pk in pks])
+
+
+def invalidate_keys(model: Model, keys: list) -> None:
+    """Remove values by keys of data of model like `invalidate()`"""
+    if not keys:
+        return
+
+    _delete(model, keys)
+    using = write_alias(model)
+    if transaction.get_connection(using).in_atomic_block:
+        dirty_keys = _dirty_keys(using)
+        dirty_keys.update(keys)
+
+        def _on_commit() -> None:
+            _delete(model, keys)
+            dirty_keys.difference_update(keys)
+
+        transaction.on_commit(_on_commit, using=using)
@@ -0,0 +1,144 @@
+"""Module with request-scoped identity map of service entries
+
+Inside a scope (set up by `IdentityMapMiddleware` for every request)
+strategies return the same instance for repeated lookups of an entry
+without queries. Map is kept in a context variable, so concurrent
+requests of ASGI and threads of WSGI never share it. Writes remove
+changed entries from the map of the current scope
+
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpRequest, HttpResponse
+
+from .cache import make_key
+from .signals import entries_changed
+
+
+_identity_map: ContextVar[Optional[Dict[str, Model]]] = ContextVar(
+    'identity_map', default=None
+)
+
+
+def get_identity_map() -> Optional[Dict[str, Model]]:
+    """Return identity map of the current scope or `None` outside it"""
+    return _identity_map.get()
+
+
+@contextmanager
+def identity_scope() -> Iterator[Dict[str, Model]]:
+    """Start a new identity map for the block, e.g. for a request"""
+    token = _identity_map.set({})
+    try:
+        yield _identity_map.get()
+    finally:
+        _identity_map.reset(token)
+
+
+def lookup(model: Model, pk: Any) -> Optional[Model]:
+    """Return mapped entry of model with pk or `None`"""
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return None
+
+    return identity_map.get(make_key(model, pk))
+
+
+def remember(entry: Model) -> Model:
+    """Put entry to identity map of the current scope and return it"""
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map[make_key(type(entry), entry.pk)] = entry
+
+    return entry
+
+
+def forget(model: Model, pks: Iterable[Any]) -> None:
+    """Remove entries of model with pks from map of the current scope"""
+    identity_map = _identity_map.get()
+    if identity_map:
+        for pk in pks:
+            identity_map.pop(make_key(model, pk), None)
+
+
+def _forget_saved(sender: Model, instance: Model, **kwargs) -> None:
+    forget(sender, [instance.pk])
+
+
+def _forget_changed(sender: Model, pks: list, **kwargs) -> None:
+    forget(sender, pks)
+
+
+def connect_signals(model: Model) -> None:
+    """Remove entries of model from identity map on every write"""
+    uid = f'identity:{model._meta.label_lower}'
+    post_save.connect(_forget_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_forget_saved, sender=model, dispatch_uid=uid)
+    entries_changed.connect(_forget_changed, sender=model, dispatch_uid=uid)
+
+
+def mapped(method: Callable) -> Callable:
+    """Decorate `get_concrete(pk)` of strategy with identity map"""
+    @wraps(method)
+    def wrapper(self, pk: Any) -> Model:
+        entry = lookup(self._model, pk)
+        if entry is None:
+            entry = remember(method(self, pk))
+
+        return entry
+
+    return wrapper
+
+
+def mapped_many(method: Callable) -> Callable:
+    """Decorate `get_many(pks)` of strategy with identity map"""
+    @wraps(method)
+    def wrapper(self, pks: Iterable[Any]):
+        if _identity_map.get() is None:
+            return method(self, pks)
+
+        pks = self._unique_pks(pks)
+        known = {}
+        for pk in pks:
+            entry = lookup(self._model, pk)
+            if entry is not None:
+                known[pk] = entry
+
+        result = method(self, [pk for pk in pks if pk not in known])
+        for entry in result.entries.values():
+            remember(entry)
+
+        return self._collect(pks, {**known, **result.entries})
+
+    return wrapper
+
+
+class IdentityMapMiddleware:
+    """Middleware giving every request its own identity map"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with identity_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with identity_scope():
+            return await self.get_response(request)
@@ -0,0 +1,352 @@
+"""Module with instrumentation of service methods
+
+Instrumentation is enabled by `SERVICE_INSTRUMENTATION` setting. Then every
+public method of `BaseCRUDService` subclasses records call count, latency,
+number of SQL queries and number of returned rows to sinks listed in
+`SERVICE_METRICS_SINKS` setting
+
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from inspect import getattr_static, iscoroutinefunction
+import logging
+from threading import Lock
+from time import perf_counter
+from types import FunctionType
+from typing import Any, Callable, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Model, QuerySet
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+DEFAULT_SINKS = ['services.instrumentation.RegistrySink']
+
+logger = logging.getLogger('services.metrics')
+
+
+class MethodMetrics:
+    """Metrics of a service method
+
+    Attributes
+    ----------
+    calls : int
+        Number of calls
+    errors : int
+        Number of calls raised an exception
+    latency_sum : float
+        Total time of calls in seconds
+    latency_buckets : list
+        Number of calls by upper bounds of `LATENCY_BUCKETS` (the last one
+        is for slower calls)
+    queries : int
+        Total number of SQL queries
+    rows : int
+        Total number of returned rows
+
+    """
+
+    __slots__ = (
+        'calls', 'errors', 'latency_sum', 'latency_buckets', 'queries', 'rows'
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.rows = 0
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory registry of service method metrics
+
+    Methods
+    -------
+    record(service, method, duration, queries, rows, error)
+        Record a call of service method
+    snapshot()
+        Return copy of metrics by (service, method)
+    reset()
+        Remove all metrics
+    render_prometheus()
+        Return metrics in Prometheus text format
+
+    """
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = Lock()
+
+    def record(
+        self, service: str, method: str, duration: float, queries: int,
+        rows: int, error: bool
+    ) -> None:
+        """Record a call of service method"""
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+        with self._lock:
+            metrics = self._metrics.get((service, method))
+            if metrics is None:
+                metrics = self._metrics[service, method] = MethodMetrics()
+
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.latency_sum += duration
+            metrics.latency_buckets[bucket] += 1
+            metrics.queries += queries
+            metrics.rows += rows
+
+    def snapshot(self) -> Dict[Tuple[str, str], MethodMetrics]:
+        """Return copy of metrics by (service, method)"""
+        with self._lock:
+            snapshot = {}
+            for key, metrics in self._metrics.items():
+                copy = snapshot[key] = MethodMetrics()
+                for name in MethodMetrics.__slots__:
+                    setattr(copy, name, getattr(metrics, name))
+
+                copy.latency_buckets = list(metrics.latency_buckets)
+
+            return snapshot
+
+    def reset(self) -> None:
+        """Remove all metrics"""
+        with self._lock:
+            self._metrics.clear()
+
+    def render_prometheus(self) -> str:
+        """Return metrics in Prometheus text exposition format"""
+        lines = [
+            '# HELP service_calls_total Number of service method calls',
+            '# TYPE service_calls_total counter',
+        ]
+        snapshot = sorted(self.snapshot().items())
+        for (service, method), metrics in snapshot:
+            labels = f'service="{service}",method="{method}"'
+            lines.append(f'service_calls_total{{{labels}}} {metrics.calls}')
+
+        for name, attr, help_text in (
+            ('service_errors_total', 'errors', 'Number of failed calls'),
+            ('service_queries_total', 'queries', 'Number of SQL queries'),
+            ('service_rows_total', 'rows', 'Number of returned rows'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (service, method), metrics in snapshot:
+                labels = f'service="{service}",method="{method}"'
+                lines.append(f'{name}{{{labels}}} {getattr(metrics, attr)}')
+
+        lines.append(
+            '# HELP service_latency_seconds Latency of service method calls'
+        )
+        lines.append('# TYPE service_latency_seconds histogram')
+        for (service, method), metrics in snapshot:
+            labels = f'service="{service}",method="{method}"'
+            total = 0
+            for bound, count in zip(
+                (*LATENCY_BUCKETS, '+Inf'), metrics.latency_buckets
+            ):
+                total += count
+                lines.append(
+                    f'service_latency_seconds_bucket{{{labels},le="{bound}"}}'
+                    f' {total}'
+                )
+
+            lines.append(
+                f'service_latency_seconds_sum{{{labels}}} '
+                f'{metrics.latency_sum}'
+            )
+            lines.append(
+                f'service_latency_seconds_count{{{labels}}} {metrics.calls}'
+            )
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class BaseMetricsSink(ABC):
+    """Base class for sinks receiving metrics of service method calls"""
+
+    @abstractmethod
+    def record(
+        self, service: str, method: str, duration: float, queries: int,
+        rows: int, error: bool
+    ) -> None:
+        """Record a call of service method"""
+        pass
+
+
+class RegistrySink(BaseMetricsSink):
+    """Sink recording metrics to in-memory registry"""
+
+    def record(self, *args) -> None:
+        """Record a call of service method to registry"""
+        registry.record(*args)
+
+
+class LoggingSink(BaseMetricsSink):
+    """Sink writing every call as structured log record"""
+
+    def record(
+        self, service: str, method: str, duration: float, queries: int,
+        rows: int, error: bool
+    ) -> None:
+        """Write a call of service method to `services.metrics` logger"""
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                '%s.%s %.6fs queries=%d rows=%d', service, method,
+                duration, queries, rows, extra={
+                    'service': service, 'method': method,
+                    'duration': duration, 'queries': queries, 'rows': rows,
+                    'error': error,
+                }
+            )
+
+
+@lru_cache(maxsize=None)
+def get_sinks() -> List[BaseMetricsSink]:
+    """Return sinks from `SERVICE_METRICS_SINKS` setting"""
+    paths = getattr(settings, 'SERVICE_METRICS_SINKS', DEFAULT_SINKS)
+    return [import_string(path)() for path in paths]
+
+
+@receiver(setting_changed)
+def _reset_sinks(setting: str, **kwargs) -> None:
+    if setting == 'SERVICE_METRICS_SINKS':
+        get_sinks.cache_clear()
+
+
+def is_enabled() -> bool:
+    """Check is instrumentation enabled by settings"""
+    return getattr(settings, 'SERVICE_INSTRUMENTATION', False)
+
+
+# Counter of queries shared by nested calls. It's a mutable list in a
+# context variable, so queries made by async ORM in worker threads are
+# counted too
+_query_counter = ContextVar('query_counter', default=None)
+
+
+def _count_query(execute: Callable, sql, params, many, context) -> Any:
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs) -> None:
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def count_rows(result: Any) -> int:
+    """Return number of rows in result of service method
+
+    Lazy querysets aren't evaluated and count as zero rows
+
+    """
+    if result is None:
+        return 0
+    if isinstance(result, Model):
+        return 1
+    if isinstance(result, QuerySet):
+        cache = result._result_cache
+        return len(cache) if cache is not None else 0
+
+    entries = getattr(result, 'entries', None)
+    if entries is not None:
+        return len(entries)
+    if isinstance(result, (list, dict)):
+        return len(result)
+
+    return 0
+
+
+def _start() -> tuple:
+    counter = _query_counter.get()
+    token = None
+    if counter is None:
+        counter = [0]
+        token = _query_counter.set(counter)
+
+    return counter, counter[0], token, perf_counter()
+
+
+def _finish(
+    service: str, method: str, state: tuple, result: Any, error: bool
+) -> None:
+    counter, queries, token, start = state
+    duration = perf_counter() - start
+    queries = counter[0] - queries
+    if token is not None:
+        _query_counter.reset(token)
+
+    rows = count_rows(result)
+    for sink in get_sinks():
+        sink.record(service, method, duration, queries, rows, error)
+
+
+def instrument(service: str, method: str, function: Callable) -> Callable:
+    """Return function recording metrics of its calls to sinks"""
+    if iscoroutinefunction(function):
+        @wraps(function)
+        async def wrapper(*args, **kwargs):
+            state = _start()
+            result = None
+            error = True
+            try:
+                result = await function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _finish(service, method, state, result, error)
+    else:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            state = _start()
+            result = None
+            error = True
+            try:
+                result = function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _finish(service, method, state, result, error)
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument_service(cls: type) -> None:
+    """Wrap all public methods of service class with instrumentation"""
+    connection_created.connect(
+        _install_query_counter, dispatch_uid='services.instrumentation'
+    )
+    for connection in connections.all():
+        _install_query_counter(connection)
+
+    for name in dir(cls):
+        function = getattr_static(cls, name)
+        if name.startswith('_') or not isinstance(function, FunctionType):
+            continue
+
+        if getattr(function, 'instrumented', False):
+            function = function.__wrapped__
+
+        setattr(cls, name, instrument(cls.__name__, name, function))
@@ -0,0 +1,118 @@
+"""Module with keyset pagination helpers"""
+
+from __future__ import annotations
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+import json
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Field, Model, Q
+
+
+# Types of JSON values `encode_cursor()` writes for ordering fields
+CURSOR_VALUE_TYPES = (str, int, float)
+
+class Page(NamedTuple):
+    """Page of entries
+
+    Attributes
+    ----------
+    entries : list
+        Entries of page
+    next_cursor : str, optional
+        Cursor of next page. `None` if it's the last page
+
+    """
+
+    entries: List[Model]
+    next_cursor: Optional[str]
+
+
+def get_ordering(
+    model: Model, order_by: Sequence[str]
+) -> List[Tuple[Field, bool]]:
+    """Return list of (field, descending) pairs for order_by
+
+    Primary key is appended if it's not in ordering, so ordering is always
+    unique
+
+    """
+    opts = model._meta
+    ordering = []
+    for name in order_by:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(f"Can't paginate by `{name}` field")
+
+        if not field.concrete:
+            raise ValueError(f"Can't paginate by `{name}` field")
+
+        ordering.append((field, descending))
+
+    if all(field != opts.pk for field, _ in ordering):
+        descending = ordering[-1][1] if ordering else False
+        ordering.append((opts.pk, descending))
+
+    return ordering
+
+
+def encode_cursor(entry: Model, ordering: List[Tuple[Field, bool]]) -> str:
+    """Return opaque cursor pointing after entry"""
+    values = [getattr(entry, field.attname) for field, _ in ordering]
+    data = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, ordering: List[Tuple[Field, bool]]) -> list:
+    """Return field values encoded in cursor
+
+    Raises
+    ------
+    ValueError
+        Raises if cursor is malformed or doesn't match ordering
+
+    """
+    try:
+        data = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+        if (
+            not isinstance(values, list) or len(values) != len(ordering)
+            or not all(
+                isinstance(value, CURSOR_VALUE_TYPES) for value in values
+            )
+        ):
+            raise ValueError
+
+        return [
+            field.to_python(value)
+            for (field, _), value in zip(ordering, values)
+        ]
+    except (BinasciiError, TypeError, ValidationError, ValueError):
+        raise ValueError(f"Cursor is incorrect: {cursor}")
+
+
+def keyset_filter(
+    ordering: List[Tuple[Field, bool]], values: Sequence[Any]
+) -> Q:
+    """Return condition selecting entries after values in ordering
+
+    For ordering `(a, b)` it builds
+    `a <= x AND (a < x OR (a = x AND b < y))`, so the leading range
+    condition can use a composite index
+
+    """
+    condition = Q()
+    equal = Q()
+    for (field, descending), value in zip(ordering, values):
+        lookup = 'lt' if descending else 'gt'
+        condition |= equal & Q(**{f'{field.attname}__{lookup}': value})
+        equal &= Q(**{field.attname: value})
+
+    first_field, descending = ordering[0]
+    lookup = 'lte' if descending else 'gte'
+    return Q(**{f'{first_field.attname}__{lookup}': values[0]}) & condition
@@ -0,0 +1,189 @@
+"""Module with routing of service reads to database replicas
+
+Only queries made through `replica_manager()` are routed to replicas
+listed in `DATABASE_REPLICAS` setting, everything else uses the primary
+(`default`) database. Once a service model is written inside a routing
+context (e.g. a request), reads of the context are pinned to the
+primary, so a request reads its own writes. Other writes (e.g. of
+sessions or `last_login`) don't pin reads, and writes outside a routing
+context (e.g. in commands) don't pin later reads of the process.
+`ReplicaPinMiddleware` keeps reads of the client pinned for
+`REPLICA_PIN_SECONDS` after its last write, to cover replication lag
+
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+from typing import Callable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Manager, Model
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpRequest, HttpResponse
+
+from .signals import entries_changed
+
+
+PIN_COOKIE = 'replica_pin'
+DEFAULT_PIN_SECONDS = 5
+
+# Hint passed by services to route reads to replicas
+REPLICA_HINT = 'replica'
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+# `None` outside routing context, so writes there pin nothing
+_wrote = ContextVar('wrote_to_primary', default=None)
+
+
+def replica_manager(model: Model) -> Manager:
+    """Return default manager of model routing its reads to replicas"""
+    return model._default_manager.db_manager(hints={REPLICA_HINT: True})
+
+
+def get_replicas() -> list:
+    """Return aliases of replicas from `DATABASE_REPLICAS` setting"""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_pinned() -> bool:
+    """Check are reads of the current context pinned to the primary"""
+    return _pinned.get() or bool(_wrote.get())
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """Pin reads inside the block to the primary"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def routing_context(pinned: bool = False) -> Iterator[None]:
+    """Start a new context of routing, e.g. for a request
+
+    Writes made inside the block pin reads of this block only
+
+    """
+    pinned_token = _pinned.set(pinned)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _wrote.reset(wrote_token)
+        _pinned.reset(pinned_token)
+
+
+def write_alias(model: Model) -> str:
+    """Return database of writes of model"""
+    return router.db_for_write(model)
+
+
+def mark_written() -> None:
+    """Pin reads of the current routing context to the primary
+
+    Does nothing outside routing context
+
+    """
+    if _wrote.get() is not None:
+        _wrote.set(True)
+
+
+def has_written() -> bool:
+    """Check has the current context written to the primary"""
+    return bool(_wrote.get())
+
+
+def _written(sender: Model, **kwargs) -> None:
+    mark_written()
+
+
+def connect_signals(model: Model) -> None:
+    """Pin reads of routing context to the primary on writes of model"""
+    uid = f'routing:{model._meta.label_lower}'
+    post_save.connect(_written, sender=model, dispatch_uid=uid)
+    post_delete.connect(_written, sender=model, dispatch_uid=uid)
+    entries_changed.connect(_written, sender=model, dispatch_uid=uid)
+
+
+class ReplicaRouter:
+    """Router sending writes to the primary and hinted reads to replicas
+
+    Reads go to the primary anyway if the current context has written a
+    service model or has an open transaction on the primary
+
+    """
+
+    def db_for_read(self, model: Model, **hints) -> Optional[str]:
+        """Return random replica for hinted reads of unpinned context"""
+        if not hints.get(REPLICA_HINT):
+            return None
+
+        replicas = get_replicas()
+        if (
+            not replicas or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model: Model, **hints) -> str:
+        """Return the primary
+
+        Django asks for it on any write (e.g. of sessions), so reads are
+        pinned by signals of written service models instead
+
+        """
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints) -> bool:
+        """Allow relations between the primary and its replicas"""
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+
+class ReplicaPinMiddleware:
+    """Middleware pinning reads to the primary after writes of a client
+
+    Pin is kept in a cookie that expires in `REPLICA_PIN_SECONDS`
+
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.pin_seconds = getattr(
+            settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS
+        )
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pin(self, response: HttpResponse) -> HttpResponse:
+        """Set pin cookie if the current context has written"""
+        if has_written():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.pin_seconds,
+                httponly=True, samesite='Lax'
+            )
+
+        return response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with routing_context(pinned=PIN_COOKIE in request.COOKIES):
+            return self._pin(self.get_response(request))
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with routing_context(pinned=PIN_COOKIE in request.COOKIES):
+            return self._pin(await self.get_response(request))
@@ -0,0 +1,131 @@
+"""Module with precomputed field metadata of models
+
+Metadata is computed once per (model, form) pair, so strategies don't walk
+`_meta` on every write
+
+"""
+
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db.models import Field, Model
+from django.forms import Form
+
+
+class ModelSchema(NamedTuple):
+    """Field metadata of model used by CRUD strategies
+
+    Attributes
+    ----------
+    editable : frozenset
+        Names of editable concrete fields
+    required : frozenset
+        Names of editable fields without default that can't be blank
+    foreign_keys : dict
+        Field names by attnames of foreign keys, e.g. `seller_id`
+    form_fields : dict
+        Model field names by names of form fields, form fields that aren't
+        model fields are skipped
+    auto_now : tuple
+        Fields updated on every save
+    fields : dict
+        Editable concrete fields by name
+    versioned : bool
+        Whether model has `version` field for optimistic concurrency
+    pk : str
+        Name of primary key
+
+    """
+
+    editable: FrozenSet[str]
+    required: FrozenSet[str]
+    foreign_keys: Dict[str, str]
+    form_fields: Dict[str, str]
+    auto_now: tuple
+    fields: Dict[str, Field]
+    versioned: bool
+    pk: str
+
+    def normalize(self, keys) -> set:
+        """Return field names of data keys replacing FK attnames"""
+        foreign_keys = self.foreign_keys
+        return {foreign_keys.get(key, key) for key in keys}
+
+    def get_errors(
+        self, data: dict, with_pk: bool = False
+    ) -> Dict[str, List[str]]:
+        """Return messages of unknown and missing fields of data by field
+
+        Unknown fields are reported as non field errors
+
+        """
+        keys = self.normalize(data)
+        if with_pk:
+            keys.discard(self.pk)
+
+        errors = {
+            name: ['This field is required.']
+            for name in sorted(self.required - keys)
+        }
+        unknown = sorted(keys - self.editable)
+        if unknown:
+            errors[NON_FIELD_ERRORS] = [
+                f"Unknown fields: {', '.join(unknown)}."
+            ]
+
+        return errors
+
+    def check(self, data: dict, with_pk: bool = False) -> None:
+        """Check data has all required and only editable fields
+
+        With `with_pk` data may also contain primary key
+
+        Raises
+        ------
+        ValueError
+            Raises if data has unknown fields or misses required ones
+
+        """
+        keys = self.normalize(data)
+        if with_pk:
+            keys.discard(self.pk)
+        if not self.required <= keys <= self.editable:
+            raise ValueError(
+                f'Data is incorrect: unknown {sorted(keys - self.editable)}, '
+                f'missing {sorted(self.required - keys)}'
+            )
+
+
+@lru_cache(maxsize=None)
+def get_schema(model: Model, form: Form) -> ModelSchema:
+    """Return field metadata of model and form"""
+    fields = [
+        field for field in model._meta.concrete_fields if field.editable
+    ]
+    by_name = {field.name: field for field in fields}
+    return ModelSchema(
+        editable=frozenset(by_name),
+        required=frozenset(
+            field.name for field in fields
+            if not field.has_default() and not field.blank
+        ),
+        foreign_keys={
+            field.attname: field.name for field in fields
+            if field.is_relation
+        },
+        form_fields={
+            name: by_name[name].name for name in form.base_fields
+            if name in by_name
+        },
+        auto_now=tuple(
+            field for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ),
+        fields=by_name,
+        versioned=any(
+            field.name == 'version' for field in model._meta.concrete_fields
+        ),
+        pk=model._meta.pk.name,
+    )
@@ -0,0 +1,9 @@
+"""Signals sent by CRUD strategies"""
+
+from django.dispatch import Signal
+
+
+# Sent with `sender` (model class) and `pks` (iterable of primary keys)
+# when entries are changed by queries that bypass model signals, e.g.
+# `QuerySet.update()` or `bulk_update()`
+entries_changed = Signal()
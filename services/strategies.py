@@ -1,16 +1,124 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from copy import copy
+from itertools import islice
 from uuid import UUID
-from typing import Any
+from typing import (
+    Any, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Sequence,
+    Tuple, Type
+)
 
-from django.db.models import Model, QuerySet
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Expression, F, Manager, Model, QuerySet
+from django.db.models.signals import post_save, post_delete
 from django.forms import Form
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
+from . import cache, identity, routing
+from .routing import replica_manager
+from .pagination import (
+    Page, decode_cursor, encode_cursor, get_ordering, keyset_filter
+)
+from .schema import get_schema
+from .signals import entries_changed
+
 
 User = get_user_model()
 
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAGE_SIZE = 20
+
+
+class BulkResult(NamedTuple):
+    """Result of bulk operation
+
+    Attributes
+    ----------
+    entries : list
+        Written entries
+    errors : dict
+        Forms with errors by row index (or pk for updates)
+    missing : sequence
+        Primary keys of entries that don't exist
+
+    """
+
+    entries: List[Model]
+    errors: Dict[Any, Form]
+    missing: Sequence[Any] = ()
+
+
+class MultiGetResult(NamedTuple):
+    """Result of lookup of many entries
+
+    Attributes
+    ----------
+    entries : dict
+        Found entries by pk in order of requested pks
+    missing : list
+        Requested pks of entries that don't exist
+
+    """
+
+    entries: Dict[Any, Model]
+    missing: List[Any]
+
+
+class Conflict(NamedTuple):
+    """Result of update of entry changed since the expected version
+
+    Attributes
+    ----------
+    pk
+        Primary key of entry
+    expected_version : int
+        Version passed by caller
+    current_version : int
+        Version of entry in database
+
+    """
+
+    pk: Any
+    expected_version: int
+    current_version: int
+
+
+def batches(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split iterable to lists with size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+
+        yield batch
+
+
+def lock_rows(
+    model: Model, pks: Iterable, fields: Iterable[str]
+) -> Dict[Any, tuple]:
+    """Return values of fields of rows with pks by pk, locking the rows
+
+    Rows are read in batches with `SELECT ... FOR UPDATE` and stay locked
+    until the end of transaction, so their changes are counted once
+
+    """
+    fields = tuple(fields)
+    rows = {}
+    for batch in batches(pks, DEFAULT_BATCH_SIZE):
+        rows.update(
+            (pk, tuple(row)) for pk, *row
+            in model.objects.select_for_update().filter(
+                pk__in=batch
+            ).values_list('pk', *fields)
+        )
+
+    return rows
+
 
 class BaseCRUDStrategy(ABC):
     """Base class for CRUD Strategies with default interface
@@ -19,14 +127,28 @@ class BaseCRUDStrategy(ABC):
     -------
     get_concrete(*args, **kwargs)
         Return a concrete entry
+    get_many(*args, **kwargs)
+        Return many entries by pk
     get_all(*args, **kwargs)
         Return all entries
+    get_page(*args, **kwargs)
+        Return a page of entries
+    get_rows(*args, **kwargs)
+        Return a page of read-only rows of entries
     update(*args, **kwrags)
         Update a concrete entry
     create(*args, **kwargs)
         Create a new entry
+    create_cleaned(*args, **kwargs)
+        Create a new entry from already cleaned data
     delete(*args, **kwargs)
         Delete an entry
+    bulk_create(*args, **kwargs)
+        Create many entries
+    bulk_update(*args, **kwargs)
+        Update many entries
+    bulk_delete(*args, **kwargs)
+        Delete many entries
 
     """
 
@@ -39,11 +161,26 @@ class BaseCRUDStrategy(ABC):
         """Return a concrete entry"""
         pass
 
+    @abstractmethod
+    def get_many(self, *args, **kwargs):
+        """Return many entries by pk"""
+        pass
+
     @abstractmethod
     def get_all(self, *args, **kwargs):
         """Return all entries"""
         pass
 
+    @abstractmethod
+    def get_page(self, *args, **kwargs):
+        """Return a page of entries"""
+        pass
+
+    @abstractmethod
+    def get_rows(self, *args, **kwargs):
+        """Return a page of read-only rows of entries"""
+        pass
+
     @abstractmethod
     def update(self, *args, **kwargs):
         """Update a concrete entry"""
@@ -54,64 +191,361 @@ class BaseCRUDStrategy(ABC):
         """Create a new entry"""
         pass
 
+    @abstractmethod
+    def create_cleaned(self, *args, **kwargs):
+        """Create a new entry from already cleaned data"""
+        pass
+
     @abstractmethod
     def delete(self, *args, **kwargs):
         """Delete an entry"""
         pass
 
+    @abstractmethod
+    def bulk_create(self, *args, **kwargs):
+        """Create many entries"""
+        pass
+
+    @abstractmethod
+    def bulk_update(self, *args, **kwargs):
+        """Update many entries"""
+        pass
+
+    @abstractmethod
+    def bulk_delete(self, *args, **kwargs):
+        """Delete many entries"""
+        pass
+
 
 class SimpleCRUDStrategy(BaseCRUDStrategy):
     """CRUD Strategy with simple default functionality
 
+    Field metadata of model is computed once on construction and shared by
+    all strategies of the model. Inside an identity scope (e.g. a request)
+    lookups return the same instance of entry, see `services.identity`
+
     Methods
     -------
     get_concrete(*args, **kwargs)
         Return a concrete entry
+    get_many(pks)
+        Return many entries by pk
     get_all(*args, **kwargs)
         Return all entries
-    update(*args, **kwrags)
+    get_page(after, limit, order_by)
+        Return a page of entries
+    get_rows(row_type, after, limit, order_by, expressions, filters)
+        Return a page of read-only rows of entries
+    update(pk, version=None, partial=False, **data)
         Update a concrete entry
     create(*args, **kwargs)
         Create a new entry
+    create_cleaned(**data)
+        Create a new entry from already cleaned data
     delete(*args, **kwargs)
         Delete an entry
+    bulk_create(rows, batch_size, cleaned)
+        Create many entries
+    bulk_update(pk_to_data, batch_size)
+        Update many entries
+    bulk_delete(pks, batch_size)
+        Delete many entries
 
     """
 
+    def __init__(self, model: Model, form: Form) -> None:
+        super().__init__(model, form)
+        self._schema = get_schema(model, form)
+        identity.connect_signals(model)
+        routing.connect_signals(model)
+
+    def _reads(self) -> Manager:
+        """Return manager reading from replicas"""
+        return replica_manager(self._model)
+
+    @identity.mapped
     def get_concrete(self, pk: UUID) -> Model:
         """Return a concrete entry with pk"""
-        entry = get_object_or_404(self._model, pk=pk)
+        entry = get_object_or_404(self._reads().all(), pk=pk)
         return entry
 
+    def _unique_pks(self, pks: Iterable) -> List[Any]:
+        """Return pks converted to python values without duplicates"""
+        to_python = self._model._meta.pk.to_python
+        return list(dict.fromkeys(to_python(pk) for pk in pks))
+
+    def _collect(
+        self, pks: List[Any], found: Dict[Any, Model]
+    ) -> MultiGetResult:
+        """Return found entries in order of pks and missing pks"""
+        return MultiGetResult(
+            {pk: found[pk] for pk in pks if pk in found},
+            [pk for pk in pks if pk not in found]
+        )
+
+    @identity.mapped_many
+    def get_many(self, pks: Iterable[UUID]) -> MultiGetResult:
+        """Return entries with pks in one query and pks of missing ones"""
+        pks = self._unique_pks(pks)
+        return self._collect(pks, self._reads().in_bulk(pks))
+
     def get_all(self) -> QuerySet:
         """Return all entries"""
-        entries = self._model.objects.all()
+        entries = self._reads().all()
         return entries
 
+    def _ordered(
+        self, entries: QuerySet, after: str, order_by: Sequence[str],
+        limit: int
+    ) -> Tuple[QuerySet, list]:
+        """Return entries after cursor ordered by order_by and ordering
+
+        Raises
+        ------
+        ValueError
+            Raises if limit is less than one or cursor is incorrect
+
+        """
+        if limit < 1:
+            raise ValueError(f'Incorrect limit: {limit}')
+
+        ordering = get_ordering(self._model, order_by)
+        entries = entries.order_by(*(
+            f"{'-' if descending else ''}{field.attname}"
+            for field, descending in ordering
+        ))
+        if after is not None:
+            values = decode_cursor(after, ordering)
+            entries = entries.filter(keyset_filter(ordering, values))
+
+        return entries, ordering
+
+    def _paginate(self, entries: Iterable, limit: int, ordering: list) -> Page:
+        """Return a page of at most limit entries of limit + 1 fetched"""
+        entries = list(entries)
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor(entries[-1], ordering)
+
+        return Page(entries, next_cursor)
+
+    def get_page(
+        self, after: str = None, limit: int = DEFAULT_PAGE_SIZE,
+        order_by: Sequence[str] = ('pk',)
+    ) -> Page:
+        """Return a page of entries after cursor ordered by order_by
+
+        Uses keyset pagination, so cost of a page doesn't depend on its
+        depth. Primary key is always added to ordering to make it unique
+
+        Raises
+        ------
+        ValueError
+            Raises if limit is less than one or cursor is incorrect
+
+        """
+        entries, ordering = self._ordered(
+            self._reads().all(), after, order_by, limit
+        )
+        return self._paginate(entries[:limit + 1], limit, ordering)
+
+    def get_rows(
+        self, row_type: Type[tuple], after: str = None,
+        limit: int = DEFAULT_PAGE_SIZE, order_by: Sequence[str] = ('pk',),
+        expressions: Dict[str, Expression] = None, filters: dict = None
+    ) -> Page:
+        """Return a page of rows built straight from `values_list()`
+
+        Rows skip model instances, so they are much smaller and faster to
+        build and serialize than entries of `get_page()`. Pagination is
+        the same, so fields of row_type must include attnames of ordering
+        fields (e.g. `uuid` and `pub_date`)
+
+        Parameters
+        ----------
+        row_type
+            Named tuple with fields to load, named like attnames of model
+            fields or keys of expressions
+        expressions : dict
+            Expressions computing fields of row_type by field name
+        filters : dict
+            Lookups entries are filtered by
+
+        Raises
+        ------
+        ValueError
+            Raises if limit is less than one or cursor is incorrect
+
+        """
+        expressions = expressions or {}
+        entries = self._reads().filter(**(filters or {}))
+        entries, ordering = self._ordered(entries, after, order_by, limit)
+        if expressions:
+            entries = entries.annotate(**{
+                f'{name}_value': expression
+                for name, expression in expressions.items()
+            })
+
+        rows = entries.values_list(*(
+            f'{name}_value' if name in expressions else name
+            for name in row_type._fields
+        ))
+        return self._paginate(
+            map(row_type._make, rows[:limit + 1]), limit, ordering
+        )
+
+    def _get_for_write(self, pk: UUID) -> Model:
+        """Return an uncached entry with pk from the primary"""
+        return get_object_or_404(self._model, pk=pk)
+
     def _check_is_data_valid(self, data: dict) -> None:
-        """Check is data valid"""
+        """Check data has all required and only editable fields"""
+        self._schema.check(data)
+
+    def _set_cleaned(self, entry: Model, cleaned_data: dict) -> set:
+        """Set model fields of cleaned data to entry
+
+        Returns names of fields whose values have changed
+
+        """
+        form_fields = self._schema.form_fields
+        changed = set()
+        for field, value in cleaned_data.items():
+            name = form_fields.get(field)
+            if name is not None and getattr(entry, name) != value:
+                setattr(entry, name, value)
+                changed.add(name)
+
+        return changed
+
+    def _prepare_save(self, entry: Model, cleaned_data: dict) -> list:
+        """Set cleaned data to entry and return fields to save
+
+        Besides changed fields auto_now fields and version are saved, no
+        fields are returned if nothing has changed
+
+        """
+        changed = self._set_cleaned(entry, cleaned_data)
+        if not changed:
+            return []
+
+        changed.update(field.name for field in self._schema.auto_now)
+        if self._schema.versioned:
+            entry.version += 1
+            changed.add('version')
+
+        return sorted(changed)
+
+    def _clean(self, data: dict, partial: bool) -> Form:
+        """Return form of data, for partial data only passed fields"""
+        form = self._form(data)
+        if partial:
+            for name in list(form.fields):
+                if name not in data:
+                    del form.fields[name]
+
+        return form
+
+    def _changed_values(self, cleaned_data: dict) -> dict:
+        """Return values of model fields by attname from cleaned data"""
+        values = {}
+        for field, value in cleaned_data.items():
+            name = self._schema.form_fields.get(field)
+            if name is not None:
+                model_field = self._schema.fields[name]
+                if isinstance(value, Model):
+                    value = value.pk
+                values[model_field.attname] = value
+
+        return values
+
+    def _conditional_update(
+        self, pk: UUID, version: int, values: dict
+    ) -> tuple:
+        """Return queryset and values of update conditional on version"""
+        if not self._schema.versioned:
+            raise ValueError(
+                f'{self._model._meta.object_name} has no version field'
+            )
+
+        pk = self._model._meta.pk.to_python(pk)
+        entry = self._model.from_db(
+            DEFAULT_DB_ALIAS, [self._model._meta.pk.attname], [pk]
+        )
+        for field in self._schema.auto_now:
+            values[field.attname] = field.pre_save(entry, add=False)
+
+        entries = self._model.objects.filter(pk=pk, version=version)
+        return entries, {**values, 'version': F('version') + 1}
+
+    def _updated_entry(self, pk: UUID, version: int, values: dict) -> Model:
+        """Return entry with written fields loaded and others deferred"""
+        values = {
+            **values, self._model._meta.pk.attname: pk, 'version': version + 1
+        }
         fields = [
-            field.name for field in self._model._meta.get_fields()
-            if field.editable
+            field.attname for field in self._model._meta.concrete_fields
+            if field.attname in values
         ]
-        if list(data.keys()).sort() != fields.sort():
-            raise ValueError(
-                f"Data is incorrect: {list(data.keys()).sort()} "
-                "!= {fields.sort(0)}"
+        return self._model.from_db(
+            DEFAULT_DB_ALIAS, fields, [values[field] for field in fields]
+        )
+
+    def _conflict(self, pk: UUID, version: int, current: Any) -> Conflict:
+        """Return conflict with current version or raise Http404"""
+        if current is None:
+            raise Http404(
+                f'No {self._model._meta.object_name} matches the given query.'
             )
 
-    def update(self, pk: UUID, **data) -> Any[Model, Form]:
-        """Update a concrete entry with pk from data"""
-        form = self._form(data)
-        entry = self.get_concrete(pk)
-        if form.is_valid():
-            for field, value in form.cleaned_data.items():
-                setattr(entry, field, value)
+        return Conflict(pk, version, current)
 
-            entry.save()
-            return entry
+    def update(
+        self, pk: UUID, version: int = None, partial: bool = False, **data
+    ) -> Any[Model, Form, Conflict]:
+        """Update a concrete entry with pk from data
 
-        return form
+        Only changed columns are written. With `version` entry is updated
+        by a single conditional UPDATE without reading it first, `Conflict`
+        is returned if entry has changed since that version and the
+        returned entry has only written fields loaded. With `partial` only
+        fields passed in data are validated and written
+
+        Raises
+        ------
+        Http404
+            Raises if entry doesn't exist
+        ValueError
+            Raises if version is passed for model without version field
+
+        """
+        form = self._clean(data, partial)
+        if version is None:
+            entry = self._get_for_write(pk)
+            if form.is_valid():
+                update_fields = self._prepare_save(entry, form.cleaned_data)
+                if update_fields:
+                    entry.save(update_fields=update_fields)
+
+                return entry
+
+            return form
+
+        if not form.is_valid():
+            return form
+
+        values = self._changed_values(form.cleaned_data)
+        entries, update = self._conditional_update(pk, version, values)
+        if not entries.update(**update):
+            current = self._model.objects.filter(pk=pk).values_list(
+                'version', flat=True
+            ).first()
+            return self._conflict(pk, version, current)
+
+        pk = self._model._meta.pk.to_python(pk)
+        entries_changed.send(sender=self._model, pks=[pk])
+        return self._updated_entry(pk, version, values)
 
     def create(self, **data) -> Any[Model, Form]:
         """Create a new entry from data"""
@@ -123,8 +557,462 @@ class SimpleCRUDStrategy(BaseCRUDStrategy):
 
         return form
 
+    def create_cleaned(self, **data) -> Model:
+        """Create a new entry from data already cleaned by form
+
+        Form isn't instantiated again, only set of fields is checked
+
+        """
+        self._check_is_data_valid(data)
+        return self._model.objects.create(**data)
+
     def delete(self, pk: UUID) -> None:
         """Delete a concrete entry with pk"""
-        entry = self.get_concrete(pk)
-        entry.delete()
+        deleted, _ = self._model.objects.filter(pk=pk).delete()
+        if not deleted:
+            raise Http404(
+                f'No {self._model._meta.object_name} matches the given query.'
+            )
+
+    def _invalid_form(self, data: dict, errors: Dict[str, list]) -> Form:
+        """Return form of data with errors found besides form validation
+
+        Errors of fields that aren't in form are added as non field ones
+
+        """
+        form = self._form(data)
+        form.is_valid()
+        for name, messages in errors.items():
+            for message in messages:
+                if name in form.fields:
+                    form.add_error(name, message)
+                else:
+                    form.add_error(None, (
+                        message if name == NON_FIELD_ERRORS
+                        else f'{name}: {message}'
+                    ))
+
+        return form
+
+    def _missing_related(self, entries: List[Model]) -> Dict[int, dict]:
+        """Return errors of entries referring to missing related entries
+
+        Pks of every foreign key are checked with one query per batch
+
+        """
+        errors = {}
+        for field in self._schema.fields.values():
+            if not field.many_to_one:
+                continue
+
+            pks = {getattr(entry, field.attname) for entry in entries}
+            pks.discard(None)
+            existing = set()
+            related = field.related_model._base_manager
+            for batch in batches(pks, DEFAULT_BATCH_SIZE):
+                existing.update(related.filter(
+                    pk__in=batch
+                ).values_list('pk', flat=True))
+
+            message = (
+                f'{field.related_model._meta.verbose_name.capitalize()} '
+                'does not exist.'
+            )
+            for index, entry in enumerate(entries):
+                pk = getattr(entry, field.attname)
+                if pk is not None and pk not in existing:
+                    errors.setdefault(index, {})[field.name] = [message]
+
+        return errors
+
+    def _existing_pks(self, entries: List[Model]) -> Dict[int, dict]:
+        """Return errors of entries with pks of existing or earlier entries
+
+        Pks are checked with one query per batch
+
+        """
+        pk_name = self._schema.pk
+        pks = {entry.pk for entry in entries}
+        pks.discard(None)
+        existing = set()
+        for batch in batches(pks, DEFAULT_BATCH_SIZE):
+            existing.update(self._model._base_manager.filter(
+                pk__in=batch
+            ).values_list('pk', flat=True))
+
+        errors = {}
+        for index, entry in enumerate(entries):
+            if entry.pk is None:
+                continue
+            if entry.pk in existing:
+                errors[index] = {pk_name: entry.unique_error_message(
+                    self._model, (pk_name,)
+                ).messages}
+
+            existing.add(entry.pk)
+
+        return errors
+
+    def bulk_create(
+        self, rows: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+        cleaned: bool = False
+    ) -> BulkResult:
+        """Create new entries from rows in batches
+
+        Rows with invalid data are skipped and their forms are returned in
+        `errors` by row index. Rows with unknown or missing fields or
+        referring to missing related entries are reported the same way.
+        Rows already cleaned by form are passed with `cleaned=True` and
+        aren't validated by form again, they may also set primary keys of
+        entries (e.g. to make retries idempotent). Rows with pks of existing
+        entries or of earlier rows are reported in `errors` too
+
+        """
+        indexes = []
+        entries = []
+        errors = {}
+        get_errors = self._schema.get_errors
+        model = self._model
+        for index, data in enumerate(rows):
+            if cleaned:
+                schema_errors = get_errors(data, with_pk=True)
+                values = data
+            else:
+                form = self._form(data)
+                if not form.is_valid():
+                    errors[index] = form
+                    continue
+
+                schema_errors = get_errors(data)
+                values = {**data, **form.cleaned_data}
+
+            if schema_errors:
+                errors[index] = self._invalid_form(data, schema_errors)
+                continue
+
+            indexes.append((index, data))
+            entries.append(model(**values))
+
+        with transaction.atomic():
+            invalid = self._missing_related(entries)
+            if cleaned:
+                # Pks are checked in the transaction of INSERT, so an
+                # existing one is reported instead of rolling back the batch
+                for position, pk_errors in self._existing_pks(
+                    entries
+                ).items():
+                    invalid.setdefault(position, {}).update(pk_errors)
+
+            if invalid:
+                for position, entry_errors in invalid.items():
+                    index, data = indexes[position]
+                    errors[index] = self._invalid_form(data, entry_errors)
+
+                entries = [
+                    entry for position, entry in enumerate(entries)
+                    if position not in invalid
+                ]
+
+            self._model.objects.bulk_create(entries, batch_size=batch_size)
+
+        return BulkResult(entries, dict(sorted(errors.items())))
+
+    def bulk_update(
+        self, pk_to_data: Dict[UUID, dict],
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> BulkResult:
+        """Update entries by pk from data in batches
+
+        Entries with invalid data are skipped and their forms are returned
+        in `errors` by pk
+
+        """
+        to_python = self._model._meta.pk.to_python
+        pk_to_data = {
+            to_python(pk): data for pk, data in pk_to_data.items()
+        }
+        existing = self._model.objects.in_bulk(list(pk_to_data))
+        missing = [pk for pk in pk_to_data if pk not in existing]
+
+        entries = []
+        errors = {}
+        # bulk_update() doesn't call pre_save(), so auto_now fields are set
+        # here
+        auto_now = self._schema.auto_now
+        fields = {field.name for field in auto_now}
+        for pk, entry in existing.items():
+            form = self._form(pk_to_data[pk])
+            if form.is_valid():
+                fields.update(self._set_cleaned(entry, form.cleaned_data))
+                for field in auto_now:
+                    field.pre_save(entry, add=False)
+                if self._schema.versioned:
+                    entry.version += 1
+                    fields.add('version')
+
+                entries.append(entry)
+            else:
+                errors[pk] = form
+
+        if entries:
+            with transaction.atomic():
+                self._model.objects.bulk_update(
+                    entries, sorted(fields), batch_size=batch_size
+                )
+                entries_changed.send(
+                    sender=self._model, pks=[entry.pk for entry in entries]
+                )
+
+        return BulkResult(entries, errors, missing)
+
+    def bulk_delete(
+        self, pks: Iterable[UUID], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> int:
+        """Delete entries with pks, return number of deleted entries"""
+        deleted = 0
+        label = self._model._meta.label
+        with transaction.atomic():
+            for batch in batches(pks, batch_size):
+                _, counts = self._model.objects.filter(pk__in=batch).delete()
+                deleted += counts.get(label, 0)
+
+        return deleted
+
+
+def _invalidate_saved(sender: Model, instance: Model, **kwargs) -> None:
+    cache.invalidate(sender, [instance.pk])
+
+
+def _invalidate_changed(sender: Model, pks: list, **kwargs) -> None:
+    cache.invalidate(sender, pks)
+
+
+class CachedCRUDStrategy(SimpleCRUDStrategy):
+    """CRUD Strategy with read-through cache of concrete entries
+
+    Entries are looked up in a bounded in-process LRU cache first (if it's
+    enabled by `CRUD_CACHE_LOCAL_SIZE`, its entries may be stale for
+    `CRUD_CACHE_LOCAL_TIMEOUT` seconds after writes of other processes),
+    then in django cache and only then in database. Timeouts of django
+    cache are set per model by `CRUD_CACHE_TIMEOUTS` setting, concurrent
+    misses of an entry are coalesced to one query (see `cache.fetch()`).
+    Entries are invalidated on every save and delete of model (including
+    cascade deletes and admin changes) and on `entries_changed` signal.
+    Entries of local cache are shared between threads, so copies of them
+    are returned
+
+    Methods
+    -------
+    get_concrete(pk)
+        Return a concrete entry from cache or database
+    get_many(pks)
+        Return many entries from cache or database
+    invalidate(*pks)
+        Remove entries with pks from cache
+
+    """
+
+    def __init__(self, model: Model, form: Form) -> None:
+        super().__init__(model, form)
+        self._cache = cache.get_cache()
+        self._local_cache = cache.get_local_cache(model)
+        self._timeout = cache.get_timeout(model)
+
+        uid = f'crud_cache:{model._meta.label_lower}'
+        post_save.connect(_invalidate_saved, sender=model, dispatch_uid=uid)
+        post_delete.connect(
+            _invalidate_saved, sender=model, dispatch_uid=uid
+        )
+        entries_changed.connect(
+            _invalidate_changed, sender=model, dispatch_uid=uid
+        )
+
+    @identity.mapped
+    def get_concrete(self, pk: UUID) -> Model:
+        """Return a concrete entry with pk from cache or database"""
+        key = cache.make_key(self._model, pk)
+        if not cache.is_cacheable(self._model, key):
+            return super().get_concrete(pk)
+
+        entry = self._local_cache.get(key)
+        if entry is None:
+            # Filled from the primary, so a lagging replica can't put a
+            # stale entry to cache for the whole timeout
+            entry = cache.fetch(
+                key, lambda: self._get_for_write(pk), self._timeout
+            )
+            self._local_cache.set(key, entry)
+
+        return copy(entry)
+
+    @identity.mapped_many
+    def get_many(self, pks: Iterable[UUID]) -> MultiGetResult:
+        """Return entries with pks from cache or database
+
+        Entries missing in both cache tiers are read in one query and
+        put to cache
+
+        """
+        pks = self._unique_pks(pks)
+        cacheable = {}
+        for pk in pks:
+            key = cache.make_key(self._model, pk)
+            if cache.is_cacheable(self._model, key):
+                cacheable[key] = pk
+
+        found = {}
+        for key, pk in cacheable.items():
+            entry = self._local_cache.get(key)
+            if entry is not None:
+                found[pk] = entry
+
+        shared = self._cache.get_many(
+            [key for key, pk in cacheable.items() if pk not in found]
+        )
+        for key, cached in shared.items():
+            # Stale entries are reloaded with the missing ones
+            if cached.is_fresh():
+                self._local_cache.set(key, cached.value)
+                found[cacheable[key]] = cached.value
+
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            keys = [key for key, pk in cacheable.items() if pk not in found]
+            generations = cache.get_generations(keys)
+            # Filled from the primary like in `get_concrete()`
+            loaded = self._model.objects.in_bulk(missing)
+            fill = cache.store_many(
+                {
+                    key: loaded[cacheable[key]] for key in keys
+                    if cacheable[key] in loaded
+                },
+                self._timeout, generations
+            )
+            for key, entry in fill.items():
+                self._local_cache.set(key, entry)
+            found.update(loaded)
+
+        return self._collect(
+            pks, {pk: copy(entry) for pk, entry in found.items()}
+        )
+
+    def invalidate(self, *pks) -> None:
+        """Remove entries with pks from cache"""
+        cache.invalidate(self._model, pks)
+
+
+class AsyncCRUDStrategy(SimpleCRUDStrategy):
+    """CRUD Strategy with native async methods on top of async ORM
+
+    Methods
+    -------
+    aget_concrete(pk)
+        Return a concrete entry
+    aget_all()
+        Iterate over all entries
+    acreate(**data)
+        Create a new entry
+    aupdate(pk, version=None, partial=False, **data)
+        Update a concrete entry
+    adelete(pk)
+        Delete a concrete entry
+
+    """
+
+    def _not_found(self) -> Http404:
+        return Http404(
+            f'No {self._model._meta.object_name} matches the given query.'
+        )
+
+    async def aget_concrete(self, pk: UUID) -> Model:
+        """Return a concrete entry with pk"""
+        entry = identity.lookup(self._model, pk)
+        if entry is not None:
+            return entry
+
+        try:
+            entry = await self._reads().aget(pk=pk)
+        except self._model.DoesNotExist:
+            raise self._not_found()
+
+        return identity.remember(entry)
+
+    async def aget_all(self) -> AsyncIterator[Model]:
+        """Iterate over all entries"""
+        async for entry in self._reads().all():
+            yield entry
+
+    async def acreate(self, **data) -> Any[Model, Form]:
+        """Create a new entry from data"""
+        form = self._form(data)
+        if form.is_valid():
+            self._check_is_data_valid(data)
+            return await self._model.objects.acreate(**data)
+
+        return form
+
+    async def aupdate(
+        self, pk: UUID, version: int = None, partial: bool = False, **data
+    ) -> Any[Model, Form, Conflict]:
+        """Update a concrete entry with pk from data
+
+        Versioned and partial updates work like in `update()`
+
+        """
+        form = self._clean(data, partial)
+        if version is None:
+            try:
+                entry = await self._model.objects.aget(pk=pk)
+            except self._model.DoesNotExist:
+                raise self._not_found()
+
+            if form.is_valid():
+                update_fields = self._prepare_save(entry, form.cleaned_data)
+                if update_fields:
+                    await entry.asave(update_fields=update_fields)
+
+                return entry
+
+            return form
+
+        if not form.is_valid():
+            return form
+
+        values = self._changed_values(form.cleaned_data)
+        entries, update = self._conditional_update(pk, version, values)
+        if not await entries.aupdate(**update):
+            current = await self._model.objects.filter(pk=pk).values_list(
+                'version', flat=True
+            ).afirst()
+            return self._conflict(pk, version, current)
+
+        pk = self._model._meta.pk.to_python(pk)
+        await sync_to_async(entries_changed.send)(
+            sender=self._model, pks=[pk]
+        )
+        return self._updated_entry(pk, version, values)
+
+    async def adelete(self, pk: UUID) -> None:
+        """Delete a concrete entry with pk"""
+        deleted, _ = await self._model.objects.filter(pk=pk).adelete()
+        if not deleted:
+            raise self._not_found()
+
+
+class AsyncCachedCRUDStrategy(AsyncCRUDStrategy, CachedCRUDStrategy):
+    """Async CRUD Strategy reading concrete entries through cache
+
+    Lookups go through the same cache tiers as `CachedCRUDStrategy`, so
+    async views don't add database load on hot entries. Django cache and
+    `cache.fetch()` are sync, so entries missing in identity map are
+    looked up in a thread
+
+    """
+
+    async def aget_concrete(self, pk: UUID) -> Model:
+        """Return a concrete entry with pk from cache or database"""
+        entry = identity.lookup(self._model, pk)
+        if entry is not None:
+            return entry
 
+        return await sync_to_async(self.get_concrete)(pk)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .instrumentation import registry
+
+
+def _has_token(request: HttpRequest) -> bool:
+    """Check does request carry bearer token of `SERVICE_METRICS_TOKEN`"""
+    token = getattr(settings, 'SERVICE_METRICS_TOKEN', '')
+    scheme, _, value = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and (
+        constant_time_compare(value.strip(), token)
+    )
+
+
+def is_staff(request: HttpRequest) -> bool:
+    """Check is request made by staff user
+
+    Requests of API-only workers have no user
+
+    """
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Return metrics of service methods in Prometheus text format
+
+    Metrics reveal per method query counts and timings, so they're shown
+    to scrapers with bearer token of `SERVICE_METRICS_TOKEN` setting or,
+    as a fallback, to staff
+
+    """
+    if not _has_token(request) and not is_staff(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
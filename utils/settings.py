@@ -1,13 +1,69 @@
 """Module with utils for django settings"""
 
 from __future__ import annotations
-from typing import Any
+from typing import Any, Callable, Dict
 import os
+import re
 
 from django.core.exceptions import ImproperlyConfigured
 
 
-def get_env(env_name: str, default: Any = None) -> Any[int, str]:
+TRUE_VALUES = frozenset(('1', 'true', 'yes', 'on'))
+FALSE_VALUES = frozenset(('', '0', 'false', 'no', 'off'))
+
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+DURATION_RE = re.compile(r'^\s*(\d+)\s*([smhd]?)\s*$', re.IGNORECASE)
+
+
+def parse_bool(value: str) -> bool:
+    """Parse `1`/`true`/`yes`/`on` or `0`/`false`/`no`/`off`/empty"""
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+
+    raise ValueError(f'Incorrect boolean: {value}')
+
+
+def parse_list(value: str) -> list:
+    """Parse comma separated values, skipping empty ones"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_duration(value: str) -> int:
+    """Parse duration like `30`, `30s`, `5m`, `2h` or `1d` to seconds"""
+    match = DURATION_RE.match(value)
+    if match is None:
+        raise ValueError(f'Incorrect duration: {value}')
+
+    number, unit = match.groups()
+    return int(number) * DURATION_UNITS[unit.lower()]
+
+
+def _parse_default(value: str) -> Any[int, str]:
+    return int(value) if value.isdigit() else value
+
+
+PARSERS: Dict[Any, Callable[[str], Any]] = {
+    None: _parse_default,
+    bool: parse_bool,
+    int: int,
+    list: parse_list,
+    'duration': parse_duration,
+}
+
+
+def _parse(env_name: str, value: str, cast: Any) -> Any:
+    try:
+        return PARSERS[cast](value)
+    except ValueError as error:
+        raise ImproperlyConfigured(
+            f'Incorrect value of `{env_name}` environment variable: {error}'
+        )
+
+
+def get_env(env_name: str, default: Any = None, cast: Any = None) -> Any:
     """Returns environment variable value
 
     Parameters
@@ -16,29 +72,38 @@ def get_env(env_name: str, default: Any = None) -> Any[int, str]:
         Environment variable name
     default
         Default environment variable value. If variable doesn't exist
-        returns this value. By default `None`
+        returns this value (string defaults are parsed). By default `None`,
+        then variable is required and empty value is treated as missing
+    cast
+        Type of value: `bool`, `int`, `list` (comma separated),
+        `'duration'` (e.g. `30s`, `5m`, `2h`, returned in seconds) or
+        `None`
 
     Raises
     ------
     ImproperlyConfigured
-        Raises if environment variable doesn't exist and default value
-        is `None`
+        Raises if environment variable doesn't exist or is empty and
+        default value is `None` or if value can't be parsed
 
     Returns
     -------
-    env_value : Any[str, int]
-        Environment variable value. If this value contains only digits
-        returns integer else string
+    env_value
+        Environment variable value of cast type. Without cast returns
+        integer if value contains only digits else string
 
     """
-    env_value = os.getenv(env_name, default)
-    if not env_value:
-        raise ImproperlyConfigured(
-            f"You need to set `{env_name}` environment variable"
-        )
+    env_value = os.getenv(env_name)
+    if env_value is None or (not env_value and default is None):
+        if default is None:
+            raise ImproperlyConfigured(
+                f"You need to set `{env_name}` environment variable"
+            )
+        if not isinstance(default, str):
+            return default
 
-    if isinstance(env_value, str) and env_value.isdigit():
-        env_value = int(env_value)
+        env_value = default
 
-    return env_value
+    if cast not in PARSERS:
+        raise ImproperlyConfigured(f'Unknown type of `{env_name}`: {cast}')
 
+    return _parse(env_name, env_value, cast)
@@ -0,0 +1,205 @@
+"""Module with profiling and speedup of process startup
+
+Profiling is enabled by `DJANGO_PROFILE_STARTUP` environment variable.
+Then time of every module import (without nested imports) and every
+`AppConfig.ready()` hook is recorded during `django.setup()` and the
+slowest ones are reported to stderr. Pausing of garbage collection
+during startup is enabled by `DJANGO_PAUSE_STARTUP_GC` variable
+
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+import gc
+from importlib.abc import Loader, MetaPathFinder
+from importlib.machinery import ModuleSpec
+import sys
+from time import perf_counter
+from types import ModuleType
+from typing import Dict, Iterator, List, TextIO, Tuple
+
+from .settings import get_env
+
+
+DEFAULT_REPORT_SIZE = 30
+
+
+class StartupProfile:
+    """Timings of module imports and app ready hooks
+
+    Attributes
+    ----------
+    imports : dict
+        Seconds of import of module by name, without nested imports
+    ready : dict
+        Seconds of `ready()` of app config by label
+
+    Methods
+    -------
+    report(file, size)
+        Write the slowest imports and ready hooks to file
+
+    """
+
+    def __init__(self) -> None:
+        self.imports: Dict[str, float] = {}
+        self.ready: Dict[str, float] = {}
+        self._nested: List[float] = []
+
+    def time_import(self, name: str, exec_module, module: ModuleType):
+        """Execute module recording its time without nested imports"""
+        self._nested.append(0.0)
+        start = perf_counter()
+        try:
+            return exec_module(module)
+        finally:
+            total = perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += total
+            self.imports[name] = total - nested
+
+    def report(
+        self, file: TextIO = None, size: int = DEFAULT_REPORT_SIZE
+    ) -> None:
+        """Write the slowest imports and ready hooks to file"""
+        file = file or sys.stderr
+        total = sum(self.imports.values())
+        file.write(
+            f'Imported {len(self.imports)} modules in {total:.3f}s, '
+            f'the slowest ones (self time):\n'
+        )
+        for name, seconds in _slowest(self.imports, size):
+            file.write(f'  {seconds * 1000:9.2f} ms  {name}\n')
+
+        file.write('App ready hooks:\n')
+        for label, seconds in _slowest(self.ready, size):
+            file.write(f'  {seconds * 1000:9.2f} ms  {label}\n')
+
+
+def _slowest(timings: Dict[str, float], size: int) -> List[Tuple]:
+    return sorted(timings.items(), key=lambda item: -item[1])[:size]
+
+
+class _TimingLoader(Loader):
+    """Loader proxy recording time of module execution"""
+
+    def __init__(self, loader: Loader, profile: StartupProfile) -> None:
+        self._loader = loader
+        self._profile = profile
+
+    def create_module(self, spec: ModuleSpec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self._profile.time_import(
+            module.__name__, self._loader.exec_module, module
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(MetaPathFinder):
+    """Finder wrapping loaders of other finders with timing proxy"""
+
+    def __init__(self, profile: StartupProfile) -> None:
+        self._profile = profile
+
+    def find_spec(self, name: str, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(
+                    spec.loader, 'exec_module'
+                ):
+                    spec.loader = _TimingLoader(spec.loader, self._profile)
+                return spec
+
+        return None
+
+
+def _time_ready_hooks(profile: StartupProfile):
+    """Wrap `AppConfig.create()` to time `ready()` of created configs"""
+    from django.apps import AppConfig
+
+    original = AppConfig.__dict__['create']
+    create = AppConfig.create
+
+    def timed_create(entry):
+        app_config = create(entry)
+        ready = app_config.ready
+
+        def timed_ready():
+            start = perf_counter()
+            try:
+                ready()
+            finally:
+                profile.ready[app_config.label] = perf_counter() - start
+
+        app_config.ready = timed_ready
+        return app_config
+
+    AppConfig.create = staticmethod(timed_create)
+    return lambda: setattr(AppConfig, 'create', original)
+
+
+def is_enabled() -> bool:
+    """Check is startup profiling enabled by environment"""
+    return get_env('DJANGO_PROFILE_STARTUP', False, bool)
+
+
+def is_gc_pause_enabled() -> bool:
+    """Check is pausing of GC during startup enabled by environment"""
+    return get_env('DJANGO_PAUSE_STARTUP_GC', False, bool)
+
+
+@contextmanager
+def profile_startup(file: TextIO = None) -> Iterator[StartupProfile]:
+    """Profile imports and app ready hooks inside the block and report
+
+    Nothing is profiled if profiling isn't enabled by environment
+
+    """
+    profile = StartupProfile()
+    if not is_enabled():
+        yield profile
+        return
+
+    finder = _TimingFinder(profile)
+    sys.meta_path.insert(0, finder)
+    restore = _time_ready_hooks(profile)
+    try:
+        yield profile
+    finally:
+        restore()
+        sys.meta_path.remove(finder)
+        profile.report(file)
+
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """Pause garbage collection inside the block
+
+    Startup allocates lots of long-living objects (modules, classes,
+    models), which trigger useless full collections. They are moved to
+    permanent generation after the block, so later collections skip them
+    and forked workers don't touch their memory pages. Nothing is paused
+    if it isn't enabled by environment
+
+    """
+    if not is_gc_pause_enabled():
+        yield
+        return
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.freeze()
+        if enabled:
+            gc.enable()
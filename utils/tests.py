@@ -0,0 +1,76 @@
+import gc
+from importlib import import_module
+from io import StringIO
+import os
+import sys
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from .settings import get_env
+from .startup import paused_gc, profile_startup
+
+
+class GetEnvTests(SimpleTestCase):
+
+    def set_env(self, **env):
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default(self):
+        self.assertEqual(get_env('TEST_MISSING_ENV', 0), 0)
+        self.assertEqual(get_env('TEST_MISSING_ENV', ''), '')
+        self.assertEqual(get_env('TEST_MISSING_ENV', '5m', 'duration'), 300)
+        with self.assertRaises(ImproperlyConfigured):
+            get_env('TEST_MISSING_ENV')
+
+    def test_empty(self):
+        self.set_env(TEST_EMPTY_ENV='')
+        self.assertEqual(get_env('TEST_EMPTY_ENV', 'default'), '')
+        self.assertEqual(get_env('TEST_EMPTY_ENV', '', list), [])
+        with self.assertRaises(ImproperlyConfigured):
+            get_env('TEST_EMPTY_ENV')
+
+    def test_types(self):
+        self.set_env(
+            TEST_INT='42', TEST_BOOL='off', TEST_LIST='a, b,,c',
+            TEST_DURATION='2h', TEST_STR='text'
+        )
+        self.assertEqual(get_env('TEST_INT'), 42)
+        self.assertEqual(get_env('TEST_INT', cast=int), 42)
+        self.assertIs(get_env('TEST_BOOL', cast=bool), False)
+        self.assertEqual(get_env('TEST_LIST', cast=list), ['a', 'b', 'c'])
+        self.assertEqual(get_env('TEST_DURATION', cast='duration'), 7200)
+        self.assertEqual(get_env('TEST_STR'), 'text')
+        with self.assertRaises(ImproperlyConfigured):
+            get_env('TEST_STR', cast=bool)
+
+
+class StartupProfileTests(SimpleTestCase):
+
+    def test_profile_startup(self):
+        output = StringIO()
+        with mock.patch.dict(sys.modules), mock.patch.dict(
+            os.environ, DJANGO_PROFILE_STARTUP='1'
+        ):
+            sys.modules.pop('colorsys', None)
+            with profile_startup(output) as profile:
+                import_module('colorsys')
+
+        self.assertIn('colorsys', profile.imports)
+        self.assertIn('colorsys', output.getvalue())
+
+    def test_paused_gc_is_opt_in(self):
+        frozen = gc.get_freeze_count()
+        with paused_gc():
+            self.assertTrue(gc.isenabled())
+        self.assertEqual(gc.get_freeze_count(), frozen)
+
+        self.addCleanup(gc.unfreeze)
+        with mock.patch.dict(os.environ, DJANGO_PAUSE_STARTUP_GC='1'):
+            with paused_gc():
+                self.assertFalse(gc.isenabled())
+
+        self.assertTrue(gc.isenabled())